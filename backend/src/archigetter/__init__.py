@@ -6,4 +6,4 @@ __version__ = "0.1.0"
 
 settings = Settings()
 
-configure_logging(settings.log_level)
+configure_logging(settings.log_level, settings.log_sample_burst, settings.log_sample_period_in_seconds)
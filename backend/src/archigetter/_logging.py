@@ -1,5 +1,15 @@
-"""Module that handles logger setup."""
+"""Module that handles logger setup.
+
+Logging only puts a record on a queue, a background thread formats it as JSON and writes it to stderr, so
+logging never blocks the event loop on formatting or I/O. Repetitive records are sampled before they are queued.
+"""
+import atexit
 import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Callable, Dict, Optional, Tuple
 
 from pythonjsonlogger import jsonlogger
 
@@ -7,6 +17,74 @@ from pythonjsonlogger import jsonlogger
 _LOG_FORMAT = "%(asctime)%(levelname)%(message)%(name)"
 _LOG_FORMATTER = jsonlogger.JsonFormatter(_LOG_FORMAT)
 
+# bounds the memory of the sampling filter, message templates are few
+_MAX_SAMPLED_MESSAGES = 1024
+
+_queue_handler: Optional[QueueHandler] = None
+_log_listener: Optional[QueueListener] = None
+
+
+class SamplingFilter(logging.Filter):
+    """Let through at most `burst` records of the same message per `period_in_seconds`.
+
+    Records are told apart by logger and message template, not by their arguments or `extra`. The first record
+    let through after records were dropped carries their number in `sampled_out`. Records of `min_level` and
+    above are never dropped.
+    """
+
+    def __init__(
+        self,
+        burst: int,
+        period_in_seconds: float,
+        min_level: int = logging.ERROR,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.period_in_seconds = period_in_seconds
+        self.min_level = min_level
+        self.clock = clock
+        # (logger, message template): (start of the period, records let through, records dropped)
+        self._periods: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Tell whether `record` is let through."""
+        if record.levelno >= self.min_level:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = self.clock()
+        with self._lock:
+            period_start, passed, dropped = self._periods.get(key, (now, 0, 0))
+            if now - period_start >= self.period_in_seconds:
+                period_start, passed = now, 0
+
+            if passed >= self.burst:
+                self._periods[key] = (period_start, passed, dropped + 1)
+                return False
+
+            if key not in self._periods and len(self._periods) >= _MAX_SAMPLED_MESSAGES:
+                self._periods.clear()
+            self._periods[key] = (period_start, passed + 1, 0)
+
+        if dropped:
+            record.__dict__["sampled_out"] = dropped
+        return True
+
+
+class _UnformattedQueueHandler(QueueHandler):
+    """Queue records as they are, they are formatted by the background thread only.
+
+    `QueueHandler.prepare` formats every record, tracebacks included, in the logging thread, so that it could
+    be pickled to another process. Our queue never leaves the process, so the record itself is queued. Its
+    arguments are only formatted later, objects passed to a log call must not be changed after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue `record` unformatted."""
+        return record
+
 
 def _raise_test_plugin_logging_level_to_error() -> None:
     """Raise the default test plugin logging level to `ERROR`.
@@ -21,7 +99,9 @@ def _raise_test_plugin_logging_level_to_error() -> None:
     logging.getLogger("filelock").setLevel(logging.ERROR)
 
 
-def configure_logging(log_level: str) -> None:
+def configure_logging(
+    log_level: str, sample_burst: int = 10, sample_period_in_seconds: float = 60.0, stream: Optional[IO[str]] = None
+) -> None:
     """Configure the project logging.
 
     This function configures the project logging, all loggers instantiated after calling
@@ -30,12 +110,39 @@ def configure_logging(log_level: str) -> None:
     This function should be called at the very start of running the application, else loggers
     with different configurations may be instantiated.
 
+    Records are written to `stream` (stderr by default) by a background thread, which is stopped and drained at exit.
     """
+    global _queue_handler, _log_listener
+
     _raise_test_plugin_logging_level_to_error()
+    stop_logging()
 
-    log_handler = logging.StreamHandler()
+    log_handler = logging.StreamHandler(stream)
     log_handler.setFormatter(_LOG_FORMATTER)
 
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    _queue_handler = _UnformattedQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(sample_burst, sample_period_in_seconds))
+
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
-    root_logger.addHandler(log_handler)
+    root_logger.addHandler(_queue_handler)
+
+    _log_listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+    _log_listener.start()
+
+
+def stop_logging() -> None:
+    """Write all queued records and stop the background thread, records logged afterwards are dropped."""
+    global _queue_handler, _log_listener
+
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+    if _log_listener is not None:
+        log_listener, _log_listener = _log_listener, None
+        log_listener.stop()
+
+
+atexit.register(stop_logging)
@@ -1,16 +1,18 @@
 """Module that describes the service's API behaviour."""
+import asyncio
 import logging
-from asyncio import sleep
-from random import choice
+from typing import Any, Dict, Optional
 
 import uvicorn
-from fastapi import FastAPI, WebSocket
-from fastapi_utils.tasks import repeat_every
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, status
 from starlette.middleware.cors import CORSMiddleware
 
-from .. import archicrawler, settings
-from ..database import get_db_trashtv_session
-from ..database.models import trashtv
+from .. import archicrawler, archisender, metrics, settings, worker
+from ..blobstore import close_blob_store, get_blob_store
+from ..database import close_db_trashtv_async_engine, get_db_trashtv_async_session
+from ..pubsub import close_pubsub
+from ..transcoder import RENDITION_FORMATS, close_transcode_executor
+from .responses import blob_response
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,6 +25,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+metrics.TRASH_VIEWERS.set_function(lambda: archisender.trash_hub.subscriber_count)
 
 
 @app.get("/")
@@ -35,43 +38,153 @@ def get_example() -> str:
     raise NotImplementedError("This API has not been implemented")
 
 
+@app.get("/metrics", response_class=Response)
+async def get_metrics() -> Response:
+    """Get the metrics of this process in the Prometheus text format, collected on the event loop."""
+    return Response(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/gif/{archillect_id}", response_class=Response)
+async def get_gif(archillect_id: str, request: Request) -> Response:
+    """Get the binary of a gif.
+
+    Responses carry a strong ETag and are cacheable forever, since gifs never change.
+    Conditional requests (`If-None-Match`) and byte ranges (`Range`) are supported.
+    Hot gifs are served from memory.
+    """
+    return await _gif_response(request, archillect_id)
+
+
+@app.get("/gif/{archillect_id}/{rendition_format}", response_class=Response)
+async def get_gif_rendition(archillect_id: str, rendition_format: str, request: Request) -> Response:
+    """Get a rendition of a gif, a `webm` or `mp4` video or its `poster`, served like the gif itself."""
+    if rendition_format not in RENDITION_FORMATS:
+        raise HTTPException(status_code=404, detail="Rendition format not found.")
+
+    return await _gif_response(request, archillect_id, rendition_format)
+
+
+async def _gif_response(request: Request, archillect_id: str, rendition_format: Optional[str] = None) -> Response:
+    async with get_db_trashtv_async_session() as trashtv_db_session:
+        gif = await archisender.get_gif(trashtv_db_session, archillect_id, rendition_format)
+    if gif is None:
+        raise HTTPException(status_code=404, detail="Gif not found.")
+
+    return await blob_response(request, get_blob_store(), gif["sha256"], gif["size"], gif["mime_type"])
+
+
+@app.get("/playlist/next")
+async def get_next_playlist_gif() -> Dict[str, Any]:
+    """Get the next gif of the shuffled playlist, the playlist is only read from db once it runs empty."""
+    gif = archisender.playlist.next()
+    if gif is None:
+        async with get_db_trashtv_async_session() as trashtv_db_session:
+            await archisender.playlist.refill(trashtv_db_session)
+        gif = archisender.playlist.next()
+    if gif is None:
+        raise HTTPException(status_code=404, detail="No gif downloaded yet.")
+    return gif
+
+
 @app.websocket("/trash")
 async def get_trash(websocket: WebSocket) -> None:
-    """Websocket to yield gif data from the database."""
+    """Websocket to yield gif data from the database.
+
+    Every viewer is fed from the shared trash hub, slow viewers get dropped by the hub.
+    """
     _LOGGER.info("trash was requested.")
-    fake_response = {"data": choice(range(100))}
     await websocket.accept()
+    subscriber = archisender.trash_hub.subscribe()
+
+    send_trash = asyncio.ensure_future(_send_trash(websocket, subscriber))
+    wait_for_disconnect = asyncio.ensure_future(_wait_for_disconnect(websocket))
+    try:
+        done, _ = await asyncio.wait({send_trash, wait_for_disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                _LOGGER.info("trash viewer connection failed.", extra={"exception": task.exception()})
+    finally:
+        send_trash.cancel()
+        wait_for_disconnect.cancel()
+        archisender.trash_hub.unsubscribe(subscriber)
+        _LOGGER.info("trash viewer left.")
+
+
+async def _send_trash(websocket: WebSocket, subscriber: archisender.TrashSubscriber) -> None:
     while True:
-        await websocket.send_json(fake_response)
-        await sleep(5)
+        message = await subscriber.queue.get()
+        if message is None:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
 
+        await asyncio.wait_for(websocket.send_text(message), timeout=settings.trash_send_timeout_in_seconds)
 
-@app.on_event("startup")
-@repeat_every(seconds=settings.archillect_fetch_period_in_seconds)
-def record_current_gif() -> None:
-    """Get periodically newest gifs from Archillect."""
-    _LOGGER.info("Executing periodicall task: current gif to db.")
 
-    with get_db_trashtv_session() as trashtv_db_session:
-        archicrawler.gif_to_db(trashtv_db_session, add_current=True)
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        continue
 
 
 @app.on_event("startup")
-@repeat_every(seconds=settings.gif_download_period_in_seconds)
-def download_gifs() -> None:
-    """Download and save periodically gifs."""
-    _LOGGER.info("Executing periodicall task: download gif to db.")
+async def start_trash_broadcaster() -> None:
+    """Start the single task that feeds all trash viewers."""
+    app.state.trash_broadcaster = asyncio.ensure_future(archisender.broadcast_trash(archisender.trash_hub))
 
-    with get_db_trashtv_session() as trashtv_db_session:
-        archicrawler.save_gif_to_db(trashtv_db_session)
+
+@app.on_event("shutdown")
+async def stop_trash_broadcaster() -> None:
+    """Stop feeding trash viewers."""
+    app.state.trash_broadcaster.cancel()
+    await asyncio.gather(app.state.trash_broadcaster, return_exceptions=True)
 
 
 @app.on_event("startup")
 def create_application_tables() -> None:
     """Create the table of the database our application directly owns."""
-    with get_db_trashtv_session() as trashtv_db_session:
-        engine_trashtv = trashtv_db_session.get_bind()
-        trashtv.Base.metadata.create_all(engine_trashtv)
+    worker.create_application_tables()
+
+
+@app.on_event("startup")
+async def start_background_jobs() -> None:
+    """Start the background jobs in this process, unless a standalone worker runs them."""
+    if settings.run_background_jobs:
+        worker.start_background_jobs()
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs() -> None:
+    """Stop all background jobs of this process."""
+    await worker.stop_background_jobs()
+
+
+@app.on_event("shutdown")
+async def close_crawler_http_client() -> None:
+    """Release the pooled connections of the crawler."""
+    await archicrawler.close_http_client()
+
+
+@app.on_event("shutdown")
+async def close_gif_blob_store() -> None:
+    """Release the connections of the blob store."""
+    await close_blob_store()
+
+
+@app.on_event("shutdown")
+async def close_gif_transcoder() -> None:
+    """Stop the transcode processes."""
+    await close_transcode_executor()
+
+
+@app.on_event("shutdown")
+async def close_trash_pubsub() -> None:
+    """Release the connection of the pub/sub backend."""
+    await close_pubsub()
+
+
+@app.on_event("shutdown")
+async def close_db_connections() -> None:
+    """Release the pooled connections of the async db engine."""
+    await close_db_trashtv_async_engine()
 
 
 def start() -> None:
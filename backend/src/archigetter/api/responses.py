@@ -0,0 +1,161 @@
+"""Module that serves stored blobs over http, cacheable and resumable."""
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .. import settings
+from ..blobstore import BlobStore
+from ..cache import gif_bytes_cache
+
+_LOGGER = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+# see https://asgi.readthedocs.io/en/latest/extensions.html#zero-copy-send
+_ZERO_COPY_SEND = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when a requested byte range lies outside of the served blob."""
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into a `(start, end)` slice with exclusive end.
+
+    Returns `None` for headers we do not support (other units, multiple ranges, bad syntax),
+    the whole blob is served then as allowed by RFC 7233.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            suffix_length = int(last)
+            if suffix_length == 0:
+                raise RangeNotSatisfiableError(range_header)
+            return max(size - suffix_length, 0), size
+
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiableError(range_header)
+    if end <= start:
+        return None
+
+    return start, min(end, size)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.replace("W/", "", 1) == etag for candidate in candidates)
+
+
+class BlobFileResponse(Response):
+    """Send a slice of a local file.
+
+    Uses the ASGI zero-copy send extension (`sendfile`) when the server offers it,
+    else the file is read in chunks on the threadpool.
+    """
+
+    def __init__(
+        self, path: Path, start: int, end: int, status_code: int, headers: Dict[str, str], media_type: str
+    ) -> None:
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Send the file slice."""
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        with self.path.open("rb") as blob_file:
+            if _ZERO_COPY_SEND in scope.get("extensions", {}):
+                await send(
+                    {"type": _ZERO_COPY_SEND, "file": blob_file, "offset": self.start, "count": self.end - self.start}
+                )
+                return
+
+            blob_file.seek(self.start)
+            remaining = self.end - self.start
+            while remaining > 0:
+                chunk = await run_in_threadpool(blob_file.read, min(_CHUNK_SIZE, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and bool(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    return
+
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def load_cached_blob(blob_store: BlobStore, sha256: str, size: int) -> Optional[bytes]:
+    """Get a whole blob from the `gif_bytes_cache`, reading it into the cache on a miss.
+
+    Returns `None` for blobs too large to cache, those are not read into memory.
+    """
+    content = gif_bytes_cache.get(sha256)
+    if content is not None or size > gif_bytes_cache.max_item_size_in_bytes:
+        return content
+
+    content = b"".join([chunk async for chunk in blob_store.read(sha256)])
+    gif_bytes_cache.set(sha256, content)
+    return content
+
+
+async def blob_response(request: Request, blob_store: BlobStore, sha256: str, size: int, media_type: str) -> Response:
+    """Serve a blob with a strong ETag from its hash, long-lived caching and byte range support.
+
+    Conditional and range requests are answered from the blob metadata alone. Only whole blobs are served
+    from the `gif_bytes_cache`, byte ranges and blobs too large to cache are sent from the blob store.
+    """
+    etag = f'"{sha256}"'
+    headers = {"etag": etag, "cache-control": settings.gif_cache_control, "accept-ranges": "bytes"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    local_path = blob_store.local_path(sha256)
+    if local_path is not None and settings.gif_accel_redirect_prefix:
+        # let a reverse proxy like nginx send the file, including range handling
+        relative_path = local_path.relative_to(settings.blob_store_local_path).as_posix()
+        headers["x-accel-redirect"] = f"{settings.gif_accel_redirect_prefix.rstrip('/')}/{relative_path}"
+        return Response(headers=headers, media_type=media_type)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiableError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    start, end = byte_range or (0, size)
+    status_code = 200
+    headers["content-length"] = str(end - start)
+    if byte_range:
+        status_code = 206
+        headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+    else:
+        content = await load_cached_blob(blob_store, sha256, size)
+        if content is not None:
+            return Response(content, status_code=status_code, headers=headers, media_type=media_type)
+
+    if local_path is not None:
+        return BlobFileResponse(local_path, start, end, status_code, headers, media_type)
+
+    return StreamingResponse(
+        blob_store.read(sha256, start, end), status_code=status_code, headers=headers, media_type=media_type
+    )
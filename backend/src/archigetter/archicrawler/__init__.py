@@ -1,9 +1,20 @@
 """Package for crawling Archillect."""
-from .crawler import get_from_archillect
+from .client import close_http_client, get_http_client
+from .crawler import ArchillectTvState, archillect_tv_state, get_changed_from_archillect, get_from_archillect
 from .crud import gif_to_db, save_gif_to_db
+from .dedup import BKTree, DedupIndex, dedup_index, perceptual_hash
 
 __all__ = [
+    "ArchillectTvState",
+    "BKTree",
+    "DedupIndex",
+    "archillect_tv_state",
+    "close_http_client",
+    "dedup_index",
+    "get_http_client",
     "gif_to_db",
+    "get_changed_from_archillect",
     "get_from_archillect",
+    "perceptual_hash",
     "save_gif_to_db",
 ]
@@ -0,0 +1,46 @@
+"""Module that maintains the shared http client used to crawl Archillect."""
+import logging
+from typing import Optional
+
+from httpx import AsyncClient, Limits, Timeout
+
+from .. import settings
+
+_LOGGER = logging.getLogger(__name__)
+
+_http_client: Optional[AsyncClient] = None
+
+
+def get_http_client() -> AsyncClient:
+    """Get the long-lived crawler http client, create it on first use.
+
+    All scrapes and downloads share this client, so connections to Archillect and the gif hosts
+    are kept alive and reused instead of doing a new TLS handshake on every request.
+    """
+    global _http_client
+
+    if _http_client is None or _http_client.is_closed:
+        _LOGGER.info("Opening crawler http client.", extra={"http2": settings.crawler_http2})
+        _http_client = AsyncClient(
+            http2=settings.crawler_http2,
+            limits=Limits(
+                max_connections=settings.crawler_max_connections,
+                max_keepalive_connections=settings.crawler_max_keepalive_connections,
+                keepalive_expiry=settings.crawler_keepalive_expiry_in_seconds,
+            ),
+            timeout=Timeout(settings.crawler_timeout_in_seconds),
+        )
+
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the crawler http client and release all pooled connections."""
+    global _http_client
+
+    if _http_client is None:
+        return
+
+    _LOGGER.info("Closing crawler http client.")
+    await _http_client.aclose()
+    _http_client = None
@@ -1,58 +1,233 @@
 """Module that handels crawling the Archillect TV service."""
+import asyncio
 import logging
-from typing import Any, Dict, List, Union
+from hashlib import sha256
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 
-from bs4 import BeautifulSoup
-from httpx import get
+import httpx
 
-from .. import settings
+from .. import metrics, settings
 from ..database.models.trashtv import TrashTvArchillectData
+from .client import get_http_client
+from .extractors import EXTRACTORS, css_url
+from .limits import ByteBudget
 
 _LOGGER = logging.getLogger(__name__)
 
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+_GIF_ID_CSS_ID = "gifid"
 
-def get_from_archillect() -> List[Dict[str, Any]]:
-    """Scrape and parse current data from Archillect."""
+
+class GifSink(Protocol):
+    """Anything a gif can be streamed into, e.g. `io.BytesIO` or a `blobstore.BlobWriter`."""
+
+    def write(self, chunk: bytes) -> int:
+        """Append `chunk`."""
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Move the stream position."""
+
+    def close(self) -> None:
+        """Release the sink."""
+
+
+class GifTooLargeError(Exception):
+    """Raised when a gif is bigger than allowed."""
+
+
+class ArchillectTvState:
+    """What the crawler saw on Archillect TV on its last successful scrape."""
+
+    def __init__(self) -> None:
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.body_sha256: Optional[str] = None
+        self.gifs: List[Dict[str, Any]] = []
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Get the headers asking Archillect to only send the page if it changed since the last scrape."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+    def copy(self) -> "ArchillectTvState":
+        """Get a copy to record a new scrape in, without touching what the crawler saw so far."""
+        state = ArchillectTvState()
+        state.update(self)
+        return state
+
+    def update(self, state: "ArchillectTvState") -> None:
+        """Take over what the crawler saw on the scrape recorded in `state`."""
+        self.etag = state.etag
+        self.last_modified = state.last_modified
+        self.body_sha256 = state.body_sha256
+        self.gifs = state.gifs
+
+    def reset(self) -> None:
+        """Forget the last scrape, the next one fetches and parses the full page."""
+        self.etag = None
+        self.last_modified = None
+        self.body_sha256 = None
+        self.gifs = []
+
+
+archillect_tv_state = ArchillectTvState()
+
+
+async def _scrape_archillect() -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], ArchillectTvState]:
+    """Scrape Archillect, return all gifs currently on the page and those that took a new position since last time.
+
+    Unchanged pages are detected by a conditional request or, if Archillect ignores it, by the hash of the
+    body and are not parsed again. Raises `httpx.HTTPStatusError` on any other reply than 200 or 304, so the
+    crawl job backs off.
+    The scrape is compared to `archillect_tv_state` but recorded in the returned copy of it only.
+    """
     _LOGGER.info("Start crawling.")
-    archillect_request = get(settings.archillect_tv_url)
-    crawled_data_raw = BeautifulSoup(archillect_request.text, "html.parser")
+    with metrics.timed(metrics.ARCHILLECT_SCRAPE_SECONDS):
+        archillect_request = await get_http_client().get(
+            settings.archillect_tv_url, headers=archillect_tv_state.conditional_headers()
+        )
+
+    scraped_state = archillect_tv_state.copy()
+    if archillect_request.status_code == 304:
+        _LOGGER.info("Archillect did not change.", extra={"etag": archillect_tv_state.etag})
+        return scraped_state.gifs, [], scraped_state
 
     if archillect_request.status_code != 200:
-        _LOGGER.warning("Could not fetch from Archillect.", extra={"details": archillect_request})
-        return []
+        raise httpx.HTTPStatusError(
+            f"Could not fetch from Archillect, got status {archillect_request.status_code}.",
+            request=archillect_request.request,
+            response=archillect_request,
+        )
+
+    scraped_state.etag = archillect_request.headers.get("ETag")
+    scraped_state.last_modified = archillect_request.headers.get("Last-Modified")
+
+    body_sha256 = sha256(archillect_request.content).hexdigest()
+    if body_sha256 == archillect_tv_state.body_sha256:
+        _LOGGER.info("Archillect did not change.", extra={"body_sha256": body_sha256})
+        return scraped_state.gifs, [], scraped_state
+
+    crawled_gifs = _extract_html_data(archillect_request.text)
+
+    previous_gifs = {gif["css_id"]: gif["archillect_id"] for gif in archillect_tv_state.gifs}
+    changed_gifs = [gif for gif in crawled_gifs if previous_gifs.get(gif["css_id"]) != gif["archillect_id"]]
+
+    scraped_state.body_sha256 = body_sha256
+    scraped_state.gifs = crawled_gifs
+    return crawled_gifs, changed_gifs, scraped_state
 
-    crawled_gifs = _extract_html_data(crawled_data_raw)
 
+async def get_from_archillect() -> List[Dict[str, Any]]:
+    """Scrape and parse current data from Archillect, `archillect_tv_state` is left as it is."""
+    crawled_gifs, _, _ = await _scrape_archillect()
     return crawled_gifs
 
 
-def _extract_html_data(crawled_data: BeautifulSoup) -> List[Dict[str, Any]]:
-    """Extract gif id & src from crawled html."""
+async def get_changed_from_archillect() -> Tuple[List[Dict[str, Any]], ArchillectTvState]:
+    """Scrape Archillect and return only the gifs that moved into a new position since the last scrape.
+
+    Returns an empty list while Archillect shows the same gifs, so callers can skip all further work.
+    The scrape is returned as well, the caller commits it to `archillect_tv_state` once the gifs are stored,
+    so gifs that could not be stored are seen as changed again on the next scrape.
+    """
+    _, changed_gifs, scraped_state = await _scrape_archillect()
+    return changed_gifs, scraped_state
+
+
+@metrics.timed(metrics.ARCHILLECT_PARSE_SECONDS)
+def _extract_html_data(html: str) -> List[Dict[str, Any]]:
+    """Extract gif id & src from crawled html.
+
+    The gif on screen is the background image of its element and gets its id from the `gifid` element,
+    all other gifs are images carrying their id in the `index` attribute.
+    """
+    extract = EXTRACTORS[settings.archillect_html_extractor]
+    elements = extract(html, [*settings.archillect_tv_css_ids, _GIF_ID_CSS_ID])
+
     result = []
     for html_id in settings.archillect_tv_css_ids:
-        is_screenbg = html_id == "screenbg"
-        css_key = "style" if is_screenbg else "src"
-
-        gif_id_raw = crawled_data.find(id=html_id)
-        gif_id = crawled_data.find(id="gifid").contents[0].replace("#", "") if is_screenbg else gif_id_raw["index"]
-        gif_link = (
-            crawled_data.find(id=html_id)
-            .get(css_key)
-            .replace("background-image: url(", "")[: -1 if is_screenbg else None]
-        )
+        element = elements.get(html_id)
+        if html_id == settings.archillect_tv_on_screen_css_id:
+            gif_id = elements.get(_GIF_ID_CSS_ID, {}).get("text", "").strip().lstrip("#")
+            gif_link = css_url(element.get("style", "")) if element else None
+        else:
+            gif_id = element.get("index", "") if element else ""
+            gif_link = element.get("src") if element else None
+
+        if not gif_id or not gif_link:
+            _LOGGER.warning("Could not find gif in html.", extra={"css_id": html_id})
+            continue
 
-        result.append({"archillect_id": gif_id, "source_link": gif_link})
+        result.append({"archillect_id": gif_id, "source_link": gif_link, "css_id": html_id})
 
     _LOGGER.info("Finished crawling.", extra={"result": result})
     return result
 
 
-def get_gif_binary(gif: TrashTvArchillectData) -> Union[Dict[str, Any], None]:
-    """Download gif file as binary."""
-    gif_request = get(str(gif.source_link))
-
-    if gif_request.status_code != 200:
-        _LOGGER.warn("Gif could not be requested.", extra={"gif_id": gif.id, "gif_request": gif_request})
-        return None
-
-    return {"id": gif.id, "gif_raw_data": gif_request.content}
+async def _stream_gif_body(
+    gif: TrashTvArchillectData, gif_request: httpx.Response, sink: GifSink, max_bytes: int
+) -> None:
+    gif_size = 0
+    async for chunk in gif_request.aiter_bytes(settings.gif_download_chunk_size_in_bytes):
+        gif_size += len(chunk)
+        if gif_size > max_bytes:
+            raise GifTooLargeError(f"Gif {gif.id} exceeded {max_bytes} bytes.")
+        sink.write(chunk)
+        metrics.GIF_DOWNLOADED_BYTES.inc(len(chunk))
+
+
+async def get_gif_binary(gif: TrashTvArchillectData, sink: GifSink, byte_budget: ByteBudget) -> Optional[int]:
+    """Stream gif file as binary into `sink`.
+
+    Room for the gif is reserved in `byte_budget` before the body is read, the caller has to release
+    the returned number of reserved bytes once the sink is persisted. Returns `None` if nothing was downloaded.
+
+    The request and the body together may take `gif_download_timeout_in_seconds`, waiting for room in
+    `byte_budget` does not count, so a download is not failed because others hold the budget.
+
+    Raises `httpx.HTTPStatusError` on responses that are worth retrying (rate limited, server errors),
+    `asyncio.TimeoutError` if the download took too long and `GifTooLargeError` if the gif exceeds
+    `gif_max_size_in_bytes`.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    http_client = get_http_client()
+    gif_request = await asyncio.wait_for(
+        http_client.send(http_client.build_request("GET", str(gif.source_link)), stream=True),
+        timeout=settings.gif_download_timeout_in_seconds,
+    )
+    try:
+        if gif_request.status_code in _RETRYABLE_STATUS_CODES:
+            gif_request.raise_for_status()
+
+        if gif_request.status_code != 200:
+            _LOGGER.warning("Gif could not be requested.", extra={"gif_id": gif.id, "gif_request": gif_request})
+            return None
+
+        content_length = int(gif_request.headers.get("content-length", 0))
+        if content_length > settings.gif_max_size_in_bytes:
+            raise GifTooLargeError(f"Gif {gif.id} announced {content_length} bytes.")
+
+        # an encoded body may grow when decoded, so only trust the length of plain bodies
+        is_plain_body = content_length and "content-encoding" not in gif_request.headers
+        reserved_bytes = content_length if is_plain_body else settings.gif_max_size_in_bytes
+        request_seconds = loop.time() - started
+
+        await byte_budget.acquire(reserved_bytes)
+        try:
+            await asyncio.wait_for(
+                _stream_gif_body(gif, gif_request, sink, reserved_bytes),
+                timeout=settings.gif_download_timeout_in_seconds - request_seconds,
+            )
+        except BaseException:
+            await byte_budget.release(reserved_bytes)
+            raise
+    finally:
+        await gif_request.aclose()
+
+    return reserved_bytes
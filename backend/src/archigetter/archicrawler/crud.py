@@ -1,44 +1,157 @@
 """Module that handels all crud operations concerning the crawling of Archillect."""
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import exists
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+from .. import metrics, settings
+from ..blobstore import Blob, BlobStore, BlobWriter, get_blob_store
+from ..cache import NOW_PLAYING_KEY, gif_lookup_cache, now_playing_cache
 from ..database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory
-from . import crawler
+from . import crawler, download_queue, downloader
+from .dedup import dedup_index, perceptual_hash
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def gif_to_db(session: Session, add_current: Optional[bool] = False) -> None:
-    """Add gif to trashtv db."""
-    crawled_gifs = crawler.get_from_archillect()
+async def gif_to_db(
+    session: AsyncSession,
+    add_current: Optional[bool] = False,
+    crawled_gifs: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    """Add gif to trashtv db.
+
+    Stores `crawled_gifs`, scrapes Archillect if none are given and raises `httpx.HTTPStatusError` if that fails.
+    All gifs are inserted in one statement that skips gifs already in db, so concurrent crawls can not race on
+    the unique `archillect_id`.
+    Newly inserted gifs are queued for download. Recording the history invalidates the cached gif now playing.
+    Returns the number of newly inserted gifs.
+    """
+    if crawled_gifs is None:
+        crawled_gifs = await crawler.get_from_archillect()
 
     if not crawled_gifs:
         _LOGGER.warning("No data was written into db.", extra={"crawled_gifs": crawled_gifs})
-        return
+        return 0
 
-    # record history of current gifs
+    gif_rows = {gif["archillect_id"]: {"source_link": gif["source_link"]} for gif in crawled_gifs}
+    inserted = await session.execute(
+        insert(TrashTvArchillectData)
+        .values([{"archillect_id": archillect_id, **gif_row} for archillect_id, gif_row in gif_rows.items()])
+        .on_conflict_do_nothing(index_elements=[TrashTvArchillectData.archillect_id])
+        .returning(TrashTvArchillectData.id, TrashTvArchillectData.archillect_id)
+    )
+    inserted_gifs = {archillect_id: gif_id for gif_id, archillect_id in inserted}
+    inserted_ids = inserted_gifs.keys()
+    await download_queue.enqueue_gif_downloads(session, inserted_gifs.values())
 
-    # check if gif already in db. add if not present.
-    for gif in crawled_gifs:
-        if session.query(exists().where(TrashTvArchillectData.archillect_id == gif["archillect_id"])).scalar():
-            _LOGGER.warning("Archillect id already in db.", extra={"gif": gif["archillect_id"]})
-            continue
-        session.add(TrashTvArchillectData(**gif))
+    # expected whenever the buffered gif comes on screen
+    for archillect_id in gif_rows.keys() - inserted_ids:
+        _LOGGER.debug("Archillect id already in db.", extra={"gif": archillect_id})
+
+    # record history of current gifs
+    if add_current:
+        await session.execute(
+            insert(TrashTvArchillectHistory),
+            [{"gif_id": gif["archillect_id"], "css_id": gif["css_id"]} for gif in crawled_gifs],
+        )
 
+    with metrics.timed(metrics.DB_COMMIT_SECONDS.labels("gif_to_db")):
+        await session.commit()
+    metrics.GIFS_INGESTED.inc(len(inserted_ids))
     if add_current:
-        session.add_all([TrashTvArchillectHistory(gif_id=gif["archillect_id"]) for gif in crawled_gifs])
+        now_playing_cache.invalidate(NOW_PLAYING_KEY)
+    return len(inserted_ids)
+
+
+def _perceptual_hash(writer: BlobWriter) -> Optional[int]:
+    try:
+        return perceptual_hash(writer, settings.gif_dedup_sample_frames, settings.gif_dedup_min_gradients)
+    except Exception as e:
+        _LOGGER.info("Could not hash gif.", extra={"exception": e})
+        return None
+
+
+async def _store_deduplicated(blob_store: BlobStore, writer: BlobWriter) -> Tuple[Blob, Optional[int]]:
+    """Store a downloaded gif, unless a near-duplicate is stored already. Returns the blob and its hash.
+
+    A duplicate is discarded before it reaches the blob store, so no blob ever has to be deleted again.
+    """
+    gif_dhash = await run_in_threadpool(_perceptual_hash, writer) if settings.gif_dedup_enabled else None
+    duplicate = None if gif_dhash is None else dedup_index.find(gif_dhash)
+    if duplicate is None:
+        blob = await blob_store.put(writer)
+        if gif_dhash is not None:
+            dedup_index.add(gif_dhash, blob)
+        return blob, gif_dhash
+
+    blob = writer.blob()
+    writer.close()
+    if duplicate.sha256 != blob.sha256:
+        _LOGGER.info("Gif is a duplicate.", extra={"sha256": blob.sha256, "duplicate_of": duplicate.sha256})
+        metrics.GIFS_DEDUPLICATED.inc()
+    return duplicate, gif_dhash
+
+
+async def save_gif_to_db(session: AsyncSession) -> int:
+    """Save scraped gif binary in the blob store and record its address in db.
+
+    Claims up to `gif_download_batch_size` due jobs from the download queue. Downloads run concurrently
+    and stream straight into the blob store, every finished download is recorded and its job removed
+    right away, committed in batches of `gif_download_commit_batch_size`. Failed downloads are rescheduled,
+    so are the gifs of a batch interrupted by an error before its commit.
+    Near-duplicates of stored gifs share their blob. Saved gifs are invalidated in the gif caches.
+    Returns the number of saved gifs.
+    """
+    claimed_gifs = await download_queue.claim_gif_downloads(session, settings.gif_download_batch_size)
+    if not claimed_gifs:
+        return 0
+
+    blob_store = get_blob_store()
+    if settings.gif_dedup_enabled:
+        await dedup_index.load(session)
+
+    saved_gif_ids: Set[Any] = set()
+    committed_gif_ids: Set[Any] = set()
+    try:
+        async for downloaded in downloader.download_gifs(claimed_gifs, open_sink=blob_store.open_writer):
+            blob, gif_dhash = await _store_deduplicated(blob_store, downloaded["sink"])
+            await session.execute(
+                update(TrashTvArchillectData.__table__)
+                .where(TrashTvArchillectData.id == downloaded["id"])
+                .values(
+                    gif_sha256=blob.sha256,
+                    gif_size_in_bytes=blob.size,
+                    gif_mime_type=blob.mime_type,
+                    gif_dhash=gif_dhash,
+                )
+            )
+            await download_queue.complete_gif_download(session, downloaded["id"])
+            saved_gif_ids.add(downloaded["id"])
+            if len(saved_gif_ids) % settings.gif_download_commit_batch_size == 0:
+                with metrics.timed(metrics.DB_COMMIT_SECONDS.labels("save_gif_to_db")):
+                    await session.commit()
+                committed_gif_ids = set(saved_gif_ids)
 
-    session.commit()
-    return
+        with metrics.timed(metrics.DB_COMMIT_SECONDS.labels("save_gif_to_db")):
+            await session.commit()
+        committed_gif_ids = set(saved_gif_ids)
+    finally:
+        # an interrupted batch is rolled back, its jobs are rescheduled like every other failed download
+        await session.rollback()
+        metrics.GIFS_SAVED.inc(len(committed_gif_ids))
+        for claimed in claimed_gifs:
+            if claimed.id in committed_gif_ids:
+                gif_lookup_cache.invalidate(claimed.archillect_id)
+        if committed_gif_ids:
+            now_playing_cache.invalidate(NOW_PLAYING_KEY)
 
+        await download_queue.fail_gif_downloads(
+            session, [claimed.id for claimed in claimed_gifs if claimed.id not in committed_gif_ids]
+        )
 
-def save_gif_to_db(session: Session) -> None:
-    """Save scraped gif binary in db."""
-    not_saved_gifs = session.query(TrashTvArchillectData).filter(TrashTvArchillectData.gif_raw_data.is_(None)).all()
-    print(not_saved_gifs)
-    session.bulk_update_mappings(TrashTvArchillectData, [crawler.get_gif_binary(gif) for gif in not_saved_gifs])
-    session.commit()
-    return
+    _LOGGER.info("Saved gifs.", extra={"saved_gifs": len(committed_gif_ids), "claimed_gifs": len(claimed_gifs)})
+    return len(committed_gif_ids)
@@ -0,0 +1,179 @@
+"""Module that finds gifs Archillect re-posted under a new id, even if they were re-encoded.
+
+Every downloaded gif gets a 64 bit perceptual hash (dHash). Near-duplicates have hashes that differ in
+only a few bits, they are looked up in a BK-tree over the Hamming distance, which only visits the
+branches that can hold a match instead of comparing against every gif.
+"""
+import logging
+from typing import Any, Dict, Generic, List, Optional, Protocol, Tuple, TypeVar
+
+from PIL import Image
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import settings
+from ..blobstore import Blob
+from ..database.models.trashtv import TrashTvArchillectData
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_HASH_SIZE = 8
+_HASH_BITS = _HASH_SIZE * _HASH_SIZE
+_SIGN_BIT = 1 << (_HASH_BITS - 1)
+# grey levels two neighbouring pixels have to differ in for their bit to not just be noise
+_MIN_GRADIENT = 2
+
+
+class ImageFile(Protocol):
+    """Seekable binary file an image is read from, e.g. `io.BytesIO` or a `blobstore.BlobWriter`."""
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes, all that are left by default."""
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Move the stream position."""
+
+    def tell(self) -> int:
+        """Get the stream position."""
+
+
+def perceptual_hash(image_file: ImageFile, sample_frames: int = 4, min_gradients: int = 16) -> Optional[int]:
+    """Compute the dHash of an image, of animations the dHash of the average of evenly spaced frames.
+
+    The frames are shrunk to 9x8 grey pixels, every bit tells whether a pixel is brighter than its right neighbour.
+    Flat images, e.g. black, blank or faded gifs, all hash alike. They get no hash, if fewer than `min_gradients`
+    pixels noticeably differ from their right neighbour.
+    """
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        frame_count = getattr(image, "n_frames", 1)
+        steps = max(min(sample_frames, frame_count) - 1, 1)
+        frames = sorted({round(step * (frame_count - 1) / steps) for step in range(steps + 1)})
+
+        pixel_sums = [0] * ((_HASH_SIZE + 1) * _HASH_SIZE)
+        for frame in frames:
+            image.seek(frame)
+            pixels = image.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.BILINEAR).tobytes()
+            pixel_sums = [pixel_sum + pixel for pixel_sum, pixel in zip(pixel_sums, pixels)]
+
+    image_hash = 0
+    gradients = 0
+    for row in range(_HASH_SIZE):
+        for column in range(_HASH_SIZE):
+            left = pixel_sums[row * (_HASH_SIZE + 1) + column]
+            right = pixel_sums[row * (_HASH_SIZE + 1) + column + 1]
+            image_hash = image_hash << 1 | (left > right)
+            gradients += abs(left - right) >= _MIN_GRADIENT * len(frames)
+
+    if gradients < min_gradients:
+        return None
+    return to_signed(image_hash)
+
+
+def to_signed(image_hash: int) -> int:
+    """Map an unsigned 64 bit hash onto a signed one, as Postgres only knows signed `bigint`."""
+    return image_hash - (1 << _HASH_BITS) if image_hash & _SIGN_BIT else image_hash
+
+
+def hamming_distance(first_hash: int, second_hash: int) -> int:
+    """Count the bits two hashes differ in."""
+    return bin((first_hash ^ second_hash) & ((1 << _HASH_BITS) - 1)).count("1")
+
+
+class BKTree(Generic[T]):
+    """Burkhard-Keller tree of hashes under the Hamming distance.
+
+    Every child hangs off its parent at its distance to the parent. By the triangle inequality a search for
+    hashes within `max_distance` of a hash only has to descend into children at `distance ± max_distance`.
+    """
+
+    def __init__(self) -> None:
+        # node: (hash, value, children by distance to the node)
+        self._root: Optional[Tuple[int, T, Dict[int, Any]]] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Count the hashes in the tree."""
+        return self._size
+
+    def add(self, image_hash: int, value: T) -> None:
+        """Add `image_hash` with its `value`, equal hashes keep their first value."""
+        self._size += 1
+        if self._root is None:
+            self._root = (image_hash, value, {})
+            return
+
+        node = self._root
+        while True:
+            node_hash, _, children = node
+            distance = hamming_distance(image_hash, node_hash)
+            if distance == 0:
+                self._size -= 1
+                return
+            if distance not in children:
+                children[distance] = (image_hash, value, {})
+                return
+            node = children[distance]
+
+    def search(self, image_hash: int, max_distance: int) -> List[Tuple[int, T]]:
+        """Find all values whose hash is at most `max_distance` bits off, as `(distance, value)`, nearest first."""
+        matches = []
+        nodes = [self._root] if self._root is not None else []
+        while nodes:
+            node_hash, value, children = nodes.pop()
+            distance = hamming_distance(image_hash, node_hash)
+            if distance <= max_distance:
+                matches.append((distance, value))
+            for child_distance in range(max(distance - max_distance, 1), distance + max_distance + 1):
+                if child_distance in children:
+                    nodes.append(children[child_distance])
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class DedupIndex:
+    """The stored blobs of all downloaded gifs by perceptual hash, loaded from db on first use."""
+
+    def __init__(self) -> None:
+        self._tree: BKTree[Blob] = BKTree()
+        self.is_loaded = False
+
+    async def load(self, session: AsyncSession) -> None:
+        """Load all hashed gifs, unless already loaded."""
+        if self.is_loaded:
+            return
+
+        hashed_gifs = await session.execute(
+            select(
+                [
+                    TrashTvArchillectData.gif_dhash,
+                    TrashTvArchillectData.gif_sha256,
+                    TrashTvArchillectData.gif_size_in_bytes,
+                    TrashTvArchillectData.gif_mime_type,
+                ]
+            ).where(and_(TrashTvArchillectData.gif_dhash.isnot(None), TrashTvArchillectData.gif_sha256.isnot(None)))
+        )
+        for gif_dhash, sha256, size, mime_type in hashed_gifs:
+            self._tree.add(gif_dhash, Blob(sha256=sha256, size=size, mime_type=mime_type))
+        self.is_loaded = True
+        _LOGGER.info("Loaded dedup index.", extra={"hashed_gifs": len(self._tree)})
+
+    def find(self, image_hash: int) -> Optional[Blob]:
+        """Find the stored blob of the nearest gif within `gif_dedup_max_distance`."""
+        matches = self._tree.search(image_hash, settings.gif_dedup_max_distance)
+        return matches[0][1] if matches else None
+
+    def add(self, image_hash: int, blob: Blob) -> None:
+        """Index a stored gif."""
+        self._tree.add(image_hash, blob)
+
+    def reset(self) -> None:
+        """Forget all gifs, they are loaded again on next use."""
+        self._tree = BKTree()
+        self.is_loaded = False
+
+
+dedup_index = DedupIndex()
@@ -0,0 +1,112 @@
+"""Module that handels the durable queue of gifs still to download.
+
+Every gif without a saved binary has a row in `TRASH_TV_GIF_DOWNLOAD_JOB`. Workers claim due jobs with
+`FOR UPDATE SKIP LOCKED`, so concurrent workers never download the same gif. A claim leases the job by
+pushing `next_attempt_at` ahead by `gif_download_lease_in_seconds`, jobs of a crashed worker become due
+again once their lease runs out. Failed jobs are retried with exponential backoff and dead-lettered after
+`gif_download_max_attempts` attempts.
+"""
+import logging
+from datetime import timedelta
+from typing import Any, Iterable, List
+
+from sqlalchemy import Float, Interval, and_, case, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import settings
+from ..database.models.trashtv import TrashTvArchillectData, TrashTvGifDownloadJob
+
+_LOGGER = logging.getLogger(__name__)
+
+PENDING = "pending"
+DEAD = "dead"
+
+
+async def enqueue_gif_downloads(session: AsyncSession, gif_ids: Iterable[Any]) -> None:
+    """Add download jobs for `gif_ids`, gifs already queued are skipped. Does not commit."""
+    job_rows = [{"gif_id": gif_id} for gif_id in gif_ids]
+    if not job_rows:
+        return
+
+    await session.execute(
+        insert(TrashTvGifDownloadJob).values(job_rows).on_conflict_do_nothing(index_elements=["gif_id"])
+    )
+
+
+async def claim_gif_downloads(session: AsyncSession, limit: int) -> List[Any]:
+    """Claim up to `limit` due download jobs, oldest first, and commit the claim.
+
+    Every claim counts as an attempt. Returns rows with the `id`, `archillect_id` and `source_link`
+    of the claimed gifs.
+    """
+    due_jobs = (
+        select([TrashTvGifDownloadJob.gif_id])
+        .where(and_(TrashTvGifDownloadJob.status == PENDING, TrashTvGifDownloadJob.next_attempt_at <= func.now()))
+        .order_by(TrashTvGifDownloadJob.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = await session.execute(
+        update(TrashTvGifDownloadJob.__table__)
+        .where(
+            and_(
+                TrashTvGifDownloadJob.gif_id.in_(due_jobs),
+                TrashTvGifDownloadJob.gif_id == TrashTvArchillectData.id,
+            )
+        )
+        .values(
+            attempts=TrashTvGifDownloadJob.attempts + 1,
+            next_attempt_at=func.now() + literal(timedelta(seconds=settings.gif_download_lease_in_seconds), Interval),
+        )
+        .returning(
+            TrashTvGifDownloadJob.gif_id.label("id"),
+            TrashTvArchillectData.archillect_id,
+            TrashTvArchillectData.source_link,
+        )
+    )
+    claimed_gifs = list(claimed)
+    await session.commit()
+    return claimed_gifs
+
+
+async def complete_gif_download(session: AsyncSession, gif_id: Any) -> None:
+    """Remove the job of the downloaded gif `gif_id`. Does not commit."""
+    await session.execute(delete(TrashTvGifDownloadJob.__table__).where(TrashTvGifDownloadJob.gif_id == gif_id))
+
+
+async def fail_gif_downloads(session: AsyncSession, gif_ids: Iterable[Any]) -> None:
+    """Schedule the next attempt of failed jobs with exponential backoff, dead-letter exhausted jobs and commit."""
+    gif_ids = list(gif_ids)
+    if not gif_ids:
+        return
+
+    exponential_backoff = func.power(literal(2.0, Float), TrashTvGifDownloadJob.attempts - 1)
+    backoff_in_seconds = func.least(
+        literal(settings.gif_download_retry_base_in_seconds, Float) * exponential_backoff,
+        literal(settings.gif_download_retry_max_in_seconds, Float),
+    )
+    failed = await session.execute(
+        update(TrashTvGifDownloadJob.__table__)
+        .where(TrashTvGifDownloadJob.gif_id.in_(gif_ids))
+        .values(
+            status=case([(TrashTvGifDownloadJob.attempts >= settings.gif_download_max_attempts, DEAD)], else_=PENDING),
+            next_attempt_at=func.now() + literal(timedelta(seconds=1), Interval) * backoff_in_seconds,
+        )
+        .returning(TrashTvGifDownloadJob.gif_id, TrashTvGifDownloadJob.status)
+    )
+    dead_gif_ids = [gif_id for gif_id, status in failed if status == DEAD]
+    await session.commit()
+
+    if dead_gif_ids:
+        _LOGGER.error("Gave up on gif downloads.", extra={"gif_ids": dead_gif_ids})
+
+
+async def count_pending_gif_downloads(session: AsyncSession) -> int:
+    """Count the jobs not dead-lettered yet, due or not."""
+    pending_jobs: int = await session.scalar(
+        select([func.count()])
+        .select_from(TrashTvGifDownloadJob.__table__)
+        .where(TrashTvGifDownloadJob.status == PENDING)
+    )
+    return pending_jobs
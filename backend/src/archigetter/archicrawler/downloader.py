@@ -0,0 +1,124 @@
+"""Module that handels downloading many gifs concurrently, politely and with retries."""
+import asyncio
+import logging
+from io import BytesIO
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from httpx import URL, HTTPError
+
+from .. import metrics, settings
+from ..database.models.trashtv import TrashTvArchillectData
+from . import crawler
+from .limits import ByteBudget, HostRateLimiter
+
+_LOGGER = logging.getLogger(__name__)
+
+# (gif id, (sink, reserved bytes) or `None` if the download failed)
+_Download = Tuple[Any, Optional[Tuple[crawler.GifSink, int]]]
+
+
+async def _download_with_retry(
+    gif: TrashTvArchillectData,
+    open_sink: Callable[[], crawler.GifSink],
+    rate_limiter: HostRateLimiter,
+    byte_budget: ByteBudget,
+) -> Optional[Tuple[crawler.GifSink, int]]:
+    """Stream a single gif into a fresh sink, retry transient failures with exponential backoff."""
+    host = URL(str(gif.source_link)).host
+
+    for attempt in range(settings.gif_download_retries + 1):
+        await rate_limiter.wait(host)
+        sink = open_sink()
+        try:
+            with metrics.timed(metrics.GIF_DOWNLOAD_SECONDS):
+                reserved_bytes = await crawler.get_gif_binary(gif, sink, byte_budget)
+        except crawler.GifTooLargeError as e:
+            sink.close()
+            _LOGGER.warning("Gif is too large.", extra={"gif_id": gif.id, "exception": e})
+            return None
+        except (HTTPError, asyncio.TimeoutError) as e:
+            sink.close()
+            if attempt == settings.gif_download_retries:
+                _LOGGER.warning("Giving up on gif download.", extra={"gif_id": gif.id, "exception": e})
+                return None
+
+            backoff = settings.gif_download_retry_backoff_in_seconds * 2 ** attempt
+            _LOGGER.info("Retrying gif download.", extra={"gif_id": gif.id, "attempt": attempt, "backoff": backoff})
+            await asyncio.sleep(backoff)
+            continue
+        except Exception as e:
+            # a broken response or sink only fails this gif, never the whole batch
+            sink.close()
+            _LOGGER.exception("Gif download failed.", extra={"gif_id": gif.id, "exception": e})
+            return None
+        except BaseException:
+            sink.close()
+            raise
+
+        if reserved_bytes is None:
+            sink.close()
+            return None
+
+        sink.seek(0)
+        return sink, reserved_bytes
+
+    return None
+
+
+async def download_gifs(
+    gifs: Iterable[TrashTvArchillectData], open_sink: Callable[[], crawler.GifSink] = BytesIO
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Download gifs concurrently and yield every successful download as soon as it is done.
+
+    Every gif is streamed into its own sink opened by `open_sink`. The yielded sink is only valid until
+    the next download is requested, it is closed and its bytes are released from the in-flight budget then.
+    Closing the generator early cancels the running downloads and closes the sinks nobody got to see.
+
+    At most `gif_download_concurrency` downloads run at the same time, requests to the same host are spaced
+    out by `gif_download_requests_per_second_per_host` and all downloads together hold at most
+    `gif_download_max_bytes_in_flight` bytes. Failed downloads, whatever they failed on, are skipped.
+    """
+    semaphore = asyncio.Semaphore(settings.gif_download_concurrency)
+    rate_limiter = HostRateLimiter(settings.gif_download_requests_per_second_per_host)
+    byte_budget = ByteBudget(settings.gif_download_max_bytes_in_flight)
+
+    async def _download(gif: TrashTvArchillectData) -> _Download:
+        async with semaphore:
+            return gif.id, await _download_with_retry(gif, open_sink, rate_limiter, byte_budget)
+
+    pending = {asyncio.ensure_future(_download(gif)) for gif in gifs}
+    unconsumed: Set["asyncio.Future[_Download]"] = set()
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            unconsumed = set(done)
+            for download in done:
+                unconsumed.discard(download)
+                gif_id, downloaded = download.result()
+                if downloaded is None:
+                    continue
+
+                sink, reserved_bytes = downloaded
+                try:
+                    yield {"id": gif_id, "sink": sink}
+                finally:
+                    sink.close()
+                    await byte_budget.release(reserved_bytes)
+    finally:
+        await _discard_downloads(pending | unconsumed)
+
+
+async def _discard_downloads(downloads: Set["asyncio.Future[_Download]"]) -> None:
+    """Cancel the downloads nobody waits for anymore and close the sinks of those that finished regardless."""
+    for download in downloads:
+        download.cancel()
+    if downloads:
+        await asyncio.wait(downloads)
+
+    for download in downloads:
+        if download.cancelled() or download.exception() is not None:
+            continue
+
+        _, downloaded = download.result()
+        if downloaded is not None:
+            downloaded[0].close()
@@ -0,0 +1,110 @@
+"""Module that pulls the elements we care about out of the Archillect TV html.
+
+Every extractor takes the raw html and the element ids to look for and returns the attributes of
+every found element, plus its text as `"text"`. Elements that are not in the page are left out.
+"""
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bs4 import BeautifulSoup
+
+HtmlElements = Dict[str, Dict[str, str]]
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_CSS_URL = re.compile(r"""url\(\s*(?P<quote>['"]?)(?P<url>.*?)(?P=quote)\s*\)""", re.IGNORECASE | re.DOTALL)
+
+
+def css_url(style: str) -> Optional[str]:
+    """Get the first `url(...)` of a css declaration, quoted or not, `None` if there is none."""
+    match = _CSS_URL.search(style)
+    return match.group("url").strip() if match else None
+
+
+class _AllElementsFound(Exception):
+    """Raised to stop parsing as soon as nothing is left to find."""
+
+
+class _ElementParser(HTMLParser):
+    """Parser that records the wanted elements and stops once all of them are complete."""
+
+    def __init__(self, element_ids: Iterable[str]) -> None:
+        super().__init__(convert_charrefs=True)
+        self.missing_ids: Set[str] = set(element_ids)
+        self.elements: HtmlElements = {}
+        self._open_id: Optional[str] = None
+        self._open_tag = ""
+        self._open_depth = 0
+        self._open_text: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._open_id is not None:
+            if tag == self._open_tag:
+                self._open_depth += 1
+            return
+
+        element_id = next((value for name, value in attrs if name == "id"), None)
+        if element_id is None or element_id not in self.missing_ids:
+            return
+
+        self.elements[element_id] = {name: value or "" for name, value in attrs}
+        self._open_id, self._open_tag, self._open_depth, self._open_text = element_id, tag, 1, []
+        if tag in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if self._open_id is not None and tag == self._open_tag:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._open_id is not None:
+            self._open_text.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._open_id is None or tag != self._open_tag:
+            return
+
+        self._open_depth -= 1
+        if self._open_depth > 0:
+            return
+
+        self.elements[self._open_id]["text"] = "".join(self._open_text)
+        self.missing_ids.discard(self._open_id)
+        self._open_id = None
+        if not self.missing_ids:
+            raise _AllElementsFound()
+
+
+def extract_streaming(html: str, element_ids: Iterable[str]) -> HtmlElements:
+    """Find the elements with a streaming parser that stops right after the last of them, no tree is built."""
+    parser = _ElementParser(element_ids)
+    try:
+        parser.feed(html)
+        parser.close()
+    except _AllElementsFound:
+        pass
+
+    return parser.elements
+
+
+def extract_bs4(html: str, element_ids: Iterable[str]) -> HtmlElements:
+    """Find the elements in a full `BeautifulSoup` tree."""
+    crawled_data = BeautifulSoup(html, "html.parser")
+
+    elements: HtmlElements = {}
+    for element_id in element_ids:
+        element = crawled_data.find(id=element_id)
+        if element is None:
+            continue
+
+        attrs = {name: " ".join(value) if isinstance(value, list) else value for name, value in element.attrs.items()}
+        elements[element_id] = {**attrs, "text": element.get_text()}
+
+    return elements
+
+
+EXTRACTORS: Dict[str, Callable[[str, Iterable[str]], HtmlElements]] = {
+    "streaming": extract_streaming,
+    "bs4": extract_bs4,
+}
@@ -0,0 +1,50 @@
+"""Module that contains the limits shared by all concurrent gif downloads."""
+import asyncio
+from typing import Dict
+
+
+class HostRateLimiter:
+    """Space out requests to the same host by a minimum interval."""
+
+    def __init__(self, requests_per_second: float) -> None:
+        self._interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host: str) -> None:
+        """Wait until the next request to `host` is allowed."""
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ByteBudget:
+    """Cap the number of bytes all running downloads may hold at once.
+
+    Every download reserves the room it needs before reading the response body and
+    releases it once its bytes are persisted. A single reservation may never exceed the budget.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.available_bytes = max_bytes
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, n_bytes: int) -> None:
+        """Wait until `n_bytes` are available and reserve them."""
+        if n_bytes > self.max_bytes:
+            raise ValueError(f"Can not reserve {n_bytes} bytes from a budget of {self.max_bytes} bytes.")
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.available_bytes >= n_bytes)
+            self.available_bytes -= n_bytes
+
+    async def release(self, n_bytes: int) -> None:
+        """Give `n_bytes` back to the budget."""
+        async with self._condition:
+            self.available_bytes += n_bytes
+            self._condition.notify_all()
@@ -1,3 +1,19 @@
 """Package for gathering the correct trash to send."""
+from .broadcaster import NOW_PLAYING_CHANNEL, broadcast_trash, publish_now_playing
+from .crud import get_gif, get_now_playing, get_play_count
+from .hub import TrashHub, TrashSubscriber, trash_hub
+from .queue import Playlist, playlist
 
-__all__ = [""]
+__all__ = [
+    "NOW_PLAYING_CHANNEL",
+    "broadcast_trash",
+    "get_gif",
+    "get_now_playing",
+    "get_play_count",
+    "Playlist",
+    "playlist",
+    "publish_now_playing",
+    "TrashHub",
+    "TrashSubscriber",
+    "trash_hub",
+]
@@ -0,0 +1,72 @@
+"""Module that produces the trash every viewer gets to see.
+
+The worker recording a new gif publishes the gif now playing on `NOW_PLAYING_CHANNEL`, the broadcaster
+of every API process pushes it on to its viewers right away. The db is only read on start and as fallback,
+when nothing was published for `trash_broadcast_fallback_period_in_seconds`.
+"""
+import asyncio
+import json
+import logging
+
+from .. import settings
+from ..cache import NOW_PLAYING_KEY, now_playing_cache
+from ..database import get_db_trashtv_async_session
+from ..pubsub import get_pubsub
+from . import crud
+from .hub import TrashHub
+
+_LOGGER = logging.getLogger(__name__)
+
+NOW_PLAYING_CHANNEL = "trashtv_now_playing"
+
+
+async def _load_now_playing_message() -> str:
+    async with get_db_trashtv_async_session() as trashtv_db_session:
+        return json.dumps({"data": await crud.get_now_playing(trashtv_db_session)})
+
+
+async def publish_now_playing() -> None:
+    """Publish the gif now playing to the broadcasters of all processes.
+
+    Failing to publish is only logged, broadcasters catch up on their fallback read.
+    """
+    try:
+        message = await _load_now_playing_message()
+        await get_pubsub().publish(NOW_PLAYING_CHANNEL, message)
+    except Exception as e:
+        _LOGGER.error("Could not publish trash.", extra={"exception": e})
+
+
+def _receive_now_playing_message(message: str) -> None:
+    """Keep the cached gif now playing in line with what another process published."""
+    now_playing = json.loads(message)["data"]
+    if now_playing is None:
+        now_playing_cache.invalidate(NOW_PLAYING_KEY)
+    else:
+        now_playing_cache.set(NOW_PLAYING_KEY, now_playing)
+
+
+async def broadcast_trash(hub: TrashHub) -> None:
+    """Publish the gif now playing to all viewers whenever it changes.
+
+    There is a single broadcaster per process, no matter how many viewers are connected.
+    """
+    while True:
+        try:
+            async with get_pubsub().subscribe(NOW_PLAYING_CHANNEL) as subscription:
+                # read only once subscribed, so no change is missed in between
+                message = await _load_now_playing_message()
+                while True:
+                    if message != hub.last_message:
+                        hub.publish(message)
+
+                    try:
+                        message = await asyncio.wait_for(
+                            subscription.get(), timeout=settings.trash_broadcast_fallback_period_in_seconds
+                        )
+                        _receive_now_playing_message(message)
+                    except asyncio.TimeoutError:
+                        message = await _load_now_playing_message()
+        except Exception as e:
+            _LOGGER.error("Could not broadcast trash.", extra={"exception": e})
+            await asyncio.sleep(settings.pubsub_reconnect_interval_in_seconds)
@@ -1 +1,155 @@
 """Module that handels all crud operations concerning the trash queue."""
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import settings
+from ..cache import NOW_PLAYING_KEY, gif_lookup_cache, now_playing_cache
+from ..database.models.trashtv import (
+    TrashTvArchillectData,
+    TrashTvArchillectHistory,
+    TrashTvArchillectPlayCount,
+    TrashTvGifRendition,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+POSTER_FORMAT = "poster"
+
+
+async def _get_renditions(session: AsyncSession, gif_sha256: str) -> List[Any]:
+    result = await session.execute(
+        select([TrashTvGifRendition.format, TrashTvGifRendition.size_in_bytes, TrashTvGifRendition.mime_type]).where(
+            and_(TrashTvGifRendition.gif_sha256 == gif_sha256, TrashTvGifRendition.sha256.isnot(None))
+        )
+    )
+    return list(result)
+
+
+async def get_now_playing(session: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Get the gif that was last seen on screen on Archillect, `None` if nothing was recorded yet.
+
+    `formats` lists the downloaded gif and its video renditions, smallest first, so clients can pick
+    the smallest format they support. Served from the `now_playing_cache` while cached.
+    """
+    cached_now_playing = now_playing_cache.get(NOW_PLAYING_KEY)
+    if cached_now_playing is not None:
+        return cached_now_playing
+
+    result = await session.execute(
+        select(
+            [
+                TrashTvArchillectData.archillect_id,
+                TrashTvArchillectData.source_link,
+                TrashTvArchillectData.gif_sha256,
+                TrashTvArchillectData.gif_size_in_bytes,
+                TrashTvArchillectData.gif_mime_type,
+                TrashTvArchillectHistory.timestamp,
+            ]
+        )
+        .select_from(
+            TrashTvArchillectData.__table__.join(
+                TrashTvArchillectHistory.__table__,
+                TrashTvArchillectHistory.gif_id == TrashTvArchillectData.archillect_id,
+            )
+        )
+        .where(TrashTvArchillectHistory.css_id == settings.archillect_tv_on_screen_css_id)
+        .order_by(TrashTvArchillectHistory.timestamp.desc())
+        .limit(1)
+    )
+    now_playing = result.first()
+
+    if now_playing is None:
+        return None
+
+    gif_url = f"/gif/{now_playing.archillect_id}"
+    formats = []
+    poster_url = None
+    if now_playing.gif_sha256:
+        formats.append({"url": gif_url, "mime_type": now_playing.gif_mime_type, "size": now_playing.gif_size_in_bytes})
+        for rendition in await _get_renditions(session, now_playing.gif_sha256):
+            rendition_url = f"{gif_url}/{rendition.format}"
+            if rendition.format == POSTER_FORMAT:
+                poster_url = rendition_url
+            else:
+                formats.append(
+                    {"url": rendition_url, "mime_type": rendition.mime_type, "size": rendition.size_in_bytes}
+                )
+
+    now_playing_gif = {
+        "archillect_id": now_playing.archillect_id,
+        "source_link": now_playing.source_link,
+        "gif_url": gif_url if now_playing.gif_sha256 else None,
+        "poster_url": poster_url,
+        "formats": sorted(formats, key=lambda gif_format: int(gif_format["size"])),
+        "played_at": now_playing.timestamp.isoformat(),
+    }
+    now_playing_cache.set(NOW_PLAYING_KEY, now_playing_gif)
+    return now_playing_gif
+
+
+async def get_gif(
+    session: AsyncSession, archillect_id: str, rendition_format: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Get the blob address of a downloaded gif, `None` if the gif is unknown or not downloaded yet.
+
+    With `rendition_format` the address of that rendition of the gif is returned instead.
+    Only existing blobs are cached in the `gif_lookup_cache`, they never change.
+    """
+    cache_key = archillect_id if rendition_format is None else f"{archillect_id}/{rendition_format}"
+    cached_gif = gif_lookup_cache.get(cache_key)
+    if cached_gif is not None:
+        return cached_gif
+
+    if rendition_format is None:
+        query = select(
+            [
+                TrashTvArchillectData.gif_sha256.label("sha256"),
+                TrashTvArchillectData.gif_size_in_bytes.label("size"),
+                TrashTvArchillectData.gif_mime_type.label("mime_type"),
+            ]
+        ).where(TrashTvArchillectData.gif_sha256.isnot(None))
+    else:
+        query = (
+            select(
+                [
+                    TrashTvGifRendition.sha256,
+                    TrashTvGifRendition.size_in_bytes.label("size"),
+                    TrashTvGifRendition.mime_type,
+                ]
+            )
+            .select_from(
+                TrashTvGifRendition.__table__.join(
+                    TrashTvArchillectData.__table__,
+                    TrashTvArchillectData.gif_sha256 == TrashTvGifRendition.gif_sha256,
+                )
+            )
+            .where(and_(TrashTvGifRendition.format == rendition_format, TrashTvGifRendition.sha256.isnot(None)))
+        )
+    result = await session.execute(query.where(TrashTvArchillectData.archillect_id == archillect_id))
+    gif = result.first()
+
+    if gif is None:
+        return None
+
+    blob_address = {"sha256": gif.sha256, "size": gif.size, "mime_type": gif.mime_type}
+    gif_lookup_cache.set(cache_key, blob_address)
+    return blob_address
+
+
+async def get_play_count(session: AsyncSession, archillect_id: str) -> int:
+    """Count how often a gif was on screen, including compacted history."""
+    compacted_plays = await session.scalar(
+        select(func.coalesce(func.sum(TrashTvArchillectPlayCount.play_count), 0)).where(
+            TrashTvArchillectPlayCount.gif_id == archillect_id
+        )
+    )
+    recent_plays = await session.scalar(
+        select([func.count()])
+        .select_from(TrashTvArchillectHistory.__table__)
+        .where(TrashTvArchillectHistory.gif_id == archillect_id)
+        .where(TrashTvArchillectHistory.css_id == settings.archillect_tv_on_screen_css_id)
+    )
+    return int(compacted_plays) + int(recent_plays)
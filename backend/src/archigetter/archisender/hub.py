@@ -0,0 +1,83 @@
+"""Module that fans out trash to every connected viewer."""
+import asyncio
+import logging
+from typing import Optional, Set
+
+from .. import settings
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TrashSubscriber:
+    """A viewer of the hub with its own bounded queue of pending messages.
+
+    A `None` message tells the viewer that it was dropped for being too slow.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=queue_size)
+        self.skipped_messages = 0
+        self.is_dropped = False
+
+
+class TrashHub:
+    """Fan out every published message to all subscribers.
+
+    Publishing never waits for a viewer: if a viewer's queue is full its oldest message is skipped,
+    and a viewer that skipped `max_skipped_messages` messages in a row is dropped.
+    Messages are published pre-serialized, so every viewer only costs a queue push.
+    """
+
+    def __init__(self, queue_size: int, max_skipped_messages: int) -> None:
+        self.queue_size = queue_size
+        self.max_skipped_messages = max_skipped_messages
+        self.last_message: Optional[str] = None
+        self._subscribers: Set[TrashSubscriber] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        """Count the connected viewers."""
+        return len(self._subscribers)
+
+    def subscribe(self) -> TrashSubscriber:
+        """Add a viewer, it receives the last published message right away."""
+        subscriber = TrashSubscriber(self.queue_size)
+        if self.last_message is not None:
+            subscriber.queue.put_nowait(self.last_message)
+
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: TrashSubscriber) -> None:
+        """Remove a viewer."""
+        self._subscribers.discard(subscriber)
+
+    def publish(self, message: str) -> None:
+        """Queue `message` for every viewer."""
+        self.last_message = message
+
+        for subscriber in list(self._subscribers):
+            if not subscriber.queue.full():
+                subscriber.skipped_messages = 0
+                subscriber.queue.put_nowait(message)
+                continue
+
+            subscriber.skipped_messages += 1
+            if subscriber.skipped_messages >= self.max_skipped_messages:
+                self._drop(subscriber)
+                continue
+
+            subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(message)
+
+    def _drop(self, subscriber: TrashSubscriber) -> None:
+        _LOGGER.warning("Dropping slow trash viewer.", extra={"skipped_messages": subscriber.skipped_messages})
+        self.unsubscribe(subscriber)
+        subscriber.is_dropped = True
+
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+
+trash_hub = TrashHub(settings.trash_client_queue_size, settings.trash_client_max_skipped_messages)
@@ -0,0 +1,212 @@
+"""Module that keeps a rolling playlist of downloaded gifs, so picking the next gif never waits for the db.
+
+The playlist walks through all downloaded gifs in batches along the unique index on `archillect_id`. Every
+batch is shuffled weighted by how often and how recently the gifs were on screen on Archillect: rarely and long
+ago played gifs come first. Gifs played within the last `no_repeat_window` picks are skipped, keyed by blob, so
+re-posts do not repeat either. Once the playlist runs low it is refilled in the background.
+"""
+import asyncio
+import logging
+import random
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import settings
+from ..database import get_db_trashtv_async_session
+from ..database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory, TrashTvArchillectPlayCount
+
+_LOGGER = logging.getLogger(__name__)
+
+_MIN_WEIGHT = 0.01
+
+
+def weight(
+    play_count: int, last_played: Optional[datetime], now: datetime, recency_horizon_in_seconds: float
+) -> float:
+    """Weigh a gif for the shuffle, fewer plays and a longer time since the last play weigh more.
+
+    Gifs not played within `recency_horizon_in_seconds` count as never played recently.
+    """
+    recency = 1.0
+    if last_played is not None:
+        recency = min((now - last_played).total_seconds() / recency_horizon_in_seconds, 1.0)
+    return max(recency / (1 + play_count), _MIN_WEIGHT)
+
+
+class Playlist:
+    """Rolling playlist of up to `size` gifs, picking the next gif is O(1)."""
+
+    def __init__(
+        self,
+        size: int,
+        refill_batch_size: int,
+        no_repeat_window: int,
+        recency_horizon_in_seconds: float,
+        generator: Optional[random.Random] = None,
+    ) -> None:
+        self.size = size
+        self.refill_batch_size = refill_batch_size
+        self.no_repeat_window = no_repeat_window
+        self.recency_horizon_in_seconds = recency_horizon_in_seconds
+        self.generator = generator or random.Random()
+        self._upcoming: Deque[Dict[str, Any]] = deque()
+        # blobs of the upcoming and the recently picked gifs, none of them is queued again
+        self._recent: Deque[str] = deque()
+        self._blocked: Set[str] = set()
+        self._cursor = ""
+        self._refill: Optional["asyncio.Future[int]"] = None
+
+    def __len__(self) -> int:
+        """Count the upcoming gifs."""
+        return len(self._upcoming)
+
+    def next(self) -> Optional[Dict[str, Any]]:
+        """Pick the next gif, `None` if the playlist is empty. Starts a refill once it runs low."""
+        if len(self._upcoming) <= self.size // 2:
+            self._start_refill()
+        if not self._upcoming:
+            return None
+
+        gif = self._upcoming.popleft()
+        self._recent.append(gif["sha256"])
+        while len(self._recent) > self.no_repeat_window:
+            self._blocked.discard(self._recent.popleft())
+        return {key: value for key, value in gif.items() if key != "sha256"}
+
+    def _start_refill(self) -> None:
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.ensure_future(self._refill_in_background())
+
+    async def _refill_in_background(self) -> int:
+        try:
+            async with get_db_trashtv_async_session() as trashtv_db_session:
+                return await self.refill(trashtv_db_session)
+        except Exception as e:
+            _LOGGER.error("Could not refill playlist.", extra={"exception": e})
+            return 0
+
+    async def _next_batch(self, session: AsyncSession) -> List[Any]:
+        """Read the next batch of downloaded gifs after the cursor, wrapping around at the end."""
+        batch_query = (
+            select(
+                [
+                    TrashTvArchillectData.archillect_id,
+                    TrashTvArchillectData.source_link,
+                    TrashTvArchillectData.gif_sha256,
+                ]
+            )
+            .where(TrashTvArchillectData.gif_sha256.isnot(None))
+            .order_by(TrashTvArchillectData.archillect_id)
+            .limit(self.refill_batch_size)
+        )
+        batch = list(await session.execute(batch_query.where(TrashTvArchillectData.archillect_id > self._cursor)))
+        if len(batch) < self.refill_batch_size:
+            self._cursor = ""
+        else:
+            self._cursor = batch[-1].archillect_id
+        return batch
+
+    async def _play_stats(self, session: AsyncSession, archillect_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Count the plays of gifs and find their last play, from the history and the compacted play counts."""
+        stats: Dict[str, Dict[str, Any]] = {
+            archillect_id: {"play_count": 0, "last_played": None} for archillect_id in archillect_ids
+        }
+
+        recent_plays = await session.execute(
+            select([TrashTvArchillectHistory.gif_id, func.count(), func.max(TrashTvArchillectHistory.timestamp)])
+            .where(
+                and_(
+                    TrashTvArchillectHistory.gif_id.in_(archillect_ids),
+                    TrashTvArchillectHistory.css_id == settings.archillect_tv_on_screen_css_id,
+                )
+            )
+            .group_by(TrashTvArchillectHistory.gif_id)
+        )
+        for gif_id, play_count, last_played in recent_plays:
+            stats[gif_id] = {"play_count": play_count, "last_played": last_played}
+
+        compacted_plays = await session.execute(
+            select([TrashTvArchillectPlayCount.gif_id, func.sum(TrashTvArchillectPlayCount.play_count)])
+            .where(TrashTvArchillectPlayCount.gif_id.in_(archillect_ids))
+            .group_by(TrashTvArchillectPlayCount.gif_id)
+        )
+        for gif_id, play_count in compacted_plays:
+            stats[gif_id]["play_count"] += int(play_count)
+            # compacted history is older than the retention, far beyond any recency horizon
+        return stats
+
+    async def refill(self, session: AsyncSession) -> int:
+        """Top up the playlist to `size` gifs. Returns the number of queued gifs.
+
+        Reads at most one round through all gifs, if all of them were played too recently
+        the oldest half of the no-repeat window is forgotten.
+        """
+        queued_gifs = 0
+        start_cursor = self._cursor
+        wrapped = False
+        while len(self._upcoming) < self.size:
+            batch = await self._next_batch(session)
+            queued_gifs += self._queue_batch(
+                batch, await self._play_stats(session, [gif.archillect_id for gif in batch])
+            )
+            if self._cursor == "":
+                if wrapped or start_cursor == "":
+                    break
+                wrapped = True
+            elif wrapped and self._cursor >= start_cursor:
+                break
+        await session.commit()
+
+        if not self._upcoming and self._recent:
+            for _ in range((len(self._recent) + 1) // 2):
+                self._blocked.discard(self._recent.popleft())
+            return await self.refill(session)
+
+        _LOGGER.debug("Refilled playlist.", extra={"queued_gifs": queued_gifs, "upcoming_gifs": len(self._upcoming)})
+        return queued_gifs
+
+    def _queue_batch(self, batch: List[Any], stats: Dict[str, Dict[str, Any]]) -> int:
+        """Shuffle a batch weighted by play stats and queue the gifs not played lately."""
+        now = datetime.now(timezone.utc)
+        # weighted random order without replacement (Efraimidis-Spirakis)
+        keyed_gifs = []
+        for gif in batch:
+            gif_weight = weight(
+                stats[gif.archillect_id]["play_count"],
+                stats[gif.archillect_id]["last_played"],
+                now,
+                self.recency_horizon_in_seconds,
+            )
+            keyed_gifs.append((self.generator.random() ** (1 / gif_weight), gif))
+        keyed_gifs.sort(key=lambda keyed_gif: keyed_gif[0], reverse=True)
+
+        queued_gifs = 0
+        for _, gif in keyed_gifs:
+            if len(self._upcoming) >= self.size:
+                break
+            if gif.gif_sha256 in self._blocked:
+                continue
+
+            self._blocked.add(gif.gif_sha256)
+            self._upcoming.append(
+                {
+                    "archillect_id": gif.archillect_id,
+                    "source_link": gif.source_link,
+                    "gif_url": f"/gif/{gif.archillect_id}",
+                    "sha256": gif.gif_sha256,
+                }
+            )
+            queued_gifs += 1
+        return queued_gifs
+
+
+playlist = Playlist(
+    settings.playlist_size,
+    refill_batch_size=settings.playlist_refill_batch_size,
+    no_repeat_window=settings.playlist_no_repeat_window,
+    recency_horizon_in_seconds=settings.playlist_recency_horizon_in_seconds,
+)
@@ -0,0 +1,15 @@
+"""Package to store gif binaries and other blobs outside of the database."""
+from .base import Blob, BlobStore, BlobWriter
+from .local import LocalBlobStore
+from .s3 import S3BlobStore
+from .store import close_blob_store, get_blob_store
+
+__all__ = [
+    "Blob",
+    "BlobStore",
+    "BlobWriter",
+    "LocalBlobStore",
+    "S3BlobStore",
+    "close_blob_store",
+    "get_blob_store",
+]
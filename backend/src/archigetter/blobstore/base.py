@@ -0,0 +1,126 @@
+"""Module that defines the interface all blob stores share."""
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Optional
+
+# magic numbers of the formats we store, see https://en.wikipedia.org/wiki/List_of_file_signatures
+_MIME_TYPE_SIGNATURES = {
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x1a\x45\xdf\xa3": "video/webm",
+}
+_DEFAULT_MIME_TYPE = "application/octet-stream"
+
+
+def guess_mime_type(head: bytes) -> str:
+    """Guess the mime type of a blob from its first bytes."""
+    for signature, mime_type in _MIME_TYPE_SIGNATURES.items():
+        if head.startswith(signature):
+            return mime_type
+
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+
+    return _DEFAULT_MIME_TYPE
+
+
+class Blob(NamedTuple):
+    """Address and metadata of a stored blob."""
+
+    sha256: str
+    size: int
+    mime_type: str
+
+
+class BlobWriter:
+    """Writable sink that spools a new blob to a local temporary file and hashes it on the way.
+
+    Hand a finished writer to `BlobStore.put` to store it. Closing a writer that was not stored discards it.
+    """
+
+    def __init__(self, temp_dir: Optional[Path] = None) -> None:
+        if temp_dir:
+            temp_dir.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+        self.temp_path = Path(temp_path)
+        self._file = os.fdopen(file_descriptor, "w+b")
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self.size = 0
+
+    def write(self, chunk: bytes) -> int:
+        """Append `chunk` to the blob."""
+        if len(self._head) < 16:
+            self._head = (self._head + chunk)[:16]
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        return self._file.write(chunk)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move the read position of the spooled blob."""
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        """Get the read position of the spooled blob."""
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the spooled blob."""
+        return self._file.read(size)
+
+    def flush(self) -> None:
+        """Flush the spooled blob to disk."""
+        self._file.flush()
+
+    def blob(self) -> Blob:
+        """Get the address and metadata of the written blob."""
+        return Blob(sha256=self._hash.hexdigest(), size=self.size, mime_type=guess_mime_type(self._head))
+
+    @property
+    def closed(self) -> bool:
+        """Whether the writer was closed."""
+        return self._file.closed
+
+    def close(self) -> None:
+        """Close the writer and remove its temporary file if it still exists."""
+        self._file.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for binary data, every blob is stored once under its SHA-256."""
+
+    def open_writer(self) -> BlobWriter:
+        """Open a sink for a new blob."""
+        return BlobWriter()
+
+    @abstractmethod
+    async def put(self, writer: BlobWriter) -> Blob:
+        """Store the blob written to `writer` unless a blob with the same content already exists."""
+
+    @abstractmethod
+    async def exists(self, sha256: str) -> bool:
+        """Check whether a blob is stored."""
+
+    @abstractmethod
+    def read(self, sha256: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream the bytes of a blob from `start` up to, but excluding, `end`."""
+
+    @abstractmethod
+    async def delete(self, sha256: str) -> None:
+        """Remove a blob."""
+
+    def local_path(self, sha256: str) -> Optional[Path]:
+        """Get the path of a blob on the local file system, `None` if the blob is not stored locally."""
+        return None
+
+    async def close(self) -> None:
+        """Release all resources held by the store, nothing to release by default."""
+        return None
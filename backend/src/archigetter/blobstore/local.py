@@ -0,0 +1,80 @@
+"""Module that stores blobs on the local file system."""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .base import Blob, BlobStore, BlobWriter
+
+_LOGGER = logging.getLogger(__name__)
+
+_READ_CHUNK_SIZE = 64 * 1024
+_SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class LocalBlobStore(BlobStore):
+    """Store blobs as files below `root`, sharded by the first bytes of their hash."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._temp_dir = root / "tmp"
+
+    def _path(self, sha256: str) -> Path:
+        if not _SHA256_PATTERN.fullmatch(sha256):
+            raise ValueError(f"Not a SHA-256 hex digest: {sha256!r}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def open_writer(self) -> BlobWriter:
+        """Open a sink for a new blob next to the store, so storing it is an atomic rename."""
+        return BlobWriter(self._temp_dir)
+
+    async def put(self, writer: BlobWriter) -> Blob:
+        """Store the blob written to `writer` unless a blob with the same content already exists."""
+        blob = writer.blob()
+        path = self._path(blob.sha256)
+
+        writer.flush()
+        if path.exists():
+            _LOGGER.debug("Blob already stored.", extra={"sha256": blob.sha256})
+            writer.close()
+            return blob
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(writer.temp_path, path)
+        writer.close()
+        return blob
+
+    async def exists(self, sha256: str) -> bool:
+        """Check whether a blob is stored."""
+        return self._path(sha256).exists()
+
+    def _open(self, sha256: str, start: int) -> BinaryIO:
+        blob_file = self._path(sha256).open("rb")
+        blob_file.seek(start)
+        return blob_file
+
+    async def read(self, sha256: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream the bytes of a blob from `start` up to, but excluding, `end`, reading on the threadpool."""
+        blob_file = await run_in_threadpool(self._open, sha256, start)
+        with blob_file:
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk_size = _READ_CHUNK_SIZE if remaining is None else min(_READ_CHUNK_SIZE, remaining)
+                chunk = await run_in_threadpool(blob_file.read, chunk_size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, sha256: str) -> None:
+        """Remove a blob."""
+        self._path(sha256).unlink(missing_ok=True)
+
+    def local_path(self, sha256: str) -> Optional[Path]:
+        """Get the path of a blob on the local file system."""
+        path = self._path(sha256)
+        return path if path.exists() else None
@@ -0,0 +1,109 @@
+"""Module to move gif binaries out of the database into the blob store.
+
+Databases created before the blob store kept every gif in the `gif_raw_data` column and lack the
+perceptual hash deduplicating gifs.
+Run this once after upgrading:
+
+    python -m archigetter.blobstore.migrate [--batch-size 10] [--keep-column]
+
+Stop the service meanwhile. Adding the blob address columns and their indexes and dropping the legacy column
+lock the whole table, and the download job would download every gif not moved yet once more.
+"""
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from ..database import get_db_trashtv_session
+from ..database.models.trashtv import TrashTvArchillectData
+from .base import BlobStore
+from .store import close_blob_store, get_blob_store
+
+_LOGGER = logging.getLogger(__name__)
+
+_TABLE = TrashTvArchillectData.__tablename__
+_LEGACY_COLUMN = "gif_raw_data"
+
+
+def _add_blob_columns(session: Session) -> None:
+    """Add the blob address and perceptual hash columns to a table created before the blob store existed."""
+    session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN IF NOT EXISTS gif_sha256 VARCHAR(64)'))
+    session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN IF NOT EXISTS gif_size_in_bytes INTEGER'))
+    session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN IF NOT EXISTS gif_mime_type VARCHAR'))
+    session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN IF NOT EXISTS gif_dhash BIGINT'))
+    existing_indexes = {index["name"] for index in inspect(session.connection()).get_indexes(_TABLE)}
+    for index in TrashTvArchillectData.__table__.indexes:
+        if index.name not in existing_indexes:
+            index.create(session.connection())
+    session.commit()
+
+
+def _has_legacy_column(session: Session) -> bool:
+    columns = inspect(session.connection()).get_columns(_TABLE)
+    return any(column["name"] == _LEGACY_COLUMN for column in columns)
+
+
+async def migrate_gif_binaries(session: Session, blob_store: BlobStore, batch_size: int = 10) -> int:
+    """Move all gif binaries still stored in the db into `blob_store`, return the number of moved gifs."""
+    moved_gifs = 0
+    while True:
+        rows = session.execute(
+            text(f'SELECT id, {_LEGACY_COLUMN} FROM "{_TABLE}" WHERE {_LEGACY_COLUMN} IS NOT NULL LIMIT :batch_size'),
+            {"batch_size": batch_size},
+        ).all()
+        if not rows:
+            return moved_gifs
+
+        for row in rows:
+            writer = blob_store.open_writer()
+            writer.write(bytes(row[1]))
+            blob = await blob_store.put(writer)
+            session.execute(
+                text(
+                    f'UPDATE "{_TABLE}" SET gif_sha256 = :sha256, gif_size_in_bytes = :size, '
+                    f"gif_mime_type = :mime_type, {_LEGACY_COLUMN} = NULL WHERE id = :id"
+                ),
+                {"sha256": blob.sha256, "size": blob.size, "mime_type": blob.mime_type, "id": row[0]},
+            )
+
+        session.commit()
+        moved_gifs += len(rows)
+        _LOGGER.info("Moved gifs into blob store.", extra={"moved_gifs": moved_gifs})
+
+
+async def migrate(batch_size: int = 10, keep_column: bool = False) -> int:
+    """Move all gif binaries into the configured blob store and drop the legacy column afterwards."""
+    try:
+        with get_db_trashtv_session() as session:
+            _add_blob_columns(session)
+            if not _has_legacy_column(session):
+                _LOGGER.info("Nothing to migrate, gif binaries are not stored in the db.")
+                return 0
+
+            moved_gifs = await migrate_gif_binaries(session, get_blob_store(), batch_size)
+
+            if not keep_column:
+                session.execute(text(f'ALTER TABLE "{_TABLE}" DROP COLUMN {_LEGACY_COLUMN}'))
+                _LOGGER.info("Dropped legacy gif binary column, run `VACUUM FULL` to give the space back.")
+
+            return moved_gifs
+    finally:
+        await close_blob_store()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the migration from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=10, help="gifs to move per transaction")
+    parser.add_argument("--keep-column", action="store_true", help="do not drop the emptied legacy column")
+    args = parser.parse_args(argv)
+
+    moved_gifs = asyncio.run(migrate(args.batch_size, args.keep_column))
+    _LOGGER.info("Migration finished.", extra={"moved_gifs": moved_gifs})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,157 @@
+"""Module that stores blobs in an S3 compatible object storage.
+
+Any service that speaks the S3 REST API works, e.g. AWS S3 itself or MinIO as a local stand-in.
+Requests are signed with AWS signature version 4 and use path-style urls.
+"""
+import hashlib
+import hmac
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, BinaryIO, Dict, Optional
+from urllib.parse import quote
+
+from httpx import AsyncClient, Timeout
+
+from .base import Blob, BlobStore, BlobWriter
+
+_LOGGER = logging.getLogger(__name__)
+
+_READ_CHUNK_SIZE = 64 * 1024
+_SERVICE = "s3"
+_EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class S3BlobStore(BlobStore):
+    """Store blobs as objects named by their hash in an S3 bucket."""
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        timeout_in_seconds: float = 60.0,
+    ) -> None:
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.prefix = prefix
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+        self._timeout = Timeout(timeout_in_seconds)
+        self._http_client: Optional[AsyncClient] = None
+
+    def _get_http_client(self) -> AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = AsyncClient(timeout=self._timeout)
+        return self._http_client
+
+    def _object_path(self, sha256: str) -> str:
+        return "/" + quote(f"{self.bucket}/{self.prefix}{sha256}")
+
+    def _signed_headers(
+        self, method: str, path: str, payload_sha256: str, headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """Sign a request without query string with AWS signature version 4.
+
+        See https://docs.aws.amazon.com/general/latest/gr/sigv4_signing.html
+        """
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+        host = self.endpoint_url.split("://", 1)[-1]
+
+        headers = {
+            **(headers or {}),
+            "host": host,
+            "x-amz-content-sha256": payload_sha256,
+            "x-amz-date": amz_date,
+        }
+        signed_header_names = ";".join(sorted(name.lower() for name in headers))
+        canonical_headers = "".join(
+            f"{name.lower()}:{headers[name].strip()}\n" for name in sorted(headers, key=str.lower)
+        )
+        canonical_request = "\n".join([method, path, "", canonical_headers, signed_header_names, payload_sha256])
+
+        scope = f"{date_stamp}/{self._region}/{_SERVICE}/aws4_request"
+        string_to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()]
+        )
+
+        signing_key = f"AWS4{self._secret_key}".encode()
+        for scope_part in (date_stamp, self._region, _SERVICE, "aws4_request"):
+            signing_key = hmac.new(signing_key, scope_part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, "
+            f"SignedHeaders={signed_header_names}, Signature={signature}"
+        )
+        return headers
+
+    async def put(self, writer: BlobWriter) -> Blob:
+        """Upload the blob written to `writer` unless an object with the same content already exists."""
+        blob = writer.blob()
+        try:
+            if await self.exists(blob.sha256):
+                _LOGGER.debug("Blob already stored.", extra={"sha256": blob.sha256})
+                return blob
+
+            writer.flush()
+            path = self._object_path(blob.sha256)
+            headers = self._signed_headers(
+                "PUT", path, blob.sha256, {"content-length": str(blob.size), "content-type": blob.mime_type}
+            )
+            with writer.temp_path.open("rb") as blob_file:
+                response = await self._get_http_client().put(
+                    self.endpoint_url + path, content=_iter_file(blob_file), headers=headers
+                )
+            response.raise_for_status()
+            return blob
+        finally:
+            writer.close()
+
+    async def exists(self, sha256: str) -> bool:
+        """Check whether an object for the blob exists."""
+        path = self._object_path(sha256)
+        headers = self._signed_headers("HEAD", path, _EMPTY_PAYLOAD_SHA256)
+        response = await self._get_http_client().head(self.endpoint_url + path, headers=headers)
+        if response.status_code == 404:
+            return False
+
+        response.raise_for_status()
+        return True
+
+    async def read(self, sha256: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream the bytes of a blob from `start` up to, but excluding, `end`."""
+        path = self._object_path(sha256)
+        range_headers = {"range": f"bytes={start}-{'' if end is None else end - 1}"}
+        headers = self._signed_headers("GET", path, _EMPTY_PAYLOAD_SHA256, range_headers)
+
+        async with self._get_http_client().stream("GET", self.endpoint_url + path, headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(_READ_CHUNK_SIZE):
+                yield chunk
+
+    async def delete(self, sha256: str) -> None:
+        """Remove the object of a blob."""
+        path = self._object_path(sha256)
+        headers = self._signed_headers("DELETE", path, _EMPTY_PAYLOAD_SHA256)
+        response = await self._get_http_client().delete(self.endpoint_url + path, headers=headers)
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        """Close the http client of the store."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+async def _iter_file(blob_file: BinaryIO) -> AsyncIterator[bytes]:
+    """Read a file in chunks for a streaming upload."""
+    chunk = blob_file.read(_READ_CHUNK_SIZE)
+    while chunk:
+        yield chunk
+        chunk = blob_file.read(_READ_CHUNK_SIZE)
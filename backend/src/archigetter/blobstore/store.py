@@ -0,0 +1,44 @@
+"""Module that maintains the blob store configured for the application."""
+import logging
+from typing import Optional
+
+from .. import settings
+from .base import BlobStore
+from .local import LocalBlobStore
+from .s3 import S3BlobStore
+
+_LOGGER = logging.getLogger(__name__)
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Get the configured blob store, create it on first use."""
+    global _blob_store
+
+    if _blob_store is None:
+        _LOGGER.info("Opening blob store.", extra={"backend": settings.blob_store_backend})
+        if settings.blob_store_backend == "s3":
+            _blob_store = S3BlobStore(
+                endpoint_url=settings.blob_store_s3_endpoint_url,
+                bucket=settings.blob_store_s3_bucket,
+                access_key=settings.blob_store_s3_access_key,
+                secret_key=settings.blob_store_s3_secret_key.get_secret_value(),
+                region=settings.blob_store_s3_region,
+                prefix=settings.blob_store_s3_prefix,
+            )
+        else:
+            _blob_store = LocalBlobStore(settings.blob_store_local_path)
+
+    return _blob_store
+
+
+async def close_blob_store() -> None:
+    """Close the configured blob store, it gets recreated from the settings on next use."""
+    global _blob_store
+
+    if _blob_store is None:
+        return
+
+    await _blob_store.close()
+    _blob_store = None
@@ -0,0 +1,167 @@
+"""Module for the in-process caches in front of the db and the blob store.
+
+The caches are plain LRU caches bounded by the summed size of their values in bytes, entries expire after a
+time to live. They are not shared between processes, writers in the same process invalidate them explicitly,
+writers in other processes are only seen once the entries expired.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, NamedTuple, Optional, Tuple, TypeVar
+
+from . import settings
+
+V = TypeVar("V")
+
+_NOW_PLAYING_MAX_SIZE_IN_BYTES = 4 * 1024
+
+
+class CacheStats(NamedTuple):
+    """Snapshot of the counters of a cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    size_in_bytes: int
+    max_size_in_bytes: int
+
+
+class LRUCache(Generic[V]):
+    """Least recently used cache holding at most `max_size_in_bytes` bytes of values.
+
+    The size of a value is measured by `size_of`. Values larger than `max_item_size_in_bytes` are not cached.
+    Not thread safe, use it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_size_in_bytes: int,
+        ttl_in_seconds: Optional[float] = None,
+        size_of: Callable[[V], int] = len,  # type: ignore
+        max_item_size_in_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size_in_bytes = max_size_in_bytes
+        self.ttl_in_seconds = ttl_in_seconds
+        self.size_of = size_of
+        self.max_item_size_in_bytes = max_size_in_bytes if max_item_size_in_bytes is None else max_item_size_in_bytes
+        self.clock = clock
+        self.size_in_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (value, size in bytes, expiry)
+        self._entries: "OrderedDict[Hashable, Tuple[V, int, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """Count the cached values, including expired ones not yet removed."""
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Get the cached value of `key`, `None` if it is not cached or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, _, expires_at = entry
+        if expires_at <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V) -> bool:
+        """Cache `value` under `key`, evicting the least recently used values if the cache is full.
+
+        Returns whether the value was cached, values too large for the cache are not.
+        """
+        self.invalidate(key)
+
+        size = self.size_of(value)
+        if size > self.max_item_size_in_bytes or size > self.max_size_in_bytes:
+            return False
+
+        expires_at = float("inf") if self.ttl_in_seconds is None else self.clock() + self.ttl_in_seconds
+        self._entries[key] = (value, size, expires_at)
+        self.size_in_bytes += size
+
+        while self.size_in_bytes > self.max_size_in_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Forget the cached value of `key`, if any."""
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Forget all cached values, the counters are kept."""
+        self._entries.clear()
+        self.size_in_bytes = 0
+
+    def stats(self) -> CacheStats:
+        """Get a snapshot of the counters."""
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            entries=len(self._entries),
+            size_in_bytes=self.size_in_bytes,
+            max_size_in_bytes=self.max_size_in_bytes,
+        )
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size_in_bytes -= size
+
+
+def _dict_size(value: Dict[str, Any]) -> int:
+    """Roughly measure a flat dict of short strings and numbers."""
+    return sum(len(key) + len(str(item)) for key, item in value.items())
+
+
+# binaries of hot gifs, keyed by their immutable sha256
+gif_bytes_cache: LRUCache[bytes] = LRUCache(
+    settings.gif_cache_max_size_in_bytes,
+    ttl_in_seconds=settings.gif_cache_ttl_in_seconds,
+    max_item_size_in_bytes=settings.gif_cache_max_item_size_in_bytes,
+)
+# blob addresses of downloaded gifs, keyed by archillect id
+gif_lookup_cache: LRUCache[Dict[str, Any]] = LRUCache(
+    settings.gif_lookup_cache_max_size_in_bytes,
+    ttl_in_seconds=settings.gif_cache_ttl_in_seconds,
+    size_of=_dict_size,
+)
+# the gif currently on screen on Archillect
+now_playing_cache: LRUCache[Dict[str, Any]] = LRUCache(
+    _NOW_PLAYING_MAX_SIZE_IN_BYTES, ttl_in_seconds=settings.now_playing_cache_ttl_in_seconds, size_of=_dict_size
+)
+NOW_PLAYING_KEY = "now_playing"
+
+CACHES: Dict[str, LRUCache[Any]] = {
+    "gif_bytes": gif_bytes_cache,
+    "gif_lookup": gif_lookup_cache,
+    "now_playing": now_playing_cache,
+}
+
+
+def get_cache_stats() -> Dict[str, CacheStats]:
+    """Get a snapshot of the counters of all caches, by cache name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def clear_caches() -> None:
+    """Forget all cached values of all caches."""
+    for cache in CACHES.values():
+        cache.clear()
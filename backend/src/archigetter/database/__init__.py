@@ -1,6 +1,18 @@
 """Package to communicate with diffrent databases."""
-from .connector import get_db_trashtv_session
+from .connector import (
+    PoolStats,
+    close_db_trashtv_async_engine,
+    connect_db_trashtv_async,
+    get_db_trashtv_async_session,
+    get_db_trashtv_session,
+    get_pool_stats,
+)
 
 __all__ = [
+    "PoolStats",
+    "close_db_trashtv_async_engine",
+    "connect_db_trashtv_async",
+    "get_db_trashtv_async_session",
     "get_db_trashtv_session",
+    "get_pool_stats",
 ]
@@ -1,16 +1,204 @@
 """Module to maintain database connection, setup, helpers."""
 import logging
-from contextlib import contextmanager
-from typing import Generator
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncGenerator, Dict, Generator, NamedTuple
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from .. import settings
 
 _LOGGER = logging.getLogger(__name__)
 
-engine_trashtv = create_engine(settings.db_dsn_trashtv)
+
+class PoolStats(NamedTuple):
+    """Snapshot of a trashtv connection pool.
+
+    `size`, `checked_in`, `checked_out` and `overflow` describe the pool right now, the other
+    fields are counted since the start of the process.
+    """
+
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    checkout_timeouts: int
+    invalidations: int
+    checkout_wait_total_in_seconds: float
+    checkout_wait_max_in_seconds: float
+
+
+class _PoolCounters:
+    """Thread safe counters of pool checkouts, shared by all pools an engine recreates."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.invalidations = 0
+        self.checkout_wait_total_in_seconds = 0.0
+        self.checkout_wait_max_in_seconds = 0.0
+
+    def record_checkout(self, wait_in_seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+            self.checkout_wait_total_in_seconds += wait_in_seconds
+            self.checkout_wait_max_in_seconds = max(self.checkout_wait_max_in_seconds, wait_in_seconds)
+
+    def record_invalidation(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+
+class _InstrumentedQueuePool(QueuePool):
+    """Queue pool that measures how long callers wait for a connection."""
+
+    counters = _PoolCounters()
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except PoolTimeoutError:
+            self.counters.record_checkout(time.perf_counter() - started, timed_out=True)
+            _LOGGER.warning("Timed out waiting for a db connection, the pool is exhausted.")
+            raise
+
+        self.counters.record_checkout(time.perf_counter() - started, timed_out=False)
+        return connection
+
+
+class _InstrumentedAsyncQueuePool(_InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Queue pool of the async engine that measures how long callers wait for a connection.
+
+    Its queue is an asyncio queue, which may only be used on the event loop. The connections in the pool are
+    counted on the loop whenever one is checked out or returned, so metrics can read them from any thread.
+    """
+
+    counters = _PoolCounters()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._checked_in = 0
+
+    def _count_checked_in(self) -> None:
+        self._checked_in = super().checkedin()
+
+    def _do_get(self) -> Any:
+        try:
+            return super()._do_get()
+        finally:
+            self._count_checked_in()
+
+    def _do_return_conn(self, conn: Any) -> None:
+        try:
+            super()._do_return_conn(conn)  # type: ignore[misc]
+        finally:
+            self._count_checked_in()
+
+    def dispose(self) -> None:
+        """Close all connections in the pool."""
+        super().dispose()
+        self._count_checked_in()
+
+    def checkedin(self) -> int:
+        """Get the connections in the pool, as of the last checkout or return."""
+        return self._checked_in
+
+    def checkedout(self) -> int:
+        """Get the connections in use, as of the last checkout or return."""
+        return int(self.size() - self._checked_in + self.overflow())
+
+
+def _connect_args(dsn: str) -> Dict[str, Any]:
+    if settings.db_statement_timeout_in_ms is None or make_url(dsn).get_backend_name() != "postgresql":
+        return {}
+
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_in_ms}"}
+
+
+engine_trashtv = create_engine(
+    settings.db_dsn_trashtv,
+    poolclass=_InstrumentedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_in_seconds,
+    pool_recycle=settings.db_pool_recycle_in_seconds,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args=_connect_args(settings.db_dsn_trashtv),
+)
+SessionLocalTrashTv = sessionmaker(engine_trashtv)
+
+
+def _async_dsn(dsn: str) -> str:
+    # `URL.set` is new in SQLAlchemy 1.4, sqlalchemy-stubs only know the URL of 1.3
+    return str(make_url(dsn).set(drivername="postgresql+asyncpg"))  # type: ignore[attr-defined]
+
+
+def _async_connect_args() -> Dict[str, Any]:
+    if settings.db_statement_timeout_in_ms is None:
+        return {}
+
+    return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_in_ms)}}
+
+
+engine_trashtv_async = create_async_engine(
+    _async_dsn(settings.db_dsn_trashtv),
+    poolclass=_InstrumentedAsyncQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_in_seconds,
+    pool_recycle=settings.db_pool_recycle_in_seconds,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args=_async_connect_args(),
+)
+AsyncSessionLocalTrashTv = sessionmaker(engine_trashtv_async, class_=AsyncSession, expire_on_commit=False)
+
+
+def _count_invalidation(*_: Any) -> None:
+    _InstrumentedQueuePool.counters.record_invalidation()
+
+
+def _count_async_invalidation(*_: Any) -> None:
+    _InstrumentedAsyncQueuePool.counters.record_invalidation()
+
+
+event.listen(engine_trashtv, "invalidate", _count_invalidation)
+event.listen(engine_trashtv_async.sync_engine, "invalidate", _count_async_invalidation)
+
+
+def _pool_stats(pool: Any) -> PoolStats:
+    assert isinstance(pool, _InstrumentedQueuePool)
+
+    return PoolStats(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checkouts=pool.counters.checkouts,
+        checkout_timeouts=pool.counters.checkout_timeouts,
+        invalidations=pool.counters.invalidations,
+        checkout_wait_total_in_seconds=pool.counters.checkout_wait_total_in_seconds,
+        checkout_wait_max_in_seconds=pool.counters.checkout_wait_max_in_seconds,
+    )
+
+
+def get_pool_stats() -> Dict[str, PoolStats]:
+    """Get the current state and the checkout metrics of the trashtv connection pools, by engine."""
+    return {
+        "sync": _pool_stats(engine_trashtv.pool),
+        "async": _pool_stats(engine_trashtv_async.sync_engine.pool),
+    }
 
 
 @contextmanager
@@ -32,6 +220,31 @@ def _get_db_session(session_local: sessionmaker) -> Generator[Session, None, Non
 @contextmanager
 def get_db_trashtv_session() -> Generator[Session, None, None]:
     """Get trashtv db session."""
-    SessionLocal = sessionmaker(engine_trashtv)
-    with _get_db_session(SessionLocal) as db:
+    with _get_db_session(SessionLocalTrashTv) as db:
         yield db
+
+
+@asynccontextmanager
+async def get_db_trashtv_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get trashtv db session running on the event loop, close it automatically once done."""
+    session = AsyncSessionLocalTrashTv()
+    try:
+        yield session
+    except Exception as e:
+        _LOGGER.error("Exception occurred while running DB code, attempting rollback", extra={"exception": e})
+        await session.rollback()
+        raise
+    else:
+        await session.commit()
+    finally:
+        await session.close()
+
+
+async def connect_db_trashtv_async() -> AsyncConnection:
+    """Open a dedicated trashtv db connection, e.g. to hold session level locks, the caller has to close it."""
+    return await engine_trashtv_async.connect()
+
+
+async def close_db_trashtv_async_engine() -> None:
+    """Close all pooled connections of the async trashtv engine."""
+    await engine_trashtv_async.dispose()
@@ -0,0 +1,177 @@
+"""Module to keep the ever growing play history and the download queue fast.
+
+On Postgres `TRASH_TV_ARCHILLECT_HISTORY` is range partitioned by month. The maintenance job
+- creates the partitions of the coming months ahead of time and
+- compacts history older than `history_retention_days` into daily play counts,
+  dropping the emptied monthly partitions.
+
+`enqueue_missing_gif_downloads` queues gifs stored before the download queue existed. Both run in the leader
+only, right after it took over and then periodically.
+"""
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, exists, insert, select, text
+from sqlalchemy.orm import Session
+
+from .. import settings
+from .models.trashtv import (
+    TrashTvArchillectData,
+    TrashTvArchillectHistory,
+    TrashTvArchillectPlayCount,
+    TrashTvGifDownloadJob,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_HISTORY_TABLE = TrashTvArchillectHistory.__tablename__
+_PLAY_COUNT_TABLE = TrashTvArchillectPlayCount.__tablename__
+
+
+def _month_start(day: date, months_later: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + months_later
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{_HISTORY_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _partition_month(partition_name: str) -> Optional[date]:
+    try:
+        year_month = partition_name[len(_HISTORY_TABLE) :]
+        return date(int(year_month[2:6]), int(year_month[7:9]), 1)
+    except ValueError:
+        return None
+
+
+def _existing_partitions(session: Session) -> List[str]:
+    return list(
+        session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": _HISTORY_TABLE},
+        ).scalars()
+    )
+
+
+def _create_partition(session: Session, month: date) -> None:
+    """Create the partition of `month`, moving rows that already landed in the default partition into it."""
+    partition = _partition_name(month)
+    bounds = {"start": month, "end": _month_start(month, 1)}
+
+    session.execute(text(f'CREATE TABLE "{partition}" (LIKE "{_HISTORY_TABLE}" INCLUDING DEFAULTS)'))
+    session.execute(
+        text(
+            f'WITH moved AS (DELETE FROM "{_HISTORY_TABLE}_default" '
+            "WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f'INSERT INTO "{partition}" SELECT * FROM moved'
+        ),
+        bounds,
+    )
+    session.execute(
+        text(
+            f'ALTER TABLE "{_HISTORY_TABLE}" ATTACH PARTITION "{partition}" '
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        )
+    )
+
+
+def ensure_history_partitions(session: Session, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Create the monthly history partitions from this month up to `months_ahead` months ahead.
+
+    Returns the names of the created partitions.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return []
+
+    this_month = _month_start(today or datetime.now(timezone.utc).date())
+    existing_partitions = set(_existing_partitions(session))
+
+    created_partitions = []
+    for months_later in range(months_ahead + 1):
+        month = _month_start(this_month, months_later)
+        if _partition_name(month) not in existing_partitions:
+            _create_partition(session, month)
+            created_partitions.append(_partition_name(month))
+
+    session.commit()
+    if created_partitions:
+        _LOGGER.info("Created history partitions.", extra={"partitions": created_partitions})
+    return created_partitions
+
+
+def compact_history(session: Session, retention_days: int, now: Optional[datetime] = None) -> Tuple[int, List[str]]:
+    """Roll up history older than `retention_days` whole days into daily play counts.
+
+    Only on screen plays are counted. Monthly partitions that are entirely past the retention
+    are dropped afterwards. Returns the number of compacted history rows and the dropped partitions.
+    """
+    today = (now or datetime.now(timezone.utc)).date()
+    cutoff = datetime.combine(today - timedelta(days=retention_days), time(), tzinfo=timezone.utc)
+
+    compacted_rows = session.execute(
+        text(
+            f'WITH compacted AS (DELETE FROM "{_HISTORY_TABLE}" WHERE timestamp < :cutoff '
+            "RETURNING gif_id, css_id, timestamp), "
+            "counted AS ("
+            f'INSERT INTO "{_PLAY_COUNT_TABLE}" (gif_id, day, play_count) '
+            "SELECT gif_id, CAST(timezone('UTC', timestamp) AS DATE), count(*) FROM compacted "
+            "WHERE gif_id IS NOT NULL AND (css_id = :on_screen_css_id OR css_id IS NULL) "
+            "GROUP BY 1, 2 "
+            f'ON CONFLICT (gif_id, day) DO UPDATE SET play_count = "{_PLAY_COUNT_TABLE}".play_count + '
+            "EXCLUDED.play_count) "
+            "SELECT count(*) FROM compacted"
+        ),
+        {"cutoff": cutoff, "on_screen_css_id": settings.archillect_tv_on_screen_css_id},
+    ).scalar()
+
+    dropped_partitions = []
+    if session.get_bind().dialect.name == "postgresql":
+        for partition in _existing_partitions(session):
+            month = _partition_month(partition)
+            if month is not None and _month_start(month, 1) <= cutoff.date():
+                session.execute(text(f'DROP TABLE "{partition}"'))
+                dropped_partitions.append(partition)
+
+    session.commit()
+    _LOGGER.info(
+        "Compacted history.", extra={"compacted_rows": compacted_rows, "dropped_partitions": dropped_partitions}
+    )
+    return compacted_rows, dropped_partitions
+
+
+def maintain_history(session: Session) -> None:
+    """Run all history maintenance with the configured retention."""
+    ensure_history_partitions(session, settings.history_partitions_months_ahead)
+    compact_history(session, settings.history_retention_days)
+
+
+def enqueue_missing_gif_downloads(session: Session) -> int:
+    """Queue a download job for every gif without saved binary that has no job yet.
+
+    Returns the number of queued gifs.
+    """
+    queued = session.execute(
+        insert(TrashTvGifDownloadJob.__table__)
+        .from_select(
+            ["gif_id"],
+            select([TrashTvArchillectData.id]).where(
+                and_(
+                    TrashTvArchillectData.gif_sha256.is_(None),
+                    ~exists().where(TrashTvGifDownloadJob.gif_id == TrashTvArchillectData.id),
+                )
+            ),
+        )
+        .returning(TrashTvGifDownloadJob.gif_id)
+    ).all()
+
+    session.commit()
+    if queued:
+        _LOGGER.info("Queued missing gif downloads.", extra={"queued_gifs": len(queued)})
+    return len(queued)
@@ -0,0 +1,104 @@
+"""Module to bring the play history of databases created before it was partitioned up to date.
+
+Databases created before the history was partitioned keep it in a plain table without the `css_id` of the
+plays, `create_all` does not touch existing tables. Run this once after upgrading:
+
+    python -m archigetter.database.migrate [--keep-table]
+
+Stop the service meanwhile. The history is copied into a new table partitioned by month, plays recorded
+during the copy would be lost. Copied plays land in the default partition, the maintenance job moves them into
+the monthly partitions of the coming months and compacts the older ones.
+"""
+import argparse
+import logging
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from .. import settings
+from .connector import get_db_trashtv_session
+from .maintenance import ensure_history_partitions
+from .models.trashtv import TrashTvArchillectHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+_TABLE = TrashTvArchillectHistory.__tablename__
+_LEGACY_TABLE = f"{_TABLE}_legacy"
+
+
+def _add_history_columns(session: Session) -> None:
+    """Add the columns of the history that tables created before them are missing."""
+    session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN IF NOT EXISTS css_id VARCHAR'))
+    session.commit()
+
+
+def _is_partitioned(session: Session) -> bool:
+    relkind = session.execute(text("SELECT relkind FROM pg_class WHERE relname = :table"), {"table": _TABLE}).scalar()
+    return bool(relkind == "p")
+
+
+def _rename_legacy_table(session: Session) -> None:
+    """Move the plain history table out of the way, including the indexes whose names the new table reuses."""
+    legacy_inspector = inspect(session.connection())
+    index_names = [index["name"] for index in legacy_inspector.get_indexes(_TABLE)]
+    primary_key_name = legacy_inspector.get_pk_constraint(_TABLE)["name"]
+    if primary_key_name:
+        index_names.append(primary_key_name)
+
+    session.execute(text(f'ALTER TABLE "{_TABLE}" RENAME TO "{_LEGACY_TABLE}"'))
+    for index_name in index_names:
+        session.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"'))
+
+
+def partition_history(session: Session, keep_table: bool = False) -> int:
+    """Copy a plain history table into a partitioned one, return the number of copied plays.
+
+    The plain table is dropped afterwards, unless `keep_table` is set, then it is kept as `<table>_legacy`.
+    """
+    legacy_columns = {column["name"] for column in inspect(session.connection()).get_columns(_TABLE)}
+    columns = [column.name for column in TrashTvArchillectHistory.__table__.columns if column.name in legacy_columns]
+    # the timestamp is part of the primary key now, so it can not be missing anymore
+    selected_columns = ["coalesce(timestamp, now())" if column == "timestamp" else column for column in columns]
+
+    _rename_legacy_table(session)
+    TrashTvArchillectHistory.__table__.create(session.connection())
+    copied_plays = session.execute(
+        text(
+            f'INSERT INTO "{_TABLE}" ({", ".join(columns)}) '
+            f'SELECT {", ".join(selected_columns)} FROM "{_LEGACY_TABLE}"'
+        )
+    ).rowcount
+
+    if not keep_table:
+        session.execute(text(f'DROP TABLE "{_LEGACY_TABLE}"'))
+
+    session.commit()
+    return int(copied_plays)
+
+
+def migrate(keep_table: bool = False) -> int:
+    """Add missing history columns, partition the history table unless it is already, return the copied plays."""
+    with get_db_trashtv_session() as session:
+        _add_history_columns(session)
+        if session.get_bind().dialect.name != "postgresql" or _is_partitioned(session):
+            _LOGGER.info("Nothing to migrate, the history is partitioned already.")
+            return 0
+
+        copied_plays = partition_history(session, keep_table)
+        ensure_history_partitions(session, settings.history_partitions_months_ahead)
+        return copied_plays
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the migration from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep-table", action="store_true", help="keep the plain history table as `<table>_legacy`")
+    args = parser.parse_args(argv)
+
+    copied_plays = migrate(args.keep_table)
+    _LOGGER.info("Migration finished.", extra={"copied_plays": copied_plays})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
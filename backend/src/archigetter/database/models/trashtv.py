@@ -1,13 +1,15 @@
 """Module to define minimal table models."""
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, List, Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, func
+from sqlalchemy import DDL, Column, Index, event, func, text
 from sqlalchemy.dialects.postgresql import UUID as POSTGRES_UUID
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.ddl import DDLElement
 from sqlalchemy.sql.schema import ForeignKey
-from sqlalchemy.types import TIMESTAMP, VARCHAR, LargeBinary, String, TypeDecorator, TypeEngine
+from sqlalchemy.types import TIMESTAMP, VARCHAR, BigInteger, Date, Integer, String, TypeDecorator, TypeEngine
 
 Base: Any = declarative_base()
 
@@ -60,17 +62,108 @@ class TrashTvArchillectData(Base):
     id = Column(AGNOSTIC_UUID(), primary_key=True, default=uuid4)
     archillect_id = Column(String(), unique=True)
     source_link = Column(VARCHAR())
-    gif_raw_data = Column(LargeBinary, nullable=True)
+    gif_sha256 = Column(String(64), nullable=True, index=True)
+    gif_size_in_bytes = Column(Integer, nullable=True)
+    gif_mime_type = Column(String(), nullable=True)
+    # perceptual hash, near-duplicate gifs share the blob of the gif stored first
+    gif_dhash = Column(BigInteger, nullable=True)
     timestamp = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     played_on_archillect = relationship("TrashTvArchillectHistory")
 
 
 class TrashTvArchillectHistory(Base):
-    """DB Model for 'TRASH_TV_ARCHILLECT_HISTORY' db view."""
+    """DB Model for 'TRASH_TV_ARCHILLECT_HISTORY' db view.
+
+    On Postgres the table is range partitioned by month on `timestamp`, see `database.maintenance`.
+    """
 
     __tablename__ = "TRASH_TV_ARCHILLECT_HISTORY"
+    __table_args__ = (
+        Index("ix_TRASH_TV_ARCHILLECT_HISTORY_timestamp", "timestamp"),
+        Index("ix_TRASH_TV_ARCHILLECT_HISTORY_gif_id_timestamp", "gif_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
     id = Column(AGNOSTIC_UUID(), primary_key=True, default=uuid4)
     gif_id = Column(String, ForeignKey(TrashTvArchillectData.archillect_id))
+    css_id = Column(String, nullable=True)
+    # part of the primary key, since every unique constraint of a partitioned table must contain the partition key
+    timestamp = Column(TIMESTAMP(timezone=True), primary_key=True, server_default=func.now())
+
+
+def _is_postgresql(
+    ddl: DDLElement,
+    target: Any,
+    bind: Connection,
+    tables: Optional[List[Any]] = None,
+    state: Optional[Any] = None,
+    checkfirst: bool = False,
+    **kw: Any,
+) -> bool:
+    return bool(bind.dialect.name == "postgresql")
+
+
+# rows outside of all monthly partitions land here instead of failing
+event.listen(
+    TrashTvArchillectHistory.__table__,
+    "after_create",
+    DDL(
+        f'CREATE TABLE IF NOT EXISTS "{TrashTvArchillectHistory.__tablename__}_default" '
+        f'PARTITION OF "{TrashTvArchillectHistory.__tablename__}" DEFAULT',
+    ).execute_if(callable_=_is_postgresql),
+)
+
+
+class TrashTvArchillectPlayCount(Base):
+    """DB Model for 'TRASH_TV_ARCHILLECT_PLAY_COUNT' db view.
+
+    Daily play counts of gifs whose history was compacted, see `database.maintenance`.
+    """
+
+    __tablename__ = "TRASH_TV_ARCHILLECT_PLAY_COUNT"
+
+    gif_id = Column(String, ForeignKey(TrashTvArchillectData.archillect_id), primary_key=True)
+    day = Column(Date, primary_key=True)
+    play_count = Column(Integer, nullable=False)
+
+
+class TrashTvGifDownloadJob(Base):
+    """DB Model for 'TRASH_TV_GIF_DOWNLOAD_JOB' db table, the queue of gifs still to download.
+
+    A job is `pending` until its gif is saved, then the job is deleted. Claimed jobs are leased by pushing
+    `next_attempt_at` into the future, so jobs of a crashed worker become due again on their own.
+    Jobs failing `gif_download_max_attempts` times are kept as `dead`.
+    """
+
+    __tablename__ = "TRASH_TV_GIF_DOWNLOAD_JOB"
+    __table_args__ = (
+        Index(
+            "ix_TRASH_TV_GIF_DOWNLOAD_JOB_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    gif_id = Column(AGNOSTIC_UUID(), ForeignKey(TrashTvArchillectData.id, ondelete="CASCADE"), primary_key=True)
+    status = Column(String, nullable=False, server_default="pending")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+
+class TrashTvGifRendition(Base):
+    """DB Model for 'TRASH_TV_GIF_RENDITION' db table, the transcoded renditions of downloaded gifs.
+
+    Renditions belong to the gif binary, gifs with the same content share them. A rendition without
+    `sha256` could not be transcoded and is not tried again.
+    """
+
+    __tablename__ = "TRASH_TV_GIF_RENDITION"
+
+    gif_sha256 = Column(String(64), primary_key=True)
+    format = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=True)
+    size_in_bytes = Column(Integer, nullable=True)
+    mime_type = Column(String, nullable=True)
     timestamp = Column(TIMESTAMP(timezone=True), server_default=func.now())
@@ -0,0 +1,234 @@
+"""Module to load test the `/trash` websocket and the gif endpoints of a running instance.
+
+Opens many viewers of `/trash` at once, optionally fetching every gif they are sent, and reports how the
+instance coped, as JSON on stdout:
+
+    python -m archigetter.loadtest [--url http://localhost:8000] [--viewers 1000] [--duration 60] [--fetch-gifs]
+
+Run it against a single API process to learn how many viewers it holds. Every viewer keeps a socket open,
+raise the open files limit (`ulimit -n`) of both sides for thousands of viewers.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from websockets.exceptions import WebSocketException
+from websockets.legacy.client import connect as websocket_connect
+
+_LOGGER = logging.getLogger(__name__)
+
+_RSS_METRIC = "process_resident_memory_bytes"
+
+
+class Viewer:
+    """What a single simulated viewer went through."""
+
+    def __init__(self) -> None:
+        self.connect_latency: Optional[float] = None
+        # (message, monotonic time of arrival)
+        self.arrivals: List[Tuple[str, float]] = []
+        self.gif_fetch_latencies: List[float] = []
+        self.gif_fetch_failures = 0
+        # the viewer could not connect or was disconnected by the instance
+        self.dropped = False
+
+
+class LoadTestReport(NamedTuple):
+    """Outcome of a load test.
+
+    Delivery delays are measured against the first viewer that got the same message, jitter is the mean
+    change of the delivery delay between the consecutive messages of a viewer (RFC 3550).
+    """
+
+    viewers: int
+    connected_viewers: int
+    dropped_viewers: int
+    messages: int
+    connect_latency_p50_in_seconds: Optional[float]
+    connect_latency_p99_in_seconds: Optional[float]
+    delivery_delay_p50_in_seconds: Optional[float]
+    delivery_delay_p99_in_seconds: Optional[float]
+    jitter_p50_in_seconds: Optional[float]
+    jitter_p99_in_seconds: Optional[float]
+    gif_fetches: int
+    gif_fetch_failures: int
+    gif_fetch_latency_p50_in_seconds: Optional[float]
+    gif_fetch_latency_p99_in_seconds: Optional[float]
+    memory_per_connection_in_bytes: Optional[float]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Get the nearest-rank percentile of `values`, `None` if there are none."""
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _delivery_delays(viewers: List[Viewer]) -> Tuple[List[float], List[float]]:
+    """Get the delivery delays of all messages and the jitter of every viewer.
+
+    The first message of every viewer is the one it was sent on connect, it is not a delivery.
+    """
+    first_arrivals: Dict[str, float] = {}
+    for viewer in viewers:
+        for message, arrival in viewer.arrivals[1:]:
+            first_arrivals[message] = min(arrival, first_arrivals.get(message, arrival))
+
+    delays, jitters = [], []
+    for viewer in viewers:
+        viewer_delays = [arrival - first_arrivals[message] for message, arrival in viewer.arrivals[1:]]
+        delays.extend(viewer_delays)
+        if len(viewer_delays) > 1:
+            changes = [abs(delay - previous) for previous, delay in zip(viewer_delays, viewer_delays[1:])]
+            jitters.append(sum(changes) / len(changes))
+    return delays, jitters
+
+
+def build_report(viewers: List[Viewer], memory_growth_in_bytes: Optional[float]) -> LoadTestReport:
+    """Sum up what all viewers went through."""
+    connect_latencies = [viewer.connect_latency for viewer in viewers if viewer.connect_latency is not None]
+    delays, jitters = _delivery_delays(viewers)
+    gif_fetch_latencies = [latency for viewer in viewers for latency in viewer.gif_fetch_latencies]
+
+    memory_per_connection = None
+    if memory_growth_in_bytes is not None and connect_latencies:
+        memory_per_connection = memory_growth_in_bytes / len(connect_latencies)
+
+    return LoadTestReport(
+        viewers=len(viewers),
+        connected_viewers=len(connect_latencies),
+        dropped_viewers=sum(viewer.dropped for viewer in viewers),
+        messages=len({message for viewer in viewers for message, _ in viewer.arrivals[1:]}),
+        connect_latency_p50_in_seconds=percentile(connect_latencies, 0.5),
+        connect_latency_p99_in_seconds=percentile(connect_latencies, 0.99),
+        delivery_delay_p50_in_seconds=percentile(delays, 0.5),
+        delivery_delay_p99_in_seconds=percentile(delays, 0.99),
+        jitter_p50_in_seconds=percentile(jitters, 0.5),
+        jitter_p99_in_seconds=percentile(jitters, 0.99),
+        gif_fetches=len(gif_fetch_latencies),
+        gif_fetch_failures=sum(viewer.gif_fetch_failures for viewer in viewers),
+        gif_fetch_latency_p50_in_seconds=percentile(gif_fetch_latencies, 0.5),
+        gif_fetch_latency_p99_in_seconds=percentile(gif_fetch_latencies, 0.99),
+        memory_per_connection_in_bytes=memory_per_connection,
+    )
+
+
+async def _server_memory(http_client: httpx.AsyncClient) -> Optional[float]:
+    """Read the resident memory of the instance from its metrics, `None` if it does not tell."""
+    try:
+        response = await http_client.get("/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        _LOGGER.warning("Could not read memory of instance.", extra={"exception": e})
+        return None
+
+    for line in response.text.splitlines():
+        if line.startswith(f"{_RSS_METRIC} "):
+            return float(line.split()[1])
+    return None
+
+
+async def _fetch_gif(http_client: httpx.AsyncClient, viewer: Viewer, message: str) -> None:
+    gif_url = (json.loads(message).get("data") or {}).get("gif_url")
+    if gif_url is None:
+        return
+
+    started = time.perf_counter()
+    try:
+        response = await http_client.get(gif_url)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        viewer.gif_fetch_failures += 1
+        return
+    viewer.gif_fetch_latencies.append(time.perf_counter() - started)
+
+
+async def _view(
+    trash_url: str, viewer: Viewer, connect_timeout: float, http_client: Optional[httpx.AsyncClient]
+) -> None:
+    """Watch `/trash` like a browser would, until cancelled."""
+    started = time.perf_counter()
+    try:
+        async with websocket_connect(trash_url, open_timeout=connect_timeout) as websocket:
+            viewer.connect_latency = time.perf_counter() - started
+            async for message in websocket:
+                viewer.arrivals.append((str(message), time.perf_counter()))
+                if http_client is not None:
+                    await _fetch_gif(http_client, viewer, str(message))
+    except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+        _LOGGER.debug("Viewer dropped.", extra={"exception": e})
+    viewer.dropped = True
+
+
+async def run_load_test(
+    url: str,
+    viewers: int,
+    duration_in_seconds: float,
+    ramp_up_in_seconds: float = 0.0,
+    fetch_gifs: bool = False,
+    connect_timeout_in_seconds: float = 10.0,
+) -> LoadTestReport:
+    """Connect `viewers` viewers to the instance at `url` over `ramp_up_in_seconds` and watch for the duration."""
+    trash_url = url.replace("http", "ws", 1).rstrip("/") + "/trash"
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=connect_timeout_in_seconds) as http_client:
+        memory_before = await _server_memory(http_client)
+
+        simulated_viewers = [Viewer() for _ in range(viewers)]
+        views = []
+        for viewer in simulated_viewers:
+            views.append(
+                asyncio.ensure_future(
+                    _view(trash_url, viewer, connect_timeout_in_seconds, http_client if fetch_gifs else None)
+                )
+            )
+            await asyncio.sleep(ramp_up_in_seconds / viewers)
+        _LOGGER.info("Viewers started.", extra={"viewers": viewers})
+
+        await asyncio.sleep(duration_in_seconds)
+        memory_after = await _server_memory(http_client)
+
+        for view in views:
+            view.cancel()
+        await asyncio.gather(*views, return_exceptions=True)
+
+    memory_growth = None
+    if memory_before is not None and memory_after is not None:
+        memory_growth = memory_after - memory_before
+    return build_report(simulated_viewers, memory_growth)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="base url of the instance")
+    parser.add_argument("--viewers", type=int, default=1000, help="viewers to connect")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to watch once all viewers started")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds to spread the connects over")
+    parser.add_argument("--fetch-gifs", action="store_true", help="fetch every gif a viewer is sent")
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="seconds to wait for a connect")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        run_load_test(
+            args.url,
+            args.viewers,
+            args.duration,
+            ramp_up_in_seconds=args.ramp_up,
+            fetch_gifs=args.fetch_gifs,
+            connect_timeout_in_seconds=args.connect_timeout,
+        )
+    )
+    sys.stdout.write(json.dumps(report._asdict(), indent=2) + "\n")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,166 @@
+"""Module for the Prometheus metrics of this process.
+
+Hot paths record their latency into histograms with `timed`, events are counted as they happen. The state of
+the db connection pools and of the in-process caches is read on every scrape. Metrics are kept per process,
+every API and worker process is scraped on its own.
+"""
+import asyncio
+import functools
+import time
+from types import TracebackType
+from typing import Any, Callable, Iterator, Optional, Type, TypeVar, cast
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+from .cache import get_cache_stats
+from .database import get_pool_stats
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+_NAMESPACE = "trashtv"
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+ARCHILLECT_SCRAPE_SECONDS = Histogram(
+    "archillect_scrape_duration_seconds", "Time to fetch the Archillect TV page.", namespace=_NAMESPACE
+)
+ARCHILLECT_PARSE_SECONDS = Histogram(
+    "archillect_parse_duration_seconds",
+    "Time to extract the gifs from the Archillect TV page.",
+    namespace=_NAMESPACE,
+    buckets=_FAST_BUCKETS,
+)
+GIF_DOWNLOAD_SECONDS = Histogram(
+    "gif_download_duration_seconds",
+    "Time to download a single gif, per attempt.",
+    namespace=_NAMESPACE,
+    buckets=_SLOW_BUCKETS,
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_duration_seconds",
+    "Time to commit a transaction, by operation.",
+    ["operation"],
+    namespace=_NAMESPACE,
+    buckets=_FAST_BUCKETS,
+)
+
+GIF_DOWNLOADED_BYTES = Counter("gif_downloaded_bytes", "Bytes of downloaded gifs.", namespace=_NAMESPACE)
+GIFS_INGESTED = Counter("gifs_ingested", "Gifs newly recorded from Archillect.", namespace=_NAMESPACE)
+GIFS_SAVED = Counter("gifs_saved", "Downloaded gifs saved to the blob store.", namespace=_NAMESPACE)
+GIFS_DEDUPLICATED = Counter(
+    "gifs_deduplicated", "Downloaded gifs that share the blob of a near-duplicate.", namespace=_NAMESPACE
+)
+
+GIF_DOWNLOAD_BACKLOG = Gauge(
+    "gif_download_backlog", "Gifs waiting for download, as of the last download run.", namespace=_NAMESPACE
+)
+TRASH_VIEWERS = Gauge("trash_viewers", "Viewers connected to the trash websocket.", namespace=_NAMESPACE)
+
+
+class Timer:
+    """Record the duration of a block or of every call of a function into a histogram.
+
+    Use it as context manager or as decorator, of plain functions and of coroutine functions alike.
+    """
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+        self._start: Optional[float] = None
+
+    def __enter__(self) -> "Timer":
+        """Start timing."""
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Record the time since the start, failures included."""
+        assert self._start is not None
+        self.histogram.observe(time.perf_counter() - self._start)
+
+    def __call__(self, func: F) -> F:
+        """Time every call of `func`."""
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _timed_coroutine(*args: Any, **kwargs: Any) -> Any:
+                with Timer(self.histogram):
+                    return await func(*args, **kwargs)
+
+            return cast(F, _timed_coroutine)
+
+        @functools.wraps(func)
+        def _timed(*args: Any, **kwargs: Any) -> Any:
+            with Timer(self.histogram):
+                return func(*args, **kwargs)
+
+        return cast(F, _timed)
+
+
+def timed(histogram: Histogram) -> Timer:
+    """Time a block (`with timed(...):`) or a function (`@timed(...)`) into `histogram`."""
+    return Timer(histogram)
+
+
+class _StatsCollector:
+    """Expose the snapshots of the db connection pools, by engine, and of the caches at scrape time."""
+
+    def collect(self) -> Iterator[Metric]:
+        pool_metrics = {
+            "size": GaugeMetricFamily(
+                f"{_NAMESPACE}_db_pool_size", "Connections the db pool keeps.", labels=["engine"]
+            ),
+            "checked_out": GaugeMetricFamily(
+                f"{_NAMESPACE}_db_pool_checked_out", "Connections of the db pool in use.", labels=["engine"]
+            ),
+            "overflow": GaugeMetricFamily(
+                f"{_NAMESPACE}_db_pool_overflow", "Connections beyond the size of the db pool.", labels=["engine"]
+            ),
+            "checkouts": CounterMetricFamily(
+                f"{_NAMESPACE}_db_pool_checkouts", "Connections checked out of the db pool.", labels=["engine"]
+            ),
+            "checkout_timeouts": CounterMetricFamily(
+                f"{_NAMESPACE}_db_pool_checkout_timeouts",
+                "Checkouts that timed out waiting for a connection.",
+                labels=["engine"],
+            ),
+            "checkout_wait_total_in_seconds": CounterMetricFamily(
+                f"{_NAMESPACE}_db_pool_checkout_wait_seconds",
+                "Time spent waiting for connections of the db pool.",
+                labels=["engine"],
+            ),
+        }
+        for engine, pool_stats in get_pool_stats().items():
+            for field, pool_metric in pool_metrics.items():
+                pool_metric.add_metric([engine], getattr(pool_stats, field))
+        yield from pool_metrics.values()
+
+        counters = {
+            "hits": CounterMetricFamily(f"{_NAMESPACE}_cache_hits", "Cache hits.", labels=["cache"]),
+            "misses": CounterMetricFamily(f"{_NAMESPACE}_cache_misses", "Cache misses.", labels=["cache"]),
+            "evictions": CounterMetricFamily(
+                f"{_NAMESPACE}_cache_evictions", "Entries evicted to make room.", labels=["cache"]
+            ),
+        }
+        size = GaugeMetricFamily(f"{_NAMESPACE}_cache_size_bytes", "Bytes held by the cache.", labels=["cache"])
+        for name, cache_stats in get_cache_stats().items():
+            for field, counter in counters.items():
+                counter.add_metric([name], getattr(cache_stats, field))
+            size.add_metric([name], cache_stats.size_in_bytes)
+        yield from counters.values()
+        yield size
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render_metrics() -> bytes:
+    """Render all metrics of this process in the Prometheus text format, see `CONTENT_TYPE`."""
+    return cast(bytes, generate_latest(REGISTRY))
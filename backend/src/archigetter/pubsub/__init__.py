@@ -0,0 +1,14 @@
+"""Package to publish events to every process of the application."""
+from .base import PubSub, Subscription
+from .memory import InMemoryPubSub
+from .postgres import PostgresPubSub
+from .store import close_pubsub, get_pubsub
+
+__all__ = [
+    "InMemoryPubSub",
+    "PostgresPubSub",
+    "PubSub",
+    "Subscription",
+    "close_pubsub",
+    "get_pubsub",
+]
@@ -0,0 +1,84 @@
+"""Module that defines the interface all pub/sub backends share."""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Set
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Messages of one channel for one subscriber.
+
+    Messages wait in a bounded queue, if the subscriber falls behind its oldest message is dropped.
+    """
+
+    def __init__(self, channel: str, queue_size: int) -> None:
+        self.channel = channel
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped_messages = 0
+
+    def deliver(self, message: str) -> None:
+        """Queue `message` without waiting, dropping the oldest queued message if the queue is full."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped_messages += 1
+        self.queue.put_nowait(message)
+
+    async def get(self) -> str:
+        """Wait for the next message."""
+        return await self.queue.get()
+
+
+class PubSub(ABC):
+    """Publish messages to the subscribers of a channel in every process.
+
+    Messages are best effort: subscribers miss whatever is published while they are not subscribed
+    or while the backend is reconnecting.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        """Publish `message` to all subscribers of `channel`."""
+
+    @abstractmethod
+    async def _listen(self, channel: str) -> None:
+        """Start receiving the messages of `channel` for this process."""
+
+    @abstractmethod
+    async def _unlisten(self, channel: str) -> None:
+        """Stop receiving the messages of `channel` for this process."""
+
+    def _deliver(self, channel: str, message: str) -> None:
+        for subscription in self._subscriptions.get(channel, ()):
+            subscription.deliver(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        """Subscribe to `channel` while the context is open."""
+        subscription = Subscription(channel, self.queue_size)
+        if channel not in self._subscriptions:
+            await self._listen(channel)
+            self._subscriptions.setdefault(channel, set())
+        self._subscriptions[channel].add(subscription)
+
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions.get(channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions and channel in self._subscriptions:
+                del self._subscriptions[channel]
+                try:
+                    await self._unlisten(channel)
+                except Exception as e:
+                    _LOGGER.warning("Could not stop listening.", extra={"channel": channel, "exception": e})
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release the connections of the backend."""
@@ -0,0 +1,22 @@
+"""Module that passes messages around within the process."""
+from .base import PubSub
+
+
+class InMemoryPubSub(PubSub):
+    """Deliver messages to the subscribers of this process only.
+
+    Stands in for a shared backend in tests and in deployments running a single process.
+    """
+
+    async def publish(self, channel: str, message: str) -> None:
+        """Deliver `message` to all subscribers of `channel` right away."""
+        self._deliver(channel, message)
+
+    async def _listen(self, channel: str) -> None:
+        pass
+
+    async def _unlisten(self, channel: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        """Nothing to release."""
@@ -0,0 +1,98 @@
+"""Module that passes messages between processes with Postgres `LISTEN`/`NOTIFY`."""
+import asyncio
+import logging
+from typing import Any, Optional
+
+import asyncpg
+
+from .base import PubSub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PostgresPubSub(PubSub):
+    """Publish with `pg_notify` and listen on one dedicated connection per process.
+
+    A lost connection is reconnected every `reconnect_interval` seconds and listens to all subscribed channels
+    again. Payloads must stay below 8000 bytes, the limit of Postgres.
+    """
+
+    def __init__(self, dsn: str, queue_size: int, reconnect_interval: float) -> None:
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.reconnect_interval = reconnect_interval
+        self._connection: Optional[asyncpg.Connection] = None
+        # asyncpg connections run one operation at a time
+        self._lock = asyncio.Lock()
+        self._reconnect: Optional["asyncio.Future[None]"] = None
+        self._is_closed = False
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        self._deliver(channel, payload)
+
+    def _on_termination(self, connection: Any) -> None:
+        if connection is not self._connection or self._is_closed:
+            return
+
+        _LOGGER.warning("Lost pub/sub connection, reconnecting.")
+        self._connection = None
+        if self._subscriptions and self._reconnect is None:
+            self._reconnect = asyncio.ensure_future(self._reconnect_forever())
+
+    async def _reconnect_forever(self) -> None:
+        try:
+            while not self._is_closed:
+                try:
+                    async with self._lock:
+                        await self._connect()
+                    _LOGGER.info("Reconnected pub/sub connection.")
+                    return
+                except Exception as e:
+                    _LOGGER.error("Could not reconnect pub/sub connection.", extra={"exception": e})
+                    await asyncio.sleep(self.reconnect_interval)
+        finally:
+            self._reconnect = None
+
+    async def _connect(self) -> asyncpg.Connection:
+        """Get the connection, opening it and listening to all subscribed channels if needed. Hold the lock."""
+        if self._connection is not None and not self._connection.is_closed():
+            return self._connection
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            for channel in self._subscriptions:
+                await connection.add_listener(channel, self._on_notification)
+        except BaseException:
+            await connection.close()
+            raise
+
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+        return connection
+
+    async def publish(self, channel: str, message: str) -> None:
+        """Notify all processes listening to `channel`."""
+        async with self._lock:
+            connection = await self._connect()
+            await connection.execute("SELECT pg_notify($1, $2)", channel, message)
+
+    async def _listen(self, channel: str) -> None:
+        async with self._lock:
+            connection = await self._connect()
+            await connection.add_listener(channel, self._on_notification)
+
+    async def _unlisten(self, channel: str) -> None:
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                await self._connection.remove_listener(channel, self._on_notification)
+
+    async def close(self) -> None:
+        """Close the connection and stop reconnecting."""
+        self._is_closed = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if connection is not None:
+                await connection.close()
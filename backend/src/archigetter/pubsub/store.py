@@ -0,0 +1,45 @@
+"""Module that maintains the pub/sub backend configured for the application."""
+import logging
+from typing import Optional
+
+from sqlalchemy.engine.url import make_url
+
+from .. import settings
+from .base import PubSub
+from .memory import InMemoryPubSub
+from .postgres import PostgresPubSub
+
+_LOGGER = logging.getLogger(__name__)
+
+_pubsub: Optional[PubSub] = None
+
+
+def get_pubsub() -> PubSub:
+    """Get the configured pub/sub backend, create it on first use."""
+    global _pubsub
+
+    if _pubsub is None:
+        _LOGGER.info("Opening pub/sub.", extra={"backend": settings.pubsub_backend})
+        if settings.pubsub_backend == "postgres":
+            # `URL.set` is new in SQLAlchemy 1.4, sqlalchemy-stubs only know the URL of 1.3
+            dsn = make_url(settings.db_dsn_trashtv).set(drivername="postgresql")  # type: ignore[attr-defined]
+            _pubsub = PostgresPubSub(
+                str(dsn),
+                queue_size=settings.pubsub_queue_size,
+                reconnect_interval=settings.pubsub_reconnect_interval_in_seconds,
+            )
+        else:
+            _pubsub = InMemoryPubSub(settings.pubsub_queue_size)
+
+    return _pubsub
+
+
+async def close_pubsub() -> None:
+    """Close the configured pub/sub backend, it gets recreated from the settings on next use."""
+    global _pubsub
+
+    if _pubsub is None:
+        return
+
+    await _pubsub.close()
+    _pubsub = None
@@ -0,0 +1,12 @@
+"""Package to run periodic background jobs."""
+from .job import AdaptiveInterval, Job, JobStats
+from .leader import LeaderElection
+from .scheduler import Scheduler
+
+__all__ = [
+    "AdaptiveInterval",
+    "Job",
+    "JobStats",
+    "LeaderElection",
+    "Scheduler",
+]
@@ -0,0 +1,183 @@
+"""Module that describes a periodic background job and how long it waits between runs."""
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Union, cast
+
+from starlette.concurrency import run_in_threadpool
+
+from .. import settings
+
+_LOGGER = logging.getLogger(__name__)
+
+JobFunction = Callable[[], Union[Awaitable[Optional[bool]], Optional[bool]]]
+
+
+class JobStats(NamedTuple):
+    """Snapshot of the run-time metrics of a job, counted since the start of the process."""
+
+    name: str
+    runs: int
+    failures: int
+    consecutive_failures: int
+    skipped_runs: int
+    last_duration_in_seconds: Optional[float]
+    max_duration_in_seconds: float
+    total_duration_in_seconds: float
+    next_delay_in_seconds: Optional[float]
+
+
+class AdaptiveInterval:
+    """Interval that follows how often the watched source actually changes.
+
+    The time between changes is estimated with an exponential moving average. After every change the
+    job sleeps until the next change is due and then polls again after `min_interval` seconds, doubling the
+    wait up to `max_interval` for every further poll that still sees nothing new.
+    """
+
+    def __init__(
+        self, min_interval: float, max_interval: float, period: Optional[float] = None, smoothing: float = 0.3
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.period = period
+        self._last_change: Optional[float] = None
+        # polls since the change was due that did not see it
+        self._overdue_polls = 0
+
+    def next_interval(self, changed: bool, now: float) -> float:
+        """Get the seconds to wait after a run that did (not) see a change at `now`."""
+        if changed:
+            if self._last_change is not None:
+                observed_period = now - self._last_change
+                self.period = (
+                    observed_period
+                    if self.period is None
+                    else self.smoothing * observed_period + (1 - self.smoothing) * self.period
+                )
+            self._last_change = now
+            self._overdue_polls = 0
+
+        if self.period is not None and self._last_change is not None:
+            until_next_change = self._last_change + self.period - now
+            if until_next_change > self.min_interval:
+                return min(until_next_change, self.max_interval)
+
+        # the change is due, poll quickly but back off while it does not show up
+        if not changed:
+            self._overdue_polls += 1
+        backoff: float = self.min_interval * 2 ** max(self._overdue_polls - 1, 0)
+        return min(backoff, self.max_interval)
+
+
+class Job:
+    """Background job that runs `func` periodically, never overlapping with itself.
+
+    `func` may be a coroutine function or a plain function, plain functions run in the threadpool.
+    Adaptive jobs return whether they saw a change. Failing runs are retried with exponential
+    backoff capped at `max_backoff` seconds, every delay is spread by +/- `jitter` to avoid lockstep.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: JobFunction,
+        interval: float,
+        adaptive_interval: Optional[AdaptiveInterval] = None,
+        wait_first: bool = False,
+        jitter: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.adaptive_interval = adaptive_interval
+        self.wait_first = wait_first
+        self.jitter = settings.scheduler_jitter if jitter is None else jitter
+        self.max_backoff = settings.scheduler_max_backoff_in_seconds if max_backoff is None else max_backoff
+
+        self.is_running = False
+        self._runs = 0
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._skipped_runs = 0
+        self._last_duration: Optional[float] = None
+        self._max_duration = 0.0
+        self._total_duration = 0.0
+        self._next_delay: Optional[float] = None
+
+    async def _call(self) -> Optional[bool]:
+        if asyncio.iscoroutinefunction(self.func):
+            result: Any = await cast(Callable[[], Awaitable[Optional[bool]]], self.func)()
+        else:
+            result = await run_in_threadpool(self.func)
+        return result if result is None else bool(result)
+
+    async def run_once(self) -> Optional[bool]:
+        """Run the job right now, unless it is already running.
+
+        Returns whether the run saw a change, `None` if it failed, was skipped or does not tell.
+        """
+        if self.is_running:
+            self._skipped_runs += 1
+            _LOGGER.warning("Job is still running, skipping run.", extra={"job": self.name})
+            return None
+
+        self.is_running = True
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            changed = await self._call()
+        except Exception as e:
+            self._failures += 1
+            self._consecutive_failures += 1
+            _LOGGER.error("Job failed.", extra={"job": self.name, "exception": e})
+            return None
+        else:
+            self._consecutive_failures = 0
+            return changed
+        finally:
+            self.is_running = False
+            duration = loop.time() - started
+            self._runs += 1
+            self._last_duration = duration
+            self._max_duration = max(self._max_duration, duration)
+            self._total_duration += duration
+
+    def next_delay(self, changed: Optional[bool], now: float) -> float:
+        """Get the seconds to wait after a run, given its outcome."""
+        delay: float
+        if self._consecutive_failures:
+            delay = min(self.interval * 2 ** self._consecutive_failures, self.max_backoff)
+        elif self.adaptive_interval is not None:
+            delay = self.adaptive_interval.next_interval(bool(changed), now)
+        else:
+            delay = self.interval
+
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def run_forever(self) -> None:
+        """Run the job until cancelled, waiting between runs as told by `next_delay`."""
+        loop = asyncio.get_running_loop()
+        if self.wait_first:
+            await asyncio.sleep(self.interval)
+
+        while True:
+            changed = await self.run_once()
+            self._next_delay = self.next_delay(changed, loop.time())
+            await asyncio.sleep(self._next_delay)
+
+    def stats(self) -> JobStats:
+        """Get the run-time metrics of the job."""
+        return JobStats(
+            name=self.name,
+            runs=self._runs,
+            failures=self._failures,
+            consecutive_failures=self._consecutive_failures,
+            skipped_runs=self._skipped_runs,
+            last_duration_in_seconds=self._last_duration,
+            max_duration_in_seconds=self._max_duration,
+            total_duration_in_seconds=self._total_duration,
+            next_delay_in_seconds=self._next_delay,
+        )
@@ -0,0 +1,107 @@
+"""Module to elect the one process that runs the background jobs.
+
+Every process competes for a Postgres session level advisory lock on a dedicated connection. The process
+holding the lock is the leader and runs the scheduler, all others only serve traffic. If the leader dies its
+connection closes, Postgres releases the lock and another process takes over on its next attempt.
+A connection that might still hold the lock is invalidated instead of being returned to the pool.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import BigInteger, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .. import settings
+from .scheduler import Scheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Hold or wait for the advisory lock `lock_key` and run `scheduler` only while holding it."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[AsyncConnection]],
+        lock_key: Optional[int] = None,
+        interval: Optional[float] = None,
+    ) -> None:
+        self.connect = connect
+        self.lock_key = settings.leader_election_lock_key if lock_key is None else lock_key
+        self.interval = settings.leader_election_interval_in_seconds if interval is None else interval
+        self.is_leader = False
+        self._connection: Optional[AsyncConnection] = None
+        # advisory lock keys are bigint, asyncpg would send a plain int as int4
+        self._lock_key_literal = literal(self.lock_key, BigInteger)
+
+    async def _close_connection(self, invalidate: bool = False) -> None:
+        """Close the connection, `invalidate` it if it might still hold the lock so it is not pooled again."""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+
+        try:
+            if invalidate:
+                await connection.invalidate()
+            await connection.close()
+        except Exception as e:
+            _LOGGER.warning("Could not close leader election connection.", extra={"exception": e})
+
+    async def try_lead(self) -> bool:
+        """Try to become leader, or check that the lock is still held if already leading.
+
+        A broken connection means its lock is gone, leadership is given up then.
+        """
+        try:
+            if self._connection is None:
+                connection = await self.connect()
+                # the lock outlives transactions, do not leave the connection idle in one
+                self._connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+
+            if self.is_leader:
+                await self._connection.execute(select([literal(1)]))
+            else:
+                self.is_leader = bool(
+                    await self._connection.scalar(select([func.pg_try_advisory_lock(self._lock_key_literal)]))
+                )
+        except Exception as e:
+            _LOGGER.error("Leader election failed.", extra={"exception": e, "was_leader": self.is_leader})
+            self.is_leader = False
+            await self._close_connection(invalidate=True)
+
+        return self.is_leader
+
+    async def resign(self) -> None:
+        """Give up leadership, so another process can take over right away."""
+        unlocked = True
+        if self.is_leader and self._connection is not None:
+            try:
+                await self._connection.scalar(select([func.pg_advisory_unlock(self._lock_key_literal)]))
+            except Exception as e:
+                _LOGGER.warning("Could not release leader lock.", extra={"exception": e})
+                unlocked = False
+
+        self.is_leader = False
+        await self._close_connection(invalidate=not unlocked)
+
+    async def run(self, scheduler: Scheduler) -> None:
+        """Start `scheduler` whenever this process becomes leader and stop it when leadership is lost.
+
+        Runs until cancelled, the scheduler is stopped and leadership is given up then.
+        """
+        try:
+            while True:
+                was_leader = self.is_leader
+                is_leader = await self.try_lead()
+                if is_leader and not was_leader:
+                    _LOGGER.info("Became leader, starting background jobs.", extra={"lock_key": self.lock_key})
+                    scheduler.start()
+                elif was_leader and not is_leader:
+                    _LOGGER.warning("Lost leadership, stopping background jobs.", extra={"lock_key": self.lock_key})
+                    await scheduler.stop()
+
+                await asyncio.sleep(self.interval)
+        finally:
+            await scheduler.stop()
+            await self.resign()
@@ -0,0 +1,54 @@
+"""Module that runs all background jobs of a process."""
+import asyncio
+import logging
+from typing import Dict, List
+
+from .job import Job, JobStats
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Run every added job in its own task until the scheduler is stopped."""
+
+    def __init__(self) -> None:
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    def add(self, job: Job) -> Job:
+        """Add `job`, it starts with the scheduler or right away if the scheduler already runs."""
+        if job.name in self.jobs:
+            raise ValueError(f"A job named {job.name} was already added.")
+
+        self.jobs[job.name] = job
+        if self.is_running:
+            self._start_job(job)
+        return job
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the jobs are running."""
+        return bool(self._tasks)
+
+    def _start_job(self, job: Job) -> None:
+        _LOGGER.info("Starting job.", extra={"job": job.name})
+        self._tasks.append(asyncio.ensure_future(job.run_forever()))
+
+    def start(self) -> None:
+        """Start running all jobs."""
+        if self.is_running:
+            return
+
+        for job in self.jobs.values():
+            self._start_job(job)
+
+    async def stop(self) -> None:
+        """Stop all jobs, waiting for running jobs to be cancelled."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> List[JobStats]:
+        """Get the run-time metrics of all jobs."""
+        return [job.stats() for job in self.jobs.values()]
@@ -0,0 +1,10 @@
+"""Package for transcoding gifs into smaller video renditions and posters."""
+from .crud import transcode_gifs
+from .ffmpeg import RENDITION_FORMATS
+from .pool import close_transcode_executor
+
+__all__ = [
+    "RENDITION_FORMATS",
+    "close_transcode_executor",
+    "transcode_gifs",
+]
@@ -0,0 +1,126 @@
+"""Module that handels all crud operations concerning the transcoding of gifs."""
+import asyncio
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import settings
+from ..blobstore import Blob, BlobStore, get_blob_store
+from ..cache import NOW_PLAYING_KEY, now_playing_cache
+from ..database.models.trashtv import TrashTvArchillectData, TrashTvGifRendition
+from .ffmpeg import TranscodeResult
+from .pool import transcode_in_pool
+
+_LOGGER = logging.getLogger(__name__)
+
+_COPY_CHUNK_SIZE = 64 * 1024
+
+
+async def _source_path(blob_store: BlobStore, gif_sha256: str, temp_dir: Path) -> Path:
+    """Get a local file of the gif, downloading it from remote blob stores."""
+    local_path = blob_store.local_path(gif_sha256)
+    if local_path is not None:
+        return local_path
+
+    source_path = temp_dir / "source.gif"
+    with source_path.open("wb") as source_file:
+        async for chunk in blob_store.read(gif_sha256):
+            source_file.write(chunk)
+    return source_path
+
+
+async def _store_rendition(blob_store: BlobStore, path: Path) -> Blob:
+    writer = blob_store.open_writer()
+    try:
+        with path.open("rb") as rendition_file:
+            for chunk in iter(lambda: rendition_file.read(_COPY_CHUNK_SIZE), b""):
+                writer.write(chunk)
+    except BaseException:
+        writer.close()
+        raise
+
+    return await blob_store.put(writer)
+
+
+async def _transcode_gif(blob_store: BlobStore, gif_sha256: str) -> Tuple[str, Dict[str, Optional[Blob]]]:
+    """Transcode a stored gif and store its renditions. Failed renditions are `None`."""
+    temp_dir = Path(tempfile.mkdtemp(prefix="transcode-"))
+    try:
+        source_path = await _source_path(blob_store, gif_sha256, temp_dir)
+        results: List[TranscodeResult] = await transcode_in_pool(str(source_path), str(temp_dir))
+
+        renditions: Dict[str, Optional[Blob]] = {}
+        for result in results:
+            if result.path is None:
+                _LOGGER.warning(
+                    "Could not transcode gif.",
+                    extra={"gif_sha256": gif_sha256, "format": result.format, "error": result.error},
+                )
+                renditions[result.format] = None
+            else:
+                renditions[result.format] = await _store_rendition(blob_store, Path(result.path))
+        return gif_sha256, renditions
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, temp_dir, True)
+
+
+async def transcode_gifs(session: AsyncSession) -> int:
+    """Transcode up to `gif_transcode_batch_size` downloaded gifs without renditions, newest first.
+
+    Gifs are transcoded concurrently in the transcode process pool, the renditions of every gif are
+    committed as soon as it is done. Gifs that could not be read are tried again on the next run.
+    Added renditions invalidate the cached gif now playing. Returns the number of transcoded gifs.
+    """
+    if shutil.which(settings.gif_transcode_ffmpeg_path) is None:
+        _LOGGER.warning("ffmpeg not found, not transcoding.", extra={"ffmpeg": settings.gif_transcode_ffmpeg_path})
+        return 0
+
+    has_renditions = exists().where(TrashTvGifRendition.gif_sha256 == TrashTvArchillectData.gif_sha256)
+    not_transcoded = await session.execute(
+        select([TrashTvArchillectData.gif_sha256])
+        .where(and_(TrashTvArchillectData.gif_sha256.isnot(None), ~has_renditions))
+        .group_by(TrashTvArchillectData.gif_sha256)
+        .order_by(func.max(TrashTvArchillectData.timestamp).desc())
+        .limit(settings.gif_transcode_batch_size)
+    )
+    gif_sha256s = list(not_transcoded.scalars())
+    await session.commit()
+
+    blob_store = get_blob_store()
+    transcoded_gifs = 0
+    for transcode in asyncio.as_completed([_transcode_gif(blob_store, gif_sha256) for gif_sha256 in gif_sha256s]):
+        try:
+            gif_sha256, renditions = await transcode
+        except Exception as e:
+            _LOGGER.error("Could not transcode gif.", extra={"exception": e})
+            continue
+
+        await session.execute(
+            insert(TrashTvGifRendition)
+            .values(
+                [
+                    {
+                        "gif_sha256": gif_sha256,
+                        "format": rendition_format,
+                        "sha256": blob.sha256 if blob else None,
+                        "size_in_bytes": blob.size if blob else None,
+                        "mime_type": blob.mime_type if blob else None,
+                    }
+                    for rendition_format, blob in renditions.items()
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        await session.commit()
+        transcoded_gifs += 1
+        if any(renditions.values()):
+            now_playing_cache.invalidate(NOW_PLAYING_KEY)
+
+    _LOGGER.info("Transcoded gifs.", extra={"transcoded_gifs": transcoded_gifs})
+    return transcoded_gifs
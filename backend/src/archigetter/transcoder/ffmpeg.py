@@ -0,0 +1,67 @@
+"""Module that transcodes a gif into its renditions with ffmpeg.
+
+Runs in the processes of the transcode pool, everything here blocks.
+"""
+import subprocess
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+
+class RenditionFormat(NamedTuple):
+    """How to transcode a gif into one rendition."""
+
+    suffix: str
+    ffmpeg_args: List[str]
+
+
+# gifs may have odd dimensions, which yuv420p does not allow
+_EVEN_DIMENSIONS = ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p"]
+
+RENDITION_FORMATS = {
+    "webm": RenditionFormat(".webm", ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "41", *_EVEN_DIMENSIONS, "-an"]),
+    "mp4": RenditionFormat(
+        ".mp4",
+        ["-c:v", "libx264", "-preset", "slow", "-crf", "26", "-movflags", "+faststart", *_EVEN_DIMENSIONS, "-an"],
+    ),
+    "poster": RenditionFormat(".png", ["-frames:v", "1"]),
+}
+
+
+class TranscodeResult(NamedTuple):
+    """Outcome of transcoding a gif into one rendition."""
+
+    format: str
+    path: Optional[str]
+    error: Optional[str]
+
+
+def transcode(ffmpeg_path: str, source_path: str, target_dir: str, timeout: float) -> List[TranscodeResult]:
+    """Transcode the gif at `source_path` into every rendition format, writing the renditions into `target_dir`.
+
+    Paths are passed as strings, they cross process boundaries. A failed format does not stop the others.
+    """
+    results = []
+    for name, rendition_format in RENDITION_FORMATS.items():
+        target_path = Path(target_dir) / f"{name}{rendition_format.suffix}"
+        command = [
+            ffmpeg_path,
+            "-y",
+            "-v",
+            "error",
+            "-i",
+            source_path,
+            *rendition_format.ffmpeg_args,
+            str(target_path),
+        ]
+        try:
+            subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            results.append(TranscodeResult(name, None, e.stderr.decode(errors="replace")[-1000:]))
+            continue
+        except (OSError, subprocess.TimeoutExpired) as e:
+            results.append(TranscodeResult(name, None, repr(e)))
+            continue
+
+        results.append(TranscodeResult(name, str(target_path), None))
+
+    return results
@@ -0,0 +1,48 @@
+"""Module that maintains the process pool gifs are transcoded in."""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from .. import settings
+from .ffmpeg import TranscodeResult, transcode
+
+_LOGGER = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_transcode_executor() -> ProcessPoolExecutor:
+    """Get the transcode process pool, create it on first use."""
+    global _executor
+
+    if _executor is None:
+        _LOGGER.info("Starting transcode processes.", extra={"processes": settings.gif_transcode_processes})
+        _executor = ProcessPoolExecutor(max_workers=settings.gif_transcode_processes)
+
+    return _executor
+
+
+async def close_transcode_executor() -> None:
+    """Stop the transcode processes once their running transcodes are done."""
+    global _executor
+
+    if _executor is None:
+        return
+
+    executor, _executor = _executor, None
+    await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+async def transcode_in_pool(source_path: str, target_dir: str) -> List[TranscodeResult]:
+    """Transcode a gif into its renditions in the process pool, without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    results: List[TranscodeResult] = await loop.run_in_executor(
+        get_transcode_executor(),
+        transcode,
+        settings.gif_transcode_ffmpeg_path,
+        source_path,
+        target_dir,
+        settings.gif_transcode_timeout_in_seconds,
+    )
+    return results
@@ -0,0 +1,12 @@
+"""Package to run the background jobs, either inside the API process or standalone."""
+from .jobs import create_application_tables, scheduler, start_background_jobs, stop_background_jobs
+from .worker import run, start
+
+__all__ = [
+    "create_application_tables",
+    "run",
+    "scheduler",
+    "start",
+    "start_background_jobs",
+    "stop_background_jobs",
+]
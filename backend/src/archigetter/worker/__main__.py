@@ -0,0 +1,5 @@
+"""Module that allows running the worker, `python -m archigetter.worker`."""
+from .worker import start  # pragma: no cover
+
+if __name__ == "__main__":  # pragma: no cover
+    start()
@@ -0,0 +1,126 @@
+"""Module that defines the background jobs crawling Archillect and keeping the db in shape."""
+import asyncio
+import logging
+from typing import Optional
+
+from .. import archicrawler, archisender, metrics, settings, transcoder
+from ..archicrawler import download_queue
+from ..database import connect_db_trashtv_async, get_db_trashtv_async_session, get_db_trashtv_session, maintenance
+from ..database.models import trashtv
+from ..scheduler import AdaptiveInterval, Job, LeaderElection, Scheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def record_current_gif() -> bool:
+    """Get newest gifs from Archillect, only gifs that just came on Archillect are recorded.
+
+    Returns whether Archillect changed, so the crawl follows the pace of Archillect.
+    The new gif now playing is published to the viewers of all processes.
+    """
+    _LOGGER.info("Executing periodicall task: current gif to db.")
+
+    changed_gifs, scraped_state = await archicrawler.get_changed_from_archillect()
+    if not changed_gifs:
+        archicrawler.archillect_tv_state.update(scraped_state)
+        return False
+
+    async with get_db_trashtv_async_session() as trashtv_db_session:
+        await archicrawler.gif_to_db(trashtv_db_session, add_current=True, crawled_gifs=changed_gifs)
+    # only remember the scrape once its gifs are stored, otherwise the next crawl would skip them
+    archicrawler.archillect_tv_state.update(scraped_state)
+    await archisender.publish_now_playing()
+    return True
+
+
+async def download_gifs() -> None:
+    """Download and save gifs, the gif now playing is published again if it might just have been saved.
+
+    The download backlog left is recorded for the metrics.
+    """
+    _LOGGER.info("Executing periodicall task: download gif to db.")
+
+    async with get_db_trashtv_async_session() as trashtv_db_session:
+        saved_gifs = await archicrawler.save_gif_to_db(trashtv_db_session)
+        metrics.GIF_DOWNLOAD_BACKLOG.set(await download_queue.count_pending_gif_downloads(trashtv_db_session))
+    if saved_gifs:
+        await archisender.publish_now_playing()
+
+
+async def transcode_gifs() -> None:
+    """Transcode downloaded gifs, the gif now playing is published again if it might just have been transcoded."""
+    _LOGGER.info("Executing periodicall task: transcode gifs.")
+
+    async with get_db_trashtv_async_session() as trashtv_db_session:
+        transcoded_gifs = await transcoder.transcode_gifs(trashtv_db_session)
+    if transcoded_gifs:
+        await archisender.publish_now_playing()
+
+
+def maintain_db() -> None:
+    """Create upcoming history partitions, compact old history and queue gifs missing a download job.
+
+    Runs right after this process became leader, so only one process at a time does this DDL and backfill.
+    """
+    _LOGGER.info("Executing periodicall task: maintain db.")
+
+    with get_db_trashtv_session() as trashtv_db_session:
+        maintenance.maintain_history(trashtv_db_session)
+        maintenance.enqueue_missing_gif_downloads(trashtv_db_session)
+
+
+def create_application_tables() -> None:
+    """Create the table of the database our application directly owns.
+
+    History partitions and queueing missing downloads are left to the leader, see `maintain_db`.
+    """
+    with get_db_trashtv_session() as trashtv_db_session:
+        engine_trashtv = trashtv_db_session.get_bind()
+        trashtv.Base.metadata.create_all(engine_trashtv)
+
+
+scheduler = Scheduler()
+scheduler.add(
+    Job(
+        "record_current_gif",
+        record_current_gif,
+        interval=settings.archillect_fetch_period_in_seconds,
+        adaptive_interval=AdaptiveInterval(
+            settings.archillect_fetch_min_interval_in_seconds,
+            settings.archillect_fetch_max_interval_in_seconds,
+            period=settings.archillect_fetch_period_in_seconds,
+        ),
+    )
+)
+scheduler.add(Job("download_gifs", download_gifs, interval=settings.gif_download_period_in_seconds))
+scheduler.add(Job("transcode_gifs", transcode_gifs, interval=settings.gif_transcode_period_in_seconds))
+scheduler.add(Job("maintain_db", maintain_db, interval=settings.history_maintenance_period_in_seconds))
+
+_leader_election: Optional["asyncio.Future[None]"] = None
+
+
+def start_background_jobs() -> None:
+    """Start crawling, downloading and maintaining in the background.
+
+    With leader election only the one process holding the leader lock runs the jobs.
+    """
+    global _leader_election
+
+    if not settings.leader_election_enabled:
+        scheduler.start()
+        return
+
+    if _leader_election is None:
+        _leader_election = asyncio.ensure_future(LeaderElection(connect_db_trashtv_async).run(scheduler))
+
+
+async def stop_background_jobs() -> None:
+    """Stop all background jobs and give up leadership."""
+    global _leader_election
+
+    if _leader_election is not None:
+        _leader_election.cancel()
+        await asyncio.gather(_leader_election, return_exceptions=True)
+        _leader_election = None
+
+    await scheduler.stop()
@@ -0,0 +1,50 @@
+"""Module that runs the background jobs without the API."""
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from prometheus_client import start_http_server
+from starlette.concurrency import run_in_threadpool
+
+from .. import archicrawler, settings
+from ..blobstore import close_blob_store
+from ..database import close_db_trashtv_async_engine
+from ..pubsub import close_pubsub
+from ..transcoder import close_transcode_executor
+from .jobs import create_application_tables, start_background_jobs, stop_background_jobs
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def run(stop: Optional[asyncio.Event] = None) -> None:
+    """Run all background jobs until `stop` is set, or until SIGINT/SIGTERM if no event is given."""
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+    await run_in_threadpool(create_application_tables)
+
+    if settings.worker_metrics_port is not None:
+        _LOGGER.info("Serving metrics.", extra={"port": settings.worker_metrics_port})
+        start_http_server(settings.worker_metrics_port)
+
+    _LOGGER.info("Starting worker.")
+    start_background_jobs()
+    try:
+        await stop.wait()
+    finally:
+        _LOGGER.info("Stopping worker.")
+        await stop_background_jobs()
+        await close_transcode_executor()
+        await archicrawler.close_http_client()
+        await close_blob_store()
+        await close_pubsub()
+        await close_db_trashtv_async_engine()
+
+
+def start() -> None:
+    """Start running the worker."""
+    asyncio.run(run())
@@ -0,0 +1 @@
+"""Package to benchmark performance critical code paths."""
@@ -0,0 +1,15 @@
+"""Configure the benchmarks.
+
+pytest-benchmark times plain functions only, async code is benchmarked by running it to completion on the
+event loop of the test. The async fixtures share that loop, so pooled connections stay usable across rounds.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+
+@pytest.fixture()
+def run(event_loop: asyncio.AbstractEventLoop) -> Callable[[Awaitable[Any]], Any]:
+    """Provide a function that runs a coroutine to completion on the event loop of the test."""
+    return event_loop.run_until_complete
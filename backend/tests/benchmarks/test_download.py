@@ -0,0 +1,74 @@
+"""Benchmark downloading a backlog of large gifs into the blob store.
+
+Run with `poe bench`, in the regular test run every benchmark is executed once without timing.
+"""
+import itertools
+import os
+from typing import Any, AsyncContextManager, Awaitable, Callable, ContextManager
+
+import pytest
+import respx
+from httpx import Request, Response
+from pytest_benchmark.fixture import BenchmarkFixture
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from archigetter import settings
+from archigetter.archicrawler.crud import save_gif_to_db
+from archigetter.blobstore import LocalBlobStore
+from archigetter.database.maintenance import enqueue_missing_gif_downloads
+from archigetter.database.models.trashtv import TrashTvArchillectData
+
+MOCK_GIF_URL = "https://some.fake.gif.url.local"
+
+_BACKLOG_SIZE = 10
+_GIF_SIZE_IN_BYTES = 2 * 1024 * 1024
+
+
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+def test_save_gif_to_db(
+    benchmark: BenchmarkFixture,
+    run: Callable[[Awaitable[Any]], Any],
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Benchmark `save_gif_to_db` working off a backlog of large gifs, each with its own bytes.
+
+    Archillect is not throttled here and the gifs are random bytes that are not hashed for deduplication,
+    so the benchmark measures streaming into the blob store and recording the downloads.
+    """
+    monkeypatch.setattr(settings, "gif_download_requests_per_second_per_host", 1_000_000.0)
+    monkeypatch.setattr(settings, "gif_download_batch_size", _BACKLOG_SIZE)
+    monkeypatch.setattr(settings, "gif_dedup_enabled", False)
+    benchmark.group = "save_gif_to_db"
+    gif_ids = itertools.count()
+
+    def _random_gif(request: Request) -> Response:
+        return Response(200, content=os.urandom(_GIF_SIZE_IN_BYTES), headers={"content-type": "image/gif"})
+
+    respx_mock.get(path__startswith="/gif_").mock(side_effect=_random_gif)
+
+    async def _save_gif_to_db() -> int:
+        async with get_test_async_session_trashtv() as async_session:
+            return await save_gif_to_db(async_session)
+
+    def _backlog() -> Any:
+        with get_test_session_trashtv() as session:
+            session.add_all(
+                [
+                    TrashTvArchillectData(archillect_id=str(gif_id), source_link=f"{MOCK_GIF_URL}/gif_{gif_id}")
+                    for gif_id in itertools.islice(gif_ids, _BACKLOG_SIZE)
+                ]
+            )
+            session.commit()
+            enqueue_missing_gif_downloads(session)
+        return (_save_gif_to_db(),), {}
+
+    with clean_db_trashtv():
+        saved_gifs = benchmark.pedantic(run, setup=_backlog, rounds=3, iterations=1)
+
+    assert saved_gifs == _BACKLOG_SIZE
@@ -0,0 +1,41 @@
+"""Benchmark extracting gifs from the Archillect TV html.
+
+Run with `poe bench`, in the regular test run every benchmark is executed once without timing.
+"""
+from typing import Any, Callable, Dict
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from archigetter import settings
+from archigetter.archicrawler.crawler import _extract_html_data
+
+# the live page ships its player scripts and styles alongside the few elements we need
+_PAGE_NOISE = "<script>{}</script><style>{}</style>".format("var x = 1;" * 2000, ".a{color:red}" * 2000)
+
+
+@pytest.fixture()
+def archillect_tv_html(get_sample_html: Callable[..., Dict[str, Any]]) -> str:
+    """Provide the Archillect TV html padded to the size of the live page."""
+    html: str = get_sample_html(
+        {
+            "archillect_id": "123",
+            "source_link": "https://test.local/123.gif",
+            "buffer_id": "456",
+            "buffer_link": "https://test.local/456.gif",
+        }
+    )["html"]
+    return html.replace('<html lang="en">', f'<html lang="en"><head>{_PAGE_NOISE}</head>') + _PAGE_NOISE
+
+
+@pytest.mark.parametrize("extractor", ["streaming", "bs4"])
+def test_extract_html_data(
+    benchmark: BenchmarkFixture, archillect_tv_html: str, extractor: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Benchmark `_extract_html_data` with every extractor."""
+    monkeypatch.setattr(settings, "archillect_html_extractor", extractor)
+    benchmark.group = "extract_html_data"
+
+    result = benchmark(_extract_html_data, archillect_tv_html)
+
+    assert [gif["archillect_id"] for gif in result] == ["123", "456"]
@@ -0,0 +1,79 @@
+"""Benchmark pushing a new gif to many `/trash` viewers, via Postgres pub/sub.
+
+Run with `poe bench`, in the regular test run every benchmark is executed once without timing.
+"""
+import asyncio
+import itertools
+import json
+from typing import Any, Awaitable, Callable, ContextManager
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from archigetter import settings
+from archigetter.archisender import NOW_PLAYING_CHANNEL, TrashHub, TrashSubscriber, broadcast_trash
+from archigetter.pubsub import close_pubsub, get_pubsub
+
+
+@pytest.mark.parametrize("viewer_count", [1, 100, 1000])
+def test_trash_fan_out(
+    benchmark: BenchmarkFixture,
+    run: Callable[[Awaitable[Any]], Any],
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    monkeypatch: pytest.MonkeyPatch,
+    viewer_count: int,
+) -> None:
+    """Benchmark the time from publishing a gif until all `viewer_count` viewers received it.
+
+    Every viewer drains its queue in its own task, like the send loop of a `/trash` websocket.
+    """
+    monkeypatch.setattr(settings, "pubsub_backend", "postgres")
+    benchmark.group = "trash_fan_out"
+    hub = TrashHub(queue_size=settings.trash_client_queue_size, max_skipped_messages=1)
+    gif_ids = itertools.count()
+    published_message = ""
+    received_viewers = 0
+    all_received = asyncio.Event()
+
+    async def _view(subscriber: TrashSubscriber) -> None:
+        nonlocal received_viewers
+        while True:
+            message = await subscriber.queue.get()
+            if message == published_message:
+                received_viewers += 1
+                if received_viewers == viewer_count:
+                    all_received.set()
+
+    async def _publish(message: str) -> None:
+        await get_pubsub().publish(NOW_PLAYING_CHANNEL, message)
+        await asyncio.wait_for(all_received.wait(), timeout=10)
+
+    def _next_message() -> Any:
+        nonlocal published_message, received_viewers
+        message = json.dumps({"data": {"archillect_id": str(next(gif_ids))}})
+        published_message, received_viewers = message, 0
+        all_received.clear()
+        return (_publish(message),), {}
+
+    async def _start() -> Any:
+        broadcaster = asyncio.ensure_future(broadcast_trash(hub))
+        viewers = [asyncio.ensure_future(_view(hub.subscribe())) for _ in range(viewer_count)]
+        # wait for the broadcaster to listen, it pushes the gif from db once it does
+        while hub.last_message is None:
+            await asyncio.sleep(0.01)
+        return [broadcaster, *viewers]
+
+    async def _stop(tasks: Any) -> None:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await close_pubsub()
+
+    with clean_db_trashtv():
+        tasks = run(_start())
+        try:
+            benchmark.pedantic(run, setup=_next_message, rounds=20, iterations=1)
+        finally:
+            run(_stop(tasks))
+
+    assert received_viewers == viewer_count
@@ -0,0 +1,76 @@
+"""Benchmark recording crawled gifs in the db, from a single gif up to a large backfill.
+
+Run with `poe bench`, in the regular test run every benchmark is executed once without timing.
+"""
+import itertools
+from typing import Any, AsyncContextManager, Awaitable, Callable, ContextManager, Dict, List
+
+import pytest
+import respx
+from pytest_benchmark.fixture import BenchmarkFixture
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from archigetter.archicrawler.crud import gif_to_db
+
+_ROUNDS = 5
+
+
+@pytest.mark.parametrize("gif_count", [1, 100, 10_000])
+def test_gif_to_db(
+    benchmark: BenchmarkFixture,
+    run: Callable[[Awaitable[Any]], Any],
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    gif_count: int,
+) -> None:
+    """Benchmark `gif_to_db` inserting `gif_count` new gifs with their history and download jobs."""
+    benchmark.group = "gif_to_db"
+    gif_ids = itertools.count()
+
+    def _crawled_gifs() -> List[Dict[str, Any]]:
+        return [
+            {"archillect_id": str(gif_id), "source_link": f"https://test.local/{gif_id}.gif", "css_id": "screenbg"}
+            for gif_id in itertools.islice(gif_ids, gif_count)
+        ]
+
+    async def _gif_to_db(crawled_gifs: List[Dict[str, Any]]) -> int:
+        async with get_test_async_session_trashtv() as async_session:
+            return await gif_to_db(async_session, add_current=True, crawled_gifs=crawled_gifs)
+
+    with clean_db_trashtv():
+        inserted_gifs = benchmark.pedantic(
+            run, setup=lambda: ((_gif_to_db(_crawled_gifs()),), {}), rounds=_ROUNDS, iterations=1
+        )
+
+    assert inserted_gifs == gif_count
+
+
+@respx.mock
+def test_crawl_to_db(
+    benchmark: BenchmarkFixture,
+    run: Callable[[Awaitable[Any]], Any],
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    mock_archillect: Callable[..., ContextManager[None]],
+) -> None:
+    """Benchmark a full crawl tick, scraping the mocked Archillect TV page and recording its new gifs."""
+    benchmark.group = "gif_to_db"
+    rounds = 20
+    sample_data = [
+        {
+            "archillect_id": str(gif_id),
+            "source_link": f"https://test.local/{gif_id}.gif",
+            "buffer_id": str(gif_id + 1),
+            "buffer_link": f"https://test.local/{gif_id + 1}.gif",
+        }
+        for gif_id in range(0, 2 * rounds, 2)
+    ]
+
+    async def _crawl_to_db() -> int:
+        async with get_test_async_session_trashtv() as async_session:
+            return await gif_to_db(async_session, add_current=True)
+
+    with clean_db_trashtv(), mock_archillect(sample_data):
+        inserted_gifs = benchmark.pedantic(run, setup=lambda: ((_crawl_to_db(),), {}), rounds=rounds, iterations=1)
+
+    assert inserted_gifs == 2
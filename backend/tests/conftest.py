@@ -1,23 +1,38 @@
 """Configure and setup testing of the service."""
-from contextlib import AbstractContextManager, contextmanager
+import random
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, asynccontextmanager, contextmanager
+from io import BytesIO
 from pathlib import Path
 from string import Template
-from typing import Any, Callable, ContextManager, Dict, Generator, List, Optional
+from typing import Any, AsyncGenerator, Callable, ContextManager, Dict, Generator, List, Optional
 
 import pytest
 import respx
 from fastapi.testclient import TestClient
 from httpx import Request, Response
+from PIL import Image, ImageChops
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 from archigetter import settings
 from archigetter.api import app
+from archigetter.archicrawler import archillect_tv_state, close_http_client, dedup_index
+from archigetter.blobstore import LocalBlobStore, close_blob_store, get_blob_store
+from archigetter.cache import clear_caches
+from archigetter.database import close_db_trashtv_async_engine
 from archigetter.database.models.trashtv import Base as BasePostgresTrash
 from archigetter.database.models.trashtv import TrashTvArchillectData
+from archigetter.pubsub import InMemoryPubSub, close_pubsub, get_pubsub
 
 engine_trashtv = create_engine(settings.db_dsn_trashtv)
 SessionLocalTrashTv = sessionmaker(bind=engine_trashtv)
+# every test runs its own event loop, so async connections must not be pooled across tests
+async_dsn = make_url(settings.db_dsn_trashtv).set(drivername="postgresql+asyncpg")  # type: ignore[attr-defined]
+engine_trashtv_async = create_async_engine(async_dsn, poolclass=NullPool)
+AsyncSessionLocalTrashTv = sessionmaker(bind=engine_trashtv_async, class_=AsyncSession, expire_on_commit=False)
 
 
 @pytest.fixture(scope="session")
@@ -32,6 +47,36 @@ def project_root_tests_path(project_root_path: Path) -> Path:
     return project_root_path / "tests"
 
 
+@pytest.fixture(scope="session")
+def pattern_gif() -> Callable[..., bytes]:
+    """Draw gifs of a few frames of a random blocky pattern, the same `seed` draws the same pattern at any `size`."""
+
+    def _pattern_gif(seed: int, size: int) -> bytes:
+        generator = random.Random(seed)
+        pattern = Image.frombytes("L", (12, 12), bytes(generator.randrange(256) for _ in range(144)))
+        frames = [
+            ImageChops.add(pattern, Image.new("L", pattern.size, brightness)).resize((size, size), Image.NEAREST)
+            for brightness in (0, 8, 16)
+        ]
+        gif = BytesIO()
+        frames[0].save(gif, format="GIF", save_all=True, append_images=frames[1:])
+        return gif.getvalue()
+
+    return _pattern_gif
+
+
+@pytest.fixture(scope="session")
+def flat_gif() -> Callable[..., bytes]:
+    """Draw gifs of a single grey, e.g. black or faded to a dull grey."""
+
+    def _flat_gif(brightness: int, size: int) -> bytes:
+        gif = BytesIO()
+        Image.new("L", (size, size), brightness).save(gif, format="GIF")
+        return gif.getvalue()
+
+    return _flat_gif
+
+
 @pytest.fixture(scope="session")
 def test_client():
     """Test client of the service.
@@ -42,6 +87,71 @@ def test_client():
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+async def close_crawler_http_client() -> AsyncGenerator[None, None]:
+    """Close the shared crawler http client after each test, so no pooled connection outlives its event loop."""
+    yield
+    await close_http_client()
+
+
+@pytest.fixture(autouse=True)
+def reset_archillect_tv_state() -> Generator[None, None, None]:
+    """Forget what the crawler saw on Archillect, so every test starts with a full scrape."""
+    archillect_tv_state.reset()
+    yield
+    archillect_tv_state.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_dedup_index() -> Generator[None, None, None]:
+    """Forget the hashed gifs, so every test loads them from its own db."""
+    dedup_index.reset()
+    yield
+    dedup_index.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_caches() -> Generator[None, None, None]:
+    """Forget all cached gifs, so no test is served what another one stored."""
+    clear_caches()
+    yield
+    clear_caches()
+
+
+@pytest.fixture(autouse=True)
+async def close_db_connections() -> AsyncGenerator[None, None]:
+    """Close the pooled async db connections of the application after each test, they are bound to its event loop."""
+    yield
+    await close_db_trashtv_async_engine()
+
+
+@pytest.fixture()
+async def local_blob_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> AsyncGenerator[LocalBlobStore, None]:
+    """Provide the application blob store, storing into a temporary directory."""
+    await close_blob_store()
+    monkeypatch.setattr(settings, "blob_store_backend", "local")
+    monkeypatch.setattr(settings, "blob_store_local_path", tmp_path / "blobs")
+
+    blob_store = get_blob_store()
+    assert isinstance(blob_store, LocalBlobStore)
+    yield blob_store
+
+    await close_blob_store()
+
+
+@pytest.fixture()
+async def memory_pubsub(monkeypatch: pytest.MonkeyPatch) -> AsyncGenerator[InMemoryPubSub, None]:
+    """Provide the application pub/sub, passing messages within the test process only."""
+    await close_pubsub()
+    monkeypatch.setattr(settings, "pubsub_backend", "memory")
+
+    pubsub = get_pubsub()
+    assert isinstance(pubsub, InMemoryPubSub)
+    yield pubsub
+
+    await close_pubsub()
+
+
 def _reset_database_tables(Base, engine):
     Base.metadata.drop_all(bind=engine)
 
@@ -86,6 +196,26 @@ def get_test_session_trashtv() -> Callable[..., AbstractContextManager[sessionma
     return _get_db_session_trashtv
 
 
+@pytest.fixture(scope="session")
+def get_test_async_session_trashtv() -> Callable[..., AbstractAsyncContextManager[AsyncSession]]:
+    """Patch to provide an async contextmanager for trashtv db session."""
+
+    @asynccontextmanager
+    async def _get_db_async_session_trashtv() -> AsyncGenerator[AsyncSession, None]:
+        """Get an async trashtv db session handle for CRUD, close it automatically once done."""
+        db = AsyncSessionLocalTrashTv()
+        try:
+            yield db
+        except Exception:
+            raise
+        else:
+            await db.commit()
+        finally:
+            await db.close()
+
+    return _get_db_async_session_trashtv
+
+
 @pytest.fixture()
 def insert_row_TrashTvArchillectData() -> Callable[..., List[TrashTvArchillectData]]:
     """Insert default data for TrashTvArchillectData model."""
@@ -122,7 +252,6 @@ def get_sample_html(mock_archillect_200_html: str, mock_archillect_404_html: str
     def _get_sample_html(
         sample_data: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-
         if sample_data:
             return {
                 "status": 200,
@@ -1,9 +1,139 @@
 """Test the root API module."""
+import asyncio
+from pathlib import Path
+from typing import Callable, ContextManager, List
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from archigetter import archisender
+from archigetter.blobstore import LocalBlobStore
+from archigetter.cache import gif_bytes_cache, gif_lookup_cache
+from archigetter.database.models.trashtv import TrashTvArchillectData
 
 
 def test_get_example(test_client: TestClient) -> None:
     """Assert that we get an error from the example endpoint."""
     with pytest.raises(NotImplementedError):
         test_client.get("/")
+
+
+def test_get_trash(test_client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert that a new viewer gets the current trash right away."""
+    monkeypatch.setattr(archisender.trash_hub, "last_message", '{"data": {"archillect_id": "1"}}')
+
+    with test_client.websocket_connect("/trash") as websocket:
+        assert websocket.receive_json() == {"data": {"archillect_id": "1"}}
+
+
+def test_get_metrics(test_client: TestClient) -> None:
+    """Assert that the metrics are served in the Prometheus text format."""
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "trashtv_trash_viewers 0.0" in response.text
+
+
+def test_get_gif(
+    test_client: TestClient,
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    project_root_tests_path: Path,
+) -> None:
+    """Assert that gifs are served cacheable, conditionally and in ranges."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    writer = local_blob_store.open_writer()
+    writer.write(sample_gif)
+    blob = asyncio.run(local_blob_store.put(writer))
+    etag = f'"{blob.sha256}"'
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(
+            session,
+            [
+                TrashTvArchillectData(
+                    archillect_id="1",
+                    gif_sha256=blob.sha256,
+                    gif_size_in_bytes=blob.size,
+                    gif_mime_type=blob.mime_type,
+                ),
+                TrashTvArchillectData(archillect_id="2"),
+            ],
+        )
+
+        # conditional and range requests do not read the gif into memory
+        assert test_client.get("/gif/1", headers={"if-none-match": etag}).status_code == 304
+        assert test_client.get("/gif/1", headers={"range": "bytes=6-9"}).status_code == 206
+        assert gif_bytes_cache.stats().entries == 0
+
+        response = test_client.get("/gif/1")
+        assert response.status_code == 200
+        assert response.content == sample_gif
+        assert response.headers["etag"] == etag
+        assert response.headers["content-type"] == "image/gif"
+        assert "immutable" in response.headers["cache-control"]
+
+        response = test_client.get("/gif/1", headers={"if-none-match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = test_client.get("/gif/1", headers={"range": "bytes=6-9"})
+        assert response.status_code == 206
+        assert response.content == sample_gif[6:10]
+        assert response.headers["content-range"] == f"bytes 6-9/{len(sample_gif)}"
+
+        response = test_client.get("/gif/1", headers={"range": "bytes=6-9", "if-range": '"outdated"'})
+        assert response.status_code == 200
+
+        response = test_client.get("/gif/1", headers={"range": f"bytes={len(sample_gif)}-"})
+        assert response.status_code == 416
+
+        assert test_client.get("/gif/2").status_code == 404
+        assert test_client.get("/gif/3").status_code == 404
+
+        # hot gifs are served from memory
+        blob_path = local_blob_store.local_path(blob.sha256)
+        assert blob_path is not None
+        blob_path.unlink()
+        response = test_client.get("/gif/1")
+        assert response.status_code == 200
+        assert response.content == sample_gif
+        assert gif_bytes_cache.stats().entries == 1
+        assert gif_lookup_cache.stats().hits > 0
+
+
+def test_get_gif_rendition_unknown_format(test_client: TestClient) -> None:
+    """Assert that only known rendition formats are looked up."""
+    assert test_client.get("/gif/1/avi").status_code == 404
+
+
+def test_get_next_playlist_gif(
+    test_client: TestClient,
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Assert that the playlist is filled on first use and only serves downloaded gifs."""
+    playlist = archisender.Playlist(4, refill_batch_size=4, no_repeat_window=1, recency_horizon_in_seconds=60)
+    monkeypatch.setattr(playlist, "_start_refill", lambda: None)
+    monkeypatch.setattr(archisender, "playlist", playlist)
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        assert test_client.get("/playlist/next").status_code == 404
+
+        insert_row_TrashTvArchillectData(
+            session,
+            [
+                TrashTvArchillectData(archillect_id="1", source_link="https://test.local/1", gif_sha256="a" * 64),
+                TrashTvArchillectData(archillect_id="2", source_link="https://test.local/2"),
+            ],
+        )
+
+        response = test_client.get("/playlist/next")
+        assert response.status_code == 200
+        assert response.json() == {"archillect_id": "1", "source_link": "https://test.local/1", "gif_url": "/gif/1"}
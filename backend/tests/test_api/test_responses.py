@@ -0,0 +1,32 @@
+"""Test serving blobs over http."""
+from typing import Optional, Tuple
+
+import pytest
+
+from archigetter.api.responses import RangeNotSatisfiableError, parse_range
+
+
+@pytest.mark.parametrize(
+    "range_header, expected_range",
+    [
+        ("bytes=0-9", (0, 10)),
+        ("bytes=10-", (10, 100)),
+        ("bytes=-10", (90, 100)),
+        ("bytes=-1000", (0, 100)),
+        ("bytes=90-1000", (90, 100)),
+        ("bytes=0-1, 5-6", None),
+        ("items=0-9", None),
+        ("bytes=a-b", None),
+        ("bytes=9-0", None),
+    ],
+)
+def test_parse_range(range_header: str, expected_range: Optional[Tuple[int, int]]) -> None:
+    """Test parsing of single byte ranges."""
+    assert parse_range(range_header, 100) == expected_range
+
+
+@pytest.mark.parametrize("range_header", ["bytes=100-", "bytes=-0"])
+def test_parse_range_not_satisfiable(range_header: str) -> None:
+    """Test that ranges outside of the blob are rejected."""
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range(range_header, 100)
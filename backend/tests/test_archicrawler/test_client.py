@@ -0,0 +1,30 @@
+"""Test the shared crawler http client."""
+import pytest
+
+from archigetter.archicrawler.client import close_http_client, get_http_client
+
+
+@pytest.mark.asyncio
+async def test_get_http_client_is_reused() -> None:
+    """Test that all crawler requests share one client."""
+    http_client = get_http_client()
+
+    assert get_http_client() is http_client
+    assert not http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_close_http_client() -> None:
+    """Test that a closed client gets replaced on next use."""
+    http_client = get_http_client()
+    await close_http_client()
+
+    assert http_client.is_closed
+    assert get_http_client() is not http_client
+
+
+@pytest.mark.asyncio
+async def test_close_http_client_without_client() -> None:
+    """Test that closing is a no-op when no client was opened."""
+    await close_http_client()
+    await close_http_client()
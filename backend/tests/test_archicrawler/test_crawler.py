@@ -1,20 +1,33 @@
 """Test crawling functionality."""
+from io import BytesIO
 from pathlib import Path
-from typing import Callable, ContextManager, List
+from typing import Any, Callable, ContextManager, Dict, List
 
 import pytest
 import respx
-from httpx import Response
+from httpx import HTTPStatusError, Response
 from sqlalchemy.orm import Session
 
-from archigetter.archicrawler.crawler import get_from_archillect, get_gif_binary
+from archigetter import archicrawler, settings
+from archigetter.archicrawler.crawler import (
+    GifTooLargeError,
+    _extract_html_data,
+    archillect_tv_state,
+    get_changed_from_archillect,
+    get_from_archillect,
+    get_gif_binary,
+)
+from archigetter.archicrawler.limits import ByteBudget
 from archigetter.database.models.trashtv import TrashTvArchillectData
+from archigetter.scheduler import AdaptiveInterval, Job
+from archigetter.worker.jobs import record_current_gif
 
 MOCK_GIF_URL = "https://some.fake.gif.url.local"
 
 
+@pytest.mark.asyncio
 @respx.mock
-def test_get_from_archillect(mock_archillect: Callable[..., ContextManager[None]]) -> None:
+async def test_get_from_archillect(mock_archillect: Callable[..., ContextManager[None]]) -> None:
     """Test functionality of the `get_from_archillect` function."""
     test_data = [
         {
@@ -26,7 +39,7 @@ def test_get_from_archillect(mock_archillect: Callable[..., ContextManager[None]
     ]
 
     with mock_archillect(test_data):
-        result = get_from_archillect()
+        result = await get_from_archillect()
 
         assert len(respx.calls) == len(test_data)
 
@@ -39,18 +52,34 @@ def test_get_from_archillect(mock_archillect: Callable[..., ContextManager[None]
         assert result[1]["source_link"] == test_data[0]["buffer_link"]
 
 
+@pytest.mark.asyncio
 @respx.mock
-def test_get_from_archillect_no_connection(mock_archillect: Callable[..., ContextManager[None]]) -> None:
-    """Test functionality of the `get_from_archillect` function."""
+async def test_get_from_archillect_no_connection(mock_archillect: Callable[..., ContextManager[None]]) -> None:
+    """Test that a failed scrape raises, so the crawl job backs off."""
     with mock_archillect():
-        get_from_archillect()
+        with pytest.raises(HTTPStatusError):
+            await get_from_archillect()
 
         assert len(respx.calls) == 1
         assert respx.calls[0].response.status_code == 404
 
 
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_changed_from_archillect_failure_backs_off() -> None:
+    """Test that the crawl job counts failed scrapes and backs off instead of polling at the minimum interval."""
+    respx.get(settings.archillect_tv_url).mock(return_value=Response(503))
+    job = Job("crawl", record_current_gif, interval=1, adaptive_interval=AdaptiveInterval(1, 60), jitter=0)
+
+    for consecutive_failures in range(1, 4):
+        assert await job.run_once() is None
+        assert job.stats().consecutive_failures == consecutive_failures
+        assert job.next_delay(None, 0) == 2 ** consecutive_failures
+
+
+@pytest.mark.asyncio
 @pytest.mark.respx(base_url=MOCK_GIF_URL)
-def test_get_gif_binary(
+async def test_get_gif_binary(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
     insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
@@ -65,8 +94,117 @@ def test_get_gif_binary(
 
     with clean_db_trashtv(), get_test_session_trashtv() as session:
         insert_row_TrashTvArchillectData(session, [test_db_gif_row])
-        crawled_gif = get_gif_binary(test_db_gif_row)
+        sink = BytesIO()
+        byte_budget = ByteBudget(len(sample_gif))
+        reserved_bytes = await get_gif_binary(test_db_gif_row, sink, byte_budget)
+
+        assert reserved_bytes == len(sample_gif)
+        assert byte_budget.available_bytes == 0
+
+        assert sink.getvalue() == sample_gif
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_get_gif_binary_too_large(
+    respx_mock: respx.router.MockRouter, project_root_tests_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that gifs above the size limit are rejected and give back their reserved bytes."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    respx_mock.get("/gif_1").mock(return_value=Response(200, content=sample_gif))
+    monkeypatch.setattr(settings, "gif_max_size_in_bytes", len(sample_gif) - 1)
+
+    test_gif = TrashTvArchillectData(archillect_id="1", source_link=MOCK_GIF_URL + "/gif_1")
+    byte_budget = ByteBudget(len(sample_gif))
+
+    with pytest.raises(GifTooLargeError):
+        await get_gif_binary(test_gif, BytesIO(), byte_budget)
+
+    assert byte_budget.available_bytes == len(sample_gif)
+
+
+@pytest.mark.parametrize("extractor", ["streaming", "bs4"])
+def test_extract_html_data(
+    extractor: str, get_sample_html: Callable[..., Dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that gifs are extracted the same with every extractor and missing gifs are skipped."""
+    monkeypatch.setattr(settings, "archillect_html_extractor", extractor)
+    html = get_sample_html(
+        {"archillect_id": "1", "source_link": "https://test.local/1.gif", "buffer_id": "2", "buffer_link": ""}
+    )["html"]
+
+    assert _extract_html_data(html) == [
+        {"archillect_id": "1", "source_link": "https://test.local/1.gif", "css_id": "screenbg"}
+    ]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_changed_from_archillect(get_sample_html: Callable[..., Dict[str, Any]]) -> None:
+    """Test that unchanged pages are not parsed again and only gifs in a new position are returned."""
+    pages = [
+        {
+            "archillect_id": "1",
+            "source_link": "https://test.local/1.gif",
+            "buffer_id": "2",
+            "buffer_link": "https://test.local/2.gif",
+        },
+        {
+            "archillect_id": "2",
+            "source_link": "https://test.local/2.gif",
+            "buffer_id": "2",
+            "buffer_link": "https://test.local/2.gif",
+        },
+    ]
+    responses = [
+        Response(200, html=get_sample_html(pages[0])["html"], headers={"ETag": '"1"'}),
+        Response(304),
+        Response(200, html=get_sample_html(pages[0])["html"], headers={"ETag": '"2"'}),
+        Response(200, html=get_sample_html(pages[1])["html"]),
+    ]
+    route = respx.get(settings.archillect_tv_url).mock(side_effect=responses)
+
+    async def scrape() -> List[Dict[str, Any]]:
+        changed_gifs, scraped_state = await get_changed_from_archillect()
+        archillect_tv_state.update(scraped_state)
+        return changed_gifs
+
+    changed_gifs = await scrape()
+    assert [(gif["css_id"], gif["archillect_id"]) for gif in changed_gifs] == [("screenbg", "1"), ("buffer", "2")]
+    assert "If-None-Match" not in route.calls[0].request.headers
+
+    assert await scrape() == []
+    assert route.calls[1].request.headers["If-None-Match"] == '"1"'
+
+    assert await scrape() == []
+    changed_gifs = await scrape()
+    assert [(gif["css_id"], gif["archillect_id"]) for gif in changed_gifs] == [("screenbg", "2")]
+    assert archillect_tv_state.etag is None
+    assert route.calls[3].request.headers["If-None-Match"] == '"2"'
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_record_current_gif_keeps_state_until_stored(
+    get_sample_html: Callable[..., Dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a scrape whose gifs could not be stored is not remembered, so the next crawl stores them."""
+    html = get_sample_html(
+        {"archillect_id": "1", "source_link": "https://test.local/1.gif", "buffer_id": "2", "buffer_link": ""}
+    )["html"]
+    route = respx.get(settings.archillect_tv_url).mock(return_value=Response(200, html=html, headers={"ETag": '"1"'}))
+
+    async def broken_gif_to_db(*args: Any, **kwargs: Any) -> int:
+        raise OSError("Database is gone.")
+
+    monkeypatch.setattr(archicrawler, "gif_to_db", broken_gif_to_db)
+
+    with pytest.raises(OSError):
+        await record_current_gif()
 
-        assert crawled_gif
+    assert archillect_tv_state.etag is None
+    assert archillect_tv_state.gifs == []
 
-        assert crawled_gif["gif_raw_data"] == sample_gif
+    changed_gifs, _ = await get_changed_from_archillect()
+    assert [gif["archillect_id"] for gif in changed_gifs] == ["1"]
+    assert "If-None-Match" not in route.calls[1].request.headers
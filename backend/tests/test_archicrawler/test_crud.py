@@ -1,22 +1,30 @@
 """Test crud functionality."""
+from hashlib import sha256
 from pathlib import Path
-from typing import Callable, ContextManager, List
+from typing import AsyncContextManager, Callable, ContextManager, List
 
 import pytest
 import respx
-from httpx import Response
+from httpx import HTTPStatusError, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from archigetter import settings
 from archigetter.archicrawler.crud import gif_to_db, save_gif_to_db
-from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory
+from archigetter.archicrawler.download_queue import DEAD, PENDING, claim_gif_downloads
+from archigetter.blobstore import Blob, BlobWriter, LocalBlobStore
+from archigetter.database.maintenance import enqueue_missing_gif_downloads
+from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory, TrashTvGifDownloadJob
 
 MOCK_GIF_URL = "https://some.fake.gif.url.local"
 
 
+@pytest.mark.asyncio
 @respx.mock
-def test_gif_to_db(
+async def test_gif_to_db(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
     mock_archillect: Callable[..., ContextManager[None]],
 ) -> None:
     """Test gif insert into db."""
@@ -30,7 +38,8 @@ def test_gif_to_db(
     ]
 
     with clean_db_trashtv(), mock_archillect(test_data), get_test_session_trashtv() as session:
-        gif_to_db(session)
+        async with get_test_async_session_trashtv() as async_session:
+            await gif_to_db(async_session)
         data_in_db = session.query(TrashTvArchillectData).all()
 
         assert len(data_in_db) == 2
@@ -41,11 +50,17 @@ def test_gif_to_db(
         assert str(data_in_db[1].archillect_id) == test_data[0]["buffer_id"]
         assert data_in_db[1].source_link == test_data[0]["buffer_link"]
 
+        jobs = session.query(TrashTvGifDownloadJob).all()
+        assert {job.gif_id for job in jobs} == {gif.id for gif in data_in_db}
+        assert all(job.status == PENDING and job.attempts == 0 for job in jobs)
 
+
+@pytest.mark.asyncio
 @respx.mock
-def test_gif_to_db_with_history(
+async def test_gif_to_db_with_history(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
     mock_archillect: Callable[..., ContextManager[None]],
 ) -> None:
     """Test gif insert into db."""
@@ -59,7 +74,8 @@ def test_gif_to_db_with_history(
     ]
 
     with clean_db_trashtv(), mock_archillect(test_data), get_test_session_trashtv() as session:
-        gif_to_db(session, add_current=True)
+        async with get_test_async_session_trashtv() as async_session:
+            await gif_to_db(async_session, add_current=True)
         gif = session.query(TrashTvArchillectData).all()
         gif_history = session.query(TrashTvArchillectHistory).all()
 
@@ -67,16 +83,20 @@ def test_gif_to_db_with_history(
         assert len(gif_history) == 2
 
         assert gif[0].archillect_id == gif_history[0].gif_id == test_data[0]["archillect_id"]
+        assert gif_history[0].css_id == "screenbg"
         assert gif[0].source_link == test_data[0]["source_link"]
 
         assert gif[1].archillect_id == gif_history[1].gif_id == test_data[0]["buffer_id"]
+        assert gif_history[1].css_id == "buffer"
         assert gif[1].source_link == test_data[0]["buffer_link"]
 
 
+@pytest.mark.asyncio
 @respx.mock
-def test_gif_to_db_id_already_in_db(
+async def test_gif_to_db_id_already_in_db(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
     mock_archillect: Callable[..., ContextManager[None]],
 ) -> None:
     """Test gif insert into db."""
@@ -96,8 +116,9 @@ def test_gif_to_db_id_already_in_db(
     ]
 
     with clean_db_trashtv(), mock_archillect(test_data), get_test_session_trashtv() as session:
-        gif_to_db(session)
-        gif_to_db(session)
+        async with get_test_async_session_trashtv() as async_session:
+            assert await gif_to_db(async_session) == 2
+            assert await gif_to_db(async_session) == 1
         data_in_db = session.query(TrashTvArchillectData).all()
 
         assert len(data_in_db) == 3
@@ -112,29 +133,62 @@ def test_gif_to_db_id_already_in_db(
         assert data_in_db[2].source_link == test_data[1]["source_link"]
 
 
+@pytest.mark.asyncio
 @respx.mock
-def test_gif_to_db_no_data(
+async def test_gif_to_db_same_id_twice_in_one_crawl(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
     mock_archillect: Callable[..., ContextManager[None]],
 ) -> None:
-    """Test gif insert into db."""
+    """Test that a gif on screen and in the buffer at once is inserted once, but played twice."""
+    test_data = [
+        {
+            "archillect_id": "1",
+            "source_link": "test_url_to_gif_1",
+            "buffer_id": "1",
+            "buffer_link": "test_url_to_gif_1",
+        },
+    ]
+
+    with clean_db_trashtv(), mock_archillect(test_data), get_test_session_trashtv() as session:
+        async with get_test_async_session_trashtv() as async_session:
+            assert await gif_to_db(async_session, add_current=True) == 1
+
+        assert session.query(TrashTvArchillectData).count() == 1
+        assert session.query(TrashTvArchillectHistory).count() == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_gif_to_db_no_data(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    mock_archillect: Callable[..., ContextManager[None]],
+) -> None:
+    """Test that nothing is written into db if Archillect could not be scraped."""
     with clean_db_trashtv(), mock_archillect(), get_test_session_trashtv() as session:
-        gif_to_db(session)
+        async with get_test_async_session_trashtv() as async_session:
+            with pytest.raises(HTTPStatusError):
+                await gif_to_db(async_session)
         data_in_db = session.query(TrashTvArchillectData).all()
 
         assert len(data_in_db) == 0
 
 
+@pytest.mark.asyncio
 @pytest.mark.respx(base_url=MOCK_GIF_URL)
-def test_save_gif_to_db(
+async def test_save_gif_to_db(
     clean_db_trashtv: Callable[..., ContextManager[None]],
     get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
     insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
     respx_mock: respx.router.MockRouter,
     project_root_tests_path: Path,
 ) -> None:
-    """Test functionality of `get_gif_binary` function."""
+    """Test functionality of `save_gif_to_db` function."""
     sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
     respx_mock.get("/gif_1").mock(return_value=Response(200, content=sample_gif))
 
@@ -142,10 +196,233 @@ def test_save_gif_to_db(
 
     with clean_db_trashtv(), get_test_session_trashtv() as session:
         insert_row_TrashTvArchillectData(session, [test_db_gif_row])
-        save_gif_to_db(session)
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            await save_gif_to_db(async_session)
 
         crawled_gif = session.query(TrashTvArchillectData).all()
 
         assert len(crawled_gif) == 1
 
-        assert crawled_gif[0].gif_raw_data == sample_gif
+        assert crawled_gif[0].gif_sha256 == sha256(sample_gif).hexdigest()
+        assert crawled_gif[0].gif_size_in_bytes == len(sample_gif)
+        assert crawled_gif[0].gif_mime_type == "image/gif"
+        assert crawled_gif[0].gif_sha256 is not None
+        blob_path = local_blob_store.local_path(crawled_gif[0].gif_sha256)
+        assert blob_path is not None
+        assert blob_path.read_bytes() == sample_gif
+        assert session.query(TrashTvGifDownloadJob).count() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_save_gif_to_db_skips_failed_downloads(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    project_root_tests_path: Path,
+) -> None:
+    """Test that gifs which could not be downloaded are retried later."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    respx_mock.get("/gif_1").mock(return_value=Response(200, content=sample_gif))
+    respx_mock.get("/gif_2").mock(return_value=Response(404))
+
+    test_db_gif_rows = [
+        TrashTvArchillectData(archillect_id="1", source_link=MOCK_GIF_URL + "/gif_1"),
+        TrashTvArchillectData(archillect_id="2", source_link=MOCK_GIF_URL + "/gif_2"),
+    ]
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, test_db_gif_rows)
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            saved_gifs = await save_gif_to_db(async_session)
+            assert await save_gif_to_db(async_session) == 0
+
+        crawled_gifs = {gif.archillect_id: gif for gif in session.query(TrashTvArchillectData).all()}
+
+        assert saved_gifs == 1
+        assert crawled_gifs["1"].gif_sha256 == sha256(sample_gif).hexdigest()
+        assert crawled_gifs["2"].gif_sha256 is None
+
+        job = session.query(TrashTvGifDownloadJob).one()
+        assert job.gif_id == crawled_gifs["2"].id
+        assert job.status == PENDING
+        assert job.attempts == 1
+        assert job.next_attempt_at > job.created_at
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_save_gif_to_db_reschedules_interrupted_batch(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    project_root_tests_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the claimed gifs are rescheduled right away when storing a download fails."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    respx_mock.get("/gif_1").mock(return_value=Response(200, content=sample_gif))
+    monkeypatch.setattr(settings, "gif_download_retry_base_in_seconds", 0.0)
+
+    async def broken_put(writer: BlobWriter) -> Blob:
+        raise OSError("Blob store is not writable.")
+
+    monkeypatch.setattr(local_blob_store, "put", broken_put)
+
+    test_db_gif_row = TrashTvArchillectData(archillect_id="1", source_link=MOCK_GIF_URL + "/gif_1")
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, [test_db_gif_row])
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            with pytest.raises(OSError):
+                await save_gif_to_db(async_session)
+
+            # a job still leased would not be due again before `gif_download_lease_in_seconds`
+            assert len(await claim_gif_downloads(async_session, 10)) == 1
+
+        assert session.query(TrashTvArchillectData).one().gif_sha256 is None
+        job = session.query(TrashTvGifDownloadJob).one()
+        assert job.status == PENDING
+        assert job.attempts == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_save_gif_to_db_dead_letters_exhausted_downloads(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that gifs failing on every attempt are given up on."""
+    respx_mock.get("/gif_1").mock(return_value=Response(404))
+    monkeypatch.setattr(settings, "gif_download_max_attempts", 2)
+    monkeypatch.setattr(settings, "gif_download_retry_base_in_seconds", 0.0)
+
+    test_db_gif_row = TrashTvArchillectData(archillect_id="1", source_link=MOCK_GIF_URL + "/gif_1")
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, [test_db_gif_row])
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            assert await save_gif_to_db(async_session) == 0
+            assert await save_gif_to_db(async_session) == 0
+            assert await claim_gif_downloads(async_session, 10) == []
+
+        job = session.query(TrashTvGifDownloadJob).one()
+        assert job.status == DEAD
+        assert job.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_gif_downloads_skips_claimed_jobs(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that concurrent claims never hand out the same gif and respect the batch limit."""
+    test_db_gif_rows = [
+        TrashTvArchillectData(archillect_id=str(i), source_link=f"{MOCK_GIF_URL}/gif_{i}") for i in range(5)
+    ]
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, test_db_gif_rows)
+        assert enqueue_missing_gif_downloads(session) == 5
+        assert enqueue_missing_gif_downloads(session) == 0
+
+        async with get_test_async_session_trashtv() as first, get_test_async_session_trashtv() as second:
+            first_claim = await claim_gif_downloads(first, 3)
+            second_claim = await claim_gif_downloads(second, 3)
+            third_claim = await claim_gif_downloads(first, 3)
+
+        assert len(first_claim) == 3
+        assert len(second_claim) == 2
+        assert third_claim == []
+        assert {gif.id for gif in first_claim} | {gif.id for gif in second_claim} == {
+            gif.id for gif in test_db_gif_rows
+        }
+        assert {gif.source_link for gif in first_claim + second_claim} == {gif.source_link for gif in test_db_gif_rows}
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_save_gif_to_db_deduplicates_reposts(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    pattern_gif: Callable[..., bytes],
+) -> None:
+    """Test that a re-encoded re-post shares the blob of the gif stored first."""
+    original = pattern_gif(seed=1, size=480)
+    respx_mock.get("/gif_1").mock(return_value=Response(200, content=original))
+    respx_mock.get("/gif_2").mock(return_value=Response(200, content=pattern_gif(seed=1, size=300)))
+    respx_mock.get("/gif_3").mock(return_value=Response(200, content=pattern_gif(seed=2, size=480)))
+    test_db_gif_rows = [
+        TrashTvArchillectData(archillect_id=str(i), source_link=f"{MOCK_GIF_URL}/gif_{i}") for i in (1, 2, 3)
+    ]
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, test_db_gif_rows[:1])
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            assert await save_gif_to_db(async_session) == 1
+
+        insert_row_TrashTvArchillectData(session, test_db_gif_rows[1:])
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            assert await save_gif_to_db(async_session) == 2
+
+        gifs = {gif.archillect_id: gif for gif in session.query(TrashTvArchillectData).all()}
+        assert gifs["1"].gif_sha256 == gifs["2"].gif_sha256 == sha256(original).hexdigest()
+        assert gifs["3"].gif_sha256 != gifs["1"].gif_sha256
+        assert all(gif.gif_dhash is not None for gif in gifs.values())
+        assert len(list(local_blob_store.root.glob("??/??/*"))) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_save_gif_to_db_keeps_flat_gifs_apart(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    respx_mock: respx.router.MockRouter,
+    flat_gif: Callable[..., bytes],
+) -> None:
+    """Test that distinct flat gifs, whose perceptual hashes would all be alike, are not taken for duplicates."""
+    flat_gifs = {"1": flat_gif(brightness=0, size=480), "2": flat_gif(brightness=40, size=480)}
+    for archillect_id, content in flat_gifs.items():
+        respx_mock.get(f"/gif_{archillect_id}").mock(return_value=Response(200, content=content))
+    test_db_gif_rows = [
+        TrashTvArchillectData(archillect_id=archillect_id, source_link=f"{MOCK_GIF_URL}/gif_{archillect_id}")
+        for archillect_id in flat_gifs
+    ]
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session, test_db_gif_rows)
+        enqueue_missing_gif_downloads(session)
+        async with get_test_async_session_trashtv() as async_session:
+            assert await save_gif_to_db(async_session) == 2
+
+        for gif in session.query(TrashTvArchillectData).all():
+            assert gif.archillect_id is not None
+            assert gif.gif_sha256 == sha256(flat_gifs[gif.archillect_id]).hexdigest()
+            assert gif.gif_dhash is None
+        assert len(list(local_blob_store.root.glob("??/??/*"))) == 2
@@ -0,0 +1,45 @@
+"""Test finding re-posted gifs."""
+import random
+from io import BytesIO
+from typing import Callable
+
+from archigetter.archicrawler import BKTree, perceptual_hash
+from archigetter.archicrawler.dedup import hamming_distance
+
+
+def test_perceptual_hash(pattern_gif: Callable[..., bytes]) -> None:
+    """Test that re-encoded gifs hash alike and other gifs do not."""
+    gif_hash, reencoded_hash, other_hash = (
+        perceptual_hash(BytesIO(pattern_gif(seed=seed, size=size))) for seed, size in ((1, 480), (1, 300), (2, 480))
+    )
+
+    assert gif_hash is not None and reencoded_hash is not None and other_hash is not None
+    assert hamming_distance(gif_hash, reencoded_hash) <= 4
+    assert hamming_distance(gif_hash, other_hash) > 10
+
+
+def test_perceptual_hash_flat(flat_gif: Callable[..., bytes], pattern_gif: Callable[..., bytes]) -> None:
+    """Test that flat gifs get no hash, instead of all the same one."""
+    assert perceptual_hash(BytesIO(flat_gif(brightness=0, size=480))) is None
+    assert perceptual_hash(BytesIO(flat_gif(brightness=40, size=480))) is None
+    assert perceptual_hash(BytesIO(pattern_gif(seed=1, size=480)), min_gradients=65) is None
+
+
+def test_bk_tree_search() -> None:
+    """Test that the tree finds exactly what comparing against every hash finds."""
+    generator = random.Random(42)
+    hashes = [generator.getrandbits(64) for _ in range(1000)]
+    # near-duplicates of the first hashes
+    hashes += [image_hash ^ (1 << generator.randrange(64)) for image_hash in hashes[:50]]
+    tree: BKTree[int] = BKTree()
+    for index, image_hash in enumerate(hashes):
+        tree.add(image_hash, index)
+
+    assert len(tree) == len(set(hashes))
+    for image_hash in hashes[:100]:
+        expected = sorted(
+            (hamming_distance(image_hash, other), index)
+            for index, other in enumerate(hashes)
+            if hamming_distance(image_hash, other) <= 6
+        )
+        assert sorted(tree.search(image_hash, 6)) == expected
@@ -0,0 +1,156 @@
+"""Test the concurrent gif download pipeline."""
+import asyncio
+from io import BytesIO
+from pathlib import Path
+from typing import Any, List, cast
+from uuid import uuid4
+
+import pytest
+import respx
+from httpx import Response
+
+from archigetter import settings
+from archigetter.archicrawler.downloader import download_gifs
+from archigetter.database.models.trashtv import TrashTvArchillectData
+
+MOCK_GIF_URL = "https://some.fake.gif.url.local"
+
+
+def _gifs(*names: object) -> List[TrashTvArchillectData]:
+    # the stubs type the id column by its sql type, not by the uuid it holds
+    return [TrashTvArchillectData(id=cast(Any, uuid4()), source_link=f"{MOCK_GIF_URL}/gif_{name}") for name in names]
+
+
+@pytest.fixture()
+def no_download_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Do not wait between download retries."""
+    monkeypatch.setattr(settings, "gif_download_retry_backoff_in_seconds", 0)
+    monkeypatch.setattr(settings, "gif_download_requests_per_second_per_host", 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs(
+    no_download_backoff: None, respx_mock: respx.router.MockRouter, project_root_tests_path: Path
+) -> None:
+    """Test that all gifs get downloaded and transient errors are retried."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    route_flaky = respx_mock.get("/gif_1").mock(side_effect=[Response(503), Response(200, content=sample_gif)])
+    respx_mock.get("/gif_2").mock(return_value=Response(200, content=sample_gif))
+
+    gifs = _gifs(1, 2)
+    downloaded = {gif["id"]: gif["sink"].read() async for gif in download_gifs(gifs)}
+
+    assert route_flaky.call_count == 2
+    assert downloaded == {gif.id: sample_gif for gif in gifs}
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs_skips_failed(no_download_backoff: None, respx_mock: respx.router.MockRouter) -> None:
+    """Test that failed downloads are skipped instead of yielding `None`."""
+    route_missing = respx_mock.get("/gif_missing").mock(return_value=Response(404))
+    route_broken = respx_mock.get("/gif_broken").mock(return_value=Response(500))
+
+    gifs = _gifs("missing", "broken")
+    downloaded = [gif async for gif in download_gifs(gifs)]
+
+    assert downloaded == []
+    assert route_missing.call_count == 1
+    assert route_broken.call_count == settings.gif_download_retries + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs_skips_unexpected_errors(
+    no_download_backoff: None, respx_mock: respx.router.MockRouter, project_root_tests_path: Path
+) -> None:
+    """Test that a download failing unexpectedly is skipped without failing the other downloads."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    route_garbled = respx_mock.get("/gif_garbled").mock(
+        return_value=Response(200, headers={"content-length": "many"}, content=sample_gif)
+    )
+    respx_mock.get("/gif_fine").mock(return_value=Response(200, content=sample_gif))
+
+    sinks = []
+
+    def open_sink() -> BytesIO:
+        sink = BytesIO()
+        sinks.append(sink)
+        return sink
+
+    gifs = _gifs("garbled", "fine")
+    downloaded = {gif["id"]: gif["sink"].read() async for gif in download_gifs(gifs, open_sink)}
+
+    assert downloaded == {gifs[1].id: sample_gif}
+    assert route_garbled.call_count == 1
+    assert all(sink.closed for sink in sinks)
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs_bytes_in_flight(
+    no_download_backoff: None,
+    respx_mock: respx.router.MockRouter,
+    project_root_tests_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that all gifs get through a budget that only fits one gif at a time."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    respx_mock.get(path__startswith="/gif_").mock(return_value=Response(200, content=sample_gif))
+    monkeypatch.setattr(settings, "gif_download_max_bytes_in_flight", len(sample_gif))
+
+    gifs = _gifs(*range(5))
+    downloaded = {gif["id"]: gif["sink"].read() async for gif in download_gifs(gifs)}
+
+    assert downloaded == {gif.id: sample_gif for gif in gifs}
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs_budget_wait_is_not_timed(
+    no_download_backoff: None,
+    respx_mock: respx.router.MockRouter,
+    project_root_tests_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a download waiting for room in the budget longer than the timeout is not failed."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    route = respx_mock.get(path__startswith="/gif_").mock(return_value=Response(200, content=sample_gif))
+    monkeypatch.setattr(settings, "gif_download_max_bytes_in_flight", len(sample_gif))
+    monkeypatch.setattr(settings, "gif_download_timeout_in_seconds", 0.1)
+
+    gifs = _gifs(*range(2))
+    downloaded = []
+    async for gif in download_gifs(gifs):
+        # holds the whole budget, the other download waits for it
+        await asyncio.sleep(0.2)
+        downloaded.append(gif["id"])
+
+    assert set(downloaded) == {gif.id for gif in gifs}
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.respx(base_url=MOCK_GIF_URL)
+async def test_download_gifs_closed_early(
+    no_download_backoff: None, respx_mock: respx.router.MockRouter, project_root_tests_path: Path
+) -> None:
+    """Test that closing the downloads early closes the sinks of finished downloads nobody got to see."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    respx_mock.get(path__startswith="/gif_").mock(return_value=Response(200, content=sample_gif))
+
+    sinks = []
+
+    def open_sink() -> BytesIO:
+        sink = BytesIO()
+        sinks.append(sink)
+        return sink
+
+    gifs = _gifs(*range(3))
+    downloads = download_gifs(gifs, open_sink)
+    await downloads.__anext__()
+    await downloads.aclose()
+
+    assert len(sinks) == len(gifs)
+    assert all(sink.closed for sink in sinks)
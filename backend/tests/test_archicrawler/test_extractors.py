@@ -0,0 +1,43 @@
+"""Test html extraction functionality."""
+from typing import Callable, Iterable, Optional
+
+import pytest
+
+from archigetter.archicrawler.extractors import EXTRACTORS, HtmlElements, css_url
+
+SAMPLE_HTML = """
+<html>
+    <div id="screenbg" style="background-image: url('https://test.local/1.gif'); background-size: cover">
+        <div class="overlay"><div>nested</div></div>
+    </div>
+    <img id="buffer" index="2" src="https://test.local/2.gif">
+    <div id="gifid">#1</div>
+</html>
+"""
+
+
+@pytest.mark.parametrize(
+    "style, url",
+    [
+        ("background-image: url(https://test.local/1.gif)", "https://test.local/1.gif"),
+        ('background-image: url("https://test.local/1.gif");', "https://test.local/1.gif"),
+        ("background: #000 URL( 'https://test.local/(1).gif' ) no-repeat", "https://test.local/(1).gif"),
+        ("background-color: red", None),
+    ],
+)
+def test_css_url(style: str, url: Optional[str]) -> None:
+    """Test that the url of a css declaration is found, quoted or not."""
+    assert css_url(style) == url
+
+
+@pytest.mark.parametrize("extract", EXTRACTORS.values(), ids=EXTRACTORS.keys())
+def test_extract(extract: Callable[[str, Iterable[str]], HtmlElements]) -> None:
+    """Test that all extractors find the same elements."""
+    elements = extract(SAMPLE_HTML, ["screenbg", "buffer", "gifid", "missing"])
+
+    assert set(elements) == {"screenbg", "buffer", "gifid"}
+    assert css_url(elements["screenbg"]["style"]) == "https://test.local/1.gif"
+    assert "nested" in elements["screenbg"]["text"]
+    assert elements["buffer"]["index"] == "2"
+    assert elements["buffer"]["src"] == "https://test.local/2.gif"
+    assert elements["gifid"]["text"] == "#1"
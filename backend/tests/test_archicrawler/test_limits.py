@@ -0,0 +1,44 @@
+"""Test the limits shared by concurrent downloads."""
+import asyncio
+
+import pytest
+
+from archigetter.archicrawler.limits import ByteBudget, HostRateLimiter
+
+
+@pytest.mark.asyncio
+async def test_host_rate_limiter() -> None:
+    """Test that requests to the same host are spaced out, other hosts are not."""
+    rate_limiter = HostRateLimiter(requests_per_second=20)
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    await rate_limiter.wait("a.local")
+    await rate_limiter.wait("b.local")
+    assert loop.time() - start < 0.05
+
+    await rate_limiter.wait("a.local")
+    await rate_limiter.wait("a.local")
+    assert loop.time() - start >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_byte_budget() -> None:
+    """Test that reservations wait until enough bytes were released."""
+    byte_budget = ByteBudget(10)
+    await byte_budget.acquire(6)
+
+    waiting_reservation = asyncio.ensure_future(byte_budget.acquire(6))
+    await asyncio.sleep(0)
+    assert not waiting_reservation.done()
+
+    await byte_budget.release(6)
+    await asyncio.wait_for(waiting_reservation, timeout=1)
+    assert byte_budget.available_bytes == 4
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_too_large_reservation() -> None:
+    """Test that a reservation larger than the whole budget fails instead of waiting forever."""
+    with pytest.raises(ValueError, match="Can not reserve"):
+        await ByteBudget(10).acquire(11)
@@ -0,0 +1 @@
+"""Package to test the archisender package."""
@@ -0,0 +1,77 @@
+"""Test the trash broadcaster."""
+import asyncio
+import json
+from typing import Callable, ContextManager
+
+import pytest
+
+from archigetter import settings
+from archigetter.archisender import NOW_PLAYING_CHANNEL, TrashHub, broadcast_trash, publish_now_playing
+from archigetter.cache import NOW_PLAYING_KEY, now_playing_cache
+from archigetter.pubsub import InMemoryPubSub
+
+
+async def _wait_for_message(hub: TrashHub, message: str) -> None:
+    for _ in range(100):
+        if hub.last_message == message:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{hub.last_message!r} was broadcast, not {message!r}")
+
+
+@pytest.mark.asyncio
+async def test_broadcast_trash(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    memory_pubsub: InMemoryPubSub,
+) -> None:
+    """Test that published gifs are broadcast right away, without reading the db."""
+    hub = TrashHub(queue_size=4, max_skipped_messages=4)
+    now_playing = {"archillect_id": "1", "source_link": "https://test.local/1", "gif_url": None, "played_at": ""}
+    message = json.dumps({"data": now_playing})
+
+    with clean_db_trashtv():
+        broadcaster = asyncio.ensure_future(broadcast_trash(hub))
+        try:
+            await _wait_for_message(hub, json.dumps({"data": None}))
+
+            await memory_pubsub.publish(NOW_PLAYING_CHANNEL, message)
+            await _wait_for_message(hub, message)
+            assert now_playing_cache.get(NOW_PLAYING_KEY) == now_playing
+        finally:
+            broadcaster.cancel()
+            await asyncio.gather(broadcaster, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_trash_fallback(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    memory_pubsub: InMemoryPubSub,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the db is read again once nothing was published for a while."""
+    monkeypatch.setattr(settings, "trash_broadcast_fallback_period_in_seconds", 0.01)
+    hub = TrashHub(queue_size=4, max_skipped_messages=4)
+    stale_message = json.dumps({"data": {"archillect_id": "stale"}})
+
+    with clean_db_trashtv():
+        broadcaster = asyncio.ensure_future(broadcast_trash(hub))
+        try:
+            await _wait_for_message(hub, json.dumps({"data": None}))
+            hub.publish(stale_message)
+            await _wait_for_message(hub, json.dumps({"data": None}))
+        finally:
+            broadcaster.cancel()
+            await asyncio.gather(broadcaster, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_publish_now_playing(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    memory_pubsub: InMemoryPubSub,
+) -> None:
+    """Test that the gif now playing is published on the now playing channel."""
+    with clean_db_trashtv():
+        async with memory_pubsub.subscribe(NOW_PLAYING_CHANNEL) as subscription:
+            await publish_now_playing()
+
+            assert json.loads(await subscription.get()) == {"data": None}
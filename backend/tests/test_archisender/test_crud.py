@@ -0,0 +1,79 @@
+"""Test crud functionality of the archisender."""
+from typing import Any, AsyncContextManager, Callable, ContextManager, Dict, List
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from archigetter.archicrawler import gif_to_db
+from archigetter.archisender import get_now_playing
+from archigetter.cache import now_playing_cache
+from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory
+
+
+def _on_screen(archillect_id: str) -> Dict[str, Any]:
+    return {"archillect_id": archillect_id, "source_link": f"https://test.local/{archillect_id}", "css_id": "screenbg"}
+
+
+@pytest.mark.asyncio
+async def test_get_now_playing(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that the gif last seen on screen is playing, not the buffered one."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        async with get_test_async_session_trashtv() as async_session:
+            assert await get_now_playing(async_session) is None
+
+        insert_row_TrashTvArchillectData(
+            session,
+            [
+                TrashTvArchillectData(archillect_id="1", source_link="https://test.local/1"),
+                TrashTvArchillectData(archillect_id="2", source_link="https://test.local/2"),
+            ],
+        )
+        session.add_all(
+            [
+                TrashTvArchillectHistory(gif_id="1", css_id="screenbg"),
+                TrashTvArchillectHistory(gif_id="2", css_id="buffer"),
+            ]
+        )
+        session.commit()
+
+        async with get_test_async_session_trashtv() as async_session:
+            now_playing = await get_now_playing(async_session)
+
+        assert now_playing
+        assert now_playing["archillect_id"] == "1"
+        assert now_playing["source_link"] == "https://test.local/1"
+
+
+@pytest.mark.asyncio
+async def test_get_now_playing_cached(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+) -> None:
+    """Test that the gif now playing is served from cache until a new one is recorded."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        async with get_test_async_session_trashtv() as async_session:
+            await gif_to_db(async_session, add_current=True, crawled_gifs=[_on_screen("1")])
+            now_playing = await get_now_playing(async_session)
+            assert now_playing is not None and now_playing["archillect_id"] == "1"
+
+        # written past the cache, not seen until the cache expires
+        hits = now_playing_cache.stats().hits
+        session.add(TrashTvArchillectData(archillect_id="2", source_link="https://test.local/2"))
+        session.add(TrashTvArchillectHistory(gif_id="2", css_id="screenbg"))
+        session.commit()
+        async with get_test_async_session_trashtv() as async_session:
+            now_playing = await get_now_playing(async_session)
+            assert now_playing is not None and now_playing["archillect_id"] == "1"
+        assert now_playing_cache.stats().hits == hits + 1
+
+        async with get_test_async_session_trashtv() as async_session:
+            await gif_to_db(async_session, add_current=True, crawled_gifs=[_on_screen("3")])
+            now_playing = await get_now_playing(async_session)
+            assert now_playing is not None and now_playing["archillect_id"] == "3"
@@ -0,0 +1,70 @@
+"""Test the trash fan-out hub."""
+import pytest
+
+from archigetter.archisender import TrashHub
+
+
+@pytest.mark.asyncio
+async def test_publish_to_all_subscribers() -> None:
+    """Test that every viewer gets every message."""
+    hub = TrashHub(queue_size=4, max_skipped_messages=4)
+    subscribers = [hub.subscribe() for _ in range(3)]
+
+    hub.publish("1")
+    hub.publish("2")
+
+    assert hub.subscriber_count == 3
+    for subscriber in subscribers:
+        assert [await subscriber.queue.get(), await subscriber.queue.get()] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_subscribe_gets_last_message() -> None:
+    """Test that a new viewer does not have to wait for the next change."""
+    hub = TrashHub(queue_size=4, max_skipped_messages=4)
+    hub.publish("current")
+
+    assert await hub.subscribe().queue.get() == "current"
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_skips_messages() -> None:
+    """Test that a full queue skips the oldest message instead of blocking."""
+    hub = TrashHub(queue_size=2, max_skipped_messages=10)
+    slow_subscriber = hub.subscribe()
+    fast_subscriber = hub.subscribe()
+
+    for message in ("1", "2", "3"):
+        hub.publish(message)
+        assert await fast_subscriber.queue.get() == message
+
+    assert slow_subscriber.skipped_messages == 1
+    assert [await slow_subscriber.queue.get(), await slow_subscriber.queue.get()] == ["2", "3"]
+
+    hub.publish("4")
+    assert slow_subscriber.skipped_messages == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_dropped() -> None:
+    """Test that a viewer that does not keep up is dropped."""
+    hub = TrashHub(queue_size=1, max_skipped_messages=2)
+    slow_subscriber = hub.subscribe()
+
+    for message in ("1", "2", "3"):
+        hub.publish(message)
+
+    assert slow_subscriber.is_dropped
+    assert hub.subscriber_count == 0
+    assert await slow_subscriber.queue.get() is None
+
+
+def test_unsubscribe() -> None:
+    """Test that unsubscribing twice is fine."""
+    hub = TrashHub(queue_size=1, max_skipped_messages=1)
+    subscriber = hub.subscribe()
+
+    hub.unsubscribe(subscriber)
+    hub.unsubscribe(subscriber)
+
+    assert hub.subscriber_count == 0
@@ -0,0 +1,144 @@
+"""Test the playlist of the archisender."""
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncContextManager, Callable, ContextManager, List
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from archigetter.archisender import Playlist
+from archigetter.archisender.queue import weight
+from archigetter.database.models.trashtv import (
+    TrashTvArchillectData,
+    TrashTvArchillectHistory,
+    TrashTvArchillectPlayCount,
+)
+
+
+def _downloaded_gifs(count: int) -> List[TrashTvArchillectData]:
+    return [
+        TrashTvArchillectData(
+            archillect_id=f"{index:03}",
+            source_link=f"https://test.local/{index}",
+            gif_sha256=f"{index:064x}",
+        )
+        for index in range(count)
+    ]
+
+
+def _playlist(size: int, no_repeat_window: int, monkeypatch: pytest.MonkeyPatch) -> Playlist:
+    playlist = Playlist(
+        size,
+        refill_batch_size=4,
+        no_repeat_window=no_repeat_window,
+        recency_horizon_in_seconds=60,
+        generator=random.Random(0),
+    )
+    # refill explicitly instead of in the background
+    monkeypatch.setattr(playlist, "_start_refill", lambda: None)
+    return playlist
+
+
+def test_weight() -> None:
+    """Test that gifs played more often or more recently weigh less."""
+    now = datetime.now(timezone.utc)
+
+    assert weight(0, None, now, 60) == 1.0
+    assert weight(3, None, now, 60) == 0.25
+    assert weight(0, now - timedelta(seconds=30), now, 60) == 0.5
+    assert weight(0, now - timedelta(days=1), now, 60) == 1.0
+    assert weight(0, now, now, 60) > 0
+
+
+@pytest.mark.asyncio
+async def test_playlist_no_repeat(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the playlist walks through all downloaded gifs and does not repeat a gif within the window."""
+    playlist = _playlist(size=5, no_repeat_window=10, monkeypatch=monkeypatch)
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        gifs = _downloaded_gifs(11)
+        downloaded_ids = {gif.archillect_id for gif in gifs}
+        gifs.append(TrashTvArchillectData(archillect_id="not-downloaded", source_link="https://test.local/x"))
+        insert_row_TrashTvArchillectData(session, gifs)
+
+        picked = []
+        for _ in range(33):
+            if not len(playlist):
+                async with get_test_async_session_trashtv() as async_session:
+                    assert await playlist.refill(async_session)
+            gif = playlist.next()
+            assert gif is not None
+            picked.append(gif["archillect_id"])
+
+    assert set(picked) == downloaded_ids
+    for index in range(len(picked) - 10):
+        assert len(set(picked[index : index + 11])) == 11
+
+
+@pytest.mark.asyncio
+async def test_playlist_small_library(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that gifs repeat sooner than the window if there are not enough gifs, and re-posts do not repeat."""
+    playlist = _playlist(size=5, no_repeat_window=10, monkeypatch=monkeypatch)
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        gifs = _downloaded_gifs(2)
+        gifs.append(
+            TrashTvArchillectData(archillect_id="repost", source_link="https://test.local/r", gif_sha256=f"{0:064x}")
+        )
+        insert_row_TrashTvArchillectData(session, gifs)
+
+        async with get_test_async_session_trashtv() as async_session:
+            assert await playlist.refill(async_session) == 2
+            assert len(playlist) == 2
+            playlist.next()
+            playlist.next()
+
+            assert await playlist.refill(async_session) >= 1
+            assert playlist.next() is not None
+
+
+@pytest.mark.asyncio
+async def test_playlist_prefers_rarely_played(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that gifs played often and lately are queued after gifs never played."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        gifs = _downloaded_gifs(4)
+        archillect_ids = [str(gif.archillect_id) for gif in gifs]
+        insert_row_TrashTvArchillectData(session, gifs)
+        session.add_all(
+            [TrashTvArchillectHistory(gif_id=archillect_id, css_id="screenbg") for archillect_id in archillect_ids[1:]]
+        )
+        session.add_all(
+            [
+                TrashTvArchillectPlayCount(gif_id=archillect_id, day=date(2020, 1, 1), play_count=100)
+                for archillect_id in archillect_ids[1:]
+            ]
+        )
+        session.commit()
+
+        first_gifs = []
+        for _ in range(10):
+            playlist = _playlist(size=4, no_repeat_window=4, monkeypatch=monkeypatch)
+            async with get_test_async_session_trashtv() as async_session:
+                await playlist.refill(async_session)
+            first_gifs.append(playlist.next()["archillect_id"])  # type: ignore
+
+    assert first_gifs.count(archillect_ids[0]) >= 9
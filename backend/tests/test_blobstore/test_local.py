@@ -0,0 +1,90 @@
+"""Test the local file system blob store."""
+from hashlib import sha256
+from pathlib import Path
+
+import pytest
+
+from archigetter.blobstore import LocalBlobStore
+from archigetter.blobstore.base import guess_mime_type
+
+
+async def _put(blob_store: LocalBlobStore, data: bytes) -> str:
+    writer = blob_store.open_writer()
+    writer.write(data[:3])
+    writer.write(data[3:])
+    return (await blob_store.put(writer)).sha256
+
+
+@pytest.mark.asyncio
+async def test_put_and_read(tmp_path: Path, project_root_tests_path: Path) -> None:
+    """Test that a blob is stored under its hash and can be read back, also partially."""
+    sample_gif = (project_root_tests_path / "data" / "sample.gif").read_bytes()
+    blob_store = LocalBlobStore(tmp_path)
+
+    writer = blob_store.open_writer()
+    writer.write(sample_gif)
+    blob = await blob_store.put(writer)
+
+    assert blob.sha256 == sha256(sample_gif).hexdigest()
+    assert blob.size == len(sample_gif)
+    assert blob.mime_type == "image/gif"
+    assert await blob_store.exists(blob.sha256)
+    assert not writer.temp_path.exists()
+
+    assert b"".join([chunk async for chunk in blob_store.read(blob.sha256)]) == sample_gif
+    assert b"".join([chunk async for chunk in blob_store.read(blob.sha256, 6, 10)]) == sample_gif[6:10]
+
+
+@pytest.mark.asyncio
+async def test_put_deduplicates(tmp_path: Path) -> None:
+    """Test that identical content is stored once."""
+    blob_store = LocalBlobStore(tmp_path)
+
+    first_sha256 = await _put(blob_store, b"GIF89a same content")
+    second_sha256 = await _put(blob_store, b"GIF89a same content")
+
+    assert first_sha256 == second_sha256
+    assert len([path for path in tmp_path.rglob("*") if path.is_file()]) == 1
+
+
+@pytest.mark.asyncio
+async def test_delete(tmp_path: Path) -> None:
+    """Test that a deleted blob is gone and deleting it again is fine."""
+    blob_store = LocalBlobStore(tmp_path)
+    blob_sha256 = await _put(blob_store, b"some bytes")
+
+    await blob_store.delete(blob_sha256)
+    await blob_store.delete(blob_sha256)
+
+    assert not await blob_store.exists(blob_sha256)
+    assert blob_store.local_path(blob_sha256) is None
+
+
+def test_discarded_writer(tmp_path: Path) -> None:
+    """Test that closing a writer that was never stored removes its temporary file."""
+    writer = LocalBlobStore(tmp_path).open_writer()
+    writer.write(b"partial download")
+    writer.close()
+
+    assert not writer.temp_path.exists()
+
+
+def test_invalid_hash(tmp_path: Path) -> None:
+    """Test that only hex digests address blobs."""
+    with pytest.raises(ValueError, match="Not a SHA-256"):
+        LocalBlobStore(tmp_path).local_path("../../etc/passwd")
+
+
+@pytest.mark.parametrize(
+    "head, mime_type",
+    [
+        (b"GIF87a...", "image/gif"),
+        (b"\x89PNG\r\n\x1a\n...", "image/png"),
+        (b"\x00\x00\x00\x20ftypisom", "video/mp4"),
+        (b"\x1a\x45\xdf\xa3...", "video/webm"),
+        (b"nothing known", "application/octet-stream"),
+    ],
+)
+def test_guess_mime_type(head: bytes, mime_type: str) -> None:
+    """Test mime type sniffing."""
+    assert guess_mime_type(head) == mime_type
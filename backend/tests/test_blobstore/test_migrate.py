@@ -0,0 +1,54 @@
+"""Test moving gif binaries out of the database."""
+from hashlib import sha256
+from typing import Callable, ContextManager
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from archigetter.blobstore import LocalBlobStore
+from archigetter.blobstore.migrate import migrate
+from archigetter.database.models.trashtv import TrashTvArchillectData
+
+_TABLE = TrashTvArchillectData.__tablename__
+
+
+@pytest.mark.asyncio
+async def test_migrate(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    local_blob_store: LocalBlobStore,
+) -> None:
+    """Test that binaries of a pre blob store table end up in the blob store."""
+    legacy_gifs = {"1": b"GIF89a one", "2": b"GIF89a two", "3": b"GIF89a one"}
+
+    with clean_db_trashtv():
+        with get_test_session_trashtv() as session:
+            for column in ("gif_sha256", "gif_size_in_bytes", "gif_mime_type", "gif_dhash"):
+                session.execute(text(f'ALTER TABLE "{_TABLE}" DROP COLUMN {column}'))
+            session.execute(text(f'ALTER TABLE "{_TABLE}" ADD COLUMN gif_raw_data BYTEA'))
+            for archillect_id, gif_raw_data in legacy_gifs.items():
+                session.execute(
+                    text(
+                        f'INSERT INTO "{_TABLE}" (id, archillect_id, gif_raw_data) VALUES (gen_random_uuid(), :a, :g)'
+                    ),
+                    {"a": archillect_id, "g": gif_raw_data},
+                )
+
+        assert await migrate(batch_size=2) == 3
+
+        with get_test_session_trashtv() as session:
+            columns = [column["name"] for column in inspect(session.connection()).get_columns(_TABLE)]
+            assert "gif_raw_data" not in columns
+            assert "gif_dhash" in columns
+
+            for gif in session.query(TrashTvArchillectData).all():
+                assert gif.archillect_id is not None and gif.gif_sha256 is not None
+                legacy_gif = legacy_gifs[gif.archillect_id]
+                assert gif.gif_sha256 == sha256(legacy_gif).hexdigest()
+                assert gif.gif_size_in_bytes == len(legacy_gif)
+                blob_path = local_blob_store.local_path(gif.gif_sha256)
+                assert blob_path is not None
+                assert blob_path.read_bytes() == legacy_gif
+
+        assert await migrate() == 0
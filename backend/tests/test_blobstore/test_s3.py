@@ -0,0 +1,63 @@
+"""Test the S3 compatible blob store."""
+from hashlib import sha256
+from typing import Dict
+
+import pytest
+import respx
+from httpx import Request, Response
+
+from archigetter.blobstore import S3BlobStore
+
+MOCK_S3_URL = "http://s3.local:9000"
+
+
+@pytest.fixture()
+def fake_s3(respx_mock: respx.router.MockRouter) -> Dict[str, bytes]:
+    """Fake a S3 bucket that keeps objects in a dict."""
+    objects: Dict[str, bytes] = {}
+
+    def _handle(request: Request) -> Response:
+        assert request.headers["authorization"].startswith("AWS4-HMAC-SHA256 Credential=access/")
+        key = request.url.path
+        if request.method == "PUT":
+            objects[key] = request.read()
+            assert request.headers["x-amz-content-sha256"] == sha256(objects[key]).hexdigest()
+            return Response(200)
+        if key not in objects:
+            return Response(404)
+        if request.method == "DELETE":
+            del objects[key]
+            return Response(204)
+        if request.method == "GET":
+            start, end = request.headers["range"].replace("bytes=", "").split("-")
+            return Response(206, content=objects[key][int(start) : int(end) + 1 if end else None])
+        return Response(200)
+
+    respx_mock.route(host="s3.local").mock(side_effect=_handle)
+    return objects
+
+
+@pytest.mark.asyncio
+async def test_s3_blob_store(fake_s3: Dict[str, bytes]) -> None:
+    """Test storing, deduplicating, reading and deleting blobs."""
+    blob_store = S3BlobStore(MOCK_S3_URL, "trashtv", "access", "secret", prefix="gifs/")
+    data = b"GIF89a" + bytes(range(256))
+
+    for _ in range(2):
+        writer = blob_store.open_writer()
+        writer.write(data)
+        blob = await blob_store.put(writer)
+        assert not writer.temp_path.exists()
+
+    assert fake_s3 == {f"/trashtv/gifs/{blob.sha256}": data}
+    assert blob.mime_type == "image/gif"
+    assert await blob_store.exists(blob.sha256)
+    assert blob_store.local_path(blob.sha256) is None
+
+    assert b"".join([chunk async for chunk in blob_store.read(blob.sha256)]) == data
+    assert b"".join([chunk async for chunk in blob_store.read(blob.sha256, 6, 10)]) == data[6:10]
+
+    await blob_store.delete(blob.sha256)
+    assert not await blob_store.exists(blob.sha256)
+
+    await blob_store.close()
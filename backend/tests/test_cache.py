@@ -0,0 +1,76 @@
+"""Test the in-process caches."""
+from typing import List
+
+from archigetter.cache import CacheStats, LRUCache
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """Test that the cache stays within its byte budget by evicting the least recently used values."""
+    cache: LRUCache[bytes] = LRUCache(10)
+
+    assert cache.set("a", b"aaaa")
+    assert cache.set("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    assert cache.set("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.stats() == CacheStats(
+        hits=3, misses=1, evictions=1, expirations=0, entries=2, size_in_bytes=8, max_size_in_bytes=10
+    )
+
+
+def test_lru_cache_skips_large_values() -> None:
+    """Test that values larger than an item may be are not cached and do not evict anything."""
+    cache: LRUCache[bytes] = LRUCache(10, max_item_size_in_bytes=4)
+
+    assert cache.set("a", b"aaaa")
+    assert not cache.set("b", b"bbbbb")
+
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("b") is None
+    assert cache.stats().evictions == 0
+
+
+def test_lru_cache_expires_values() -> None:
+    """Test that values expire after their time to live."""
+    clock = FakeClock()
+    cache: LRUCache[List[int]] = LRUCache(10, ttl_in_seconds=5, clock=clock)
+    cache.set("a", [1])
+
+    clock.now = 4.9
+    assert cache.get("a") == [1]
+
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats().expirations == 1
+    assert cache.stats().size_in_bytes == 0
+
+
+def test_lru_cache_invalidate() -> None:
+    """Test that invalidated values are gone and replaced values are measured anew."""
+    cache: LRUCache[bytes] = LRUCache(10)
+    cache.set("a", b"aaaa")
+    cache.set("a", b"aa")
+    assert cache.stats().size_in_bytes == 2
+
+    cache.invalidate("a")
+    cache.invalidate("unknown")
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+    cache.set("b", b"bb")
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats().size_in_bytes == 0
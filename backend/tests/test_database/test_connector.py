@@ -1,8 +1,19 @@
 """Test for the database connection module."""
+import asyncio
 from typing import Callable, ContextManager
 
+import pytest
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from archigetter import settings
+from archigetter.database import (
+    close_db_trashtv_async_engine,
+    get_db_trashtv_async_session,
+    get_db_trashtv_session,
+    get_pool_stats,
+)
+
 
 def test_db_connection(
     clean_db_trashtv: Callable[..., ContextManager[None]],
@@ -12,3 +23,51 @@ def test_db_connection(
         res = session.execute("select 1").one()
         assert len(res) == 1
         assert res[0] == 1
+
+
+def test_db_trashtv_session_pool_stats(clean_db_trashtv: Callable[..., ContextManager[None]]) -> None:
+    """Test that sessions share the pool and that checkouts are counted."""
+    with clean_db_trashtv():
+        stats_before = get_pool_stats()["sync"]
+
+        with get_db_trashtv_session() as session:
+            assert session.execute("show statement_timeout").scalar() == "30s"
+            assert get_pool_stats()["sync"].checked_out == 1
+
+        stats_after = get_pool_stats()["sync"]
+        assert stats_after.checked_out == 0
+        assert stats_after.checkouts == stats_before.checkouts + 1
+        assert stats_after.size == settings.db_pool_size
+
+
+@pytest.mark.asyncio
+async def test_db_trashtv_async_session(clean_db_trashtv: Callable[..., ContextManager[None]]) -> None:
+    """Test that async sessions reach the db through asyncpg with the configured statement timeout."""
+    with clean_db_trashtv():
+        stats_before = get_pool_stats()["async"]
+
+        async with get_db_trashtv_async_session() as session:
+            assert session.get_bind().dialect.driver == "asyncpg"
+            assert await session.scalar(text("show statement_timeout")) == "30s"
+            assert get_pool_stats()["async"].checked_out == 1
+
+        stats_after = get_pool_stats()["async"]
+        assert stats_after.checked_out == 0
+        assert stats_after.checkouts == stats_before.checkouts + 1
+
+
+@pytest.mark.asyncio
+async def test_db_trashtv_async_pool_stats_from_thread(clean_db_trashtv: Callable[..., ContextManager[None]]) -> None:
+    """Test that the async pool can be read from other threads, like metrics scrapes do, without its event loop."""
+    with clean_db_trashtv():
+        await close_db_trashtv_async_engine()
+        loop = asyncio.get_running_loop()
+        assert (await loop.run_in_executor(None, get_pool_stats))["async"].checked_in == 0
+
+        async with get_db_trashtv_async_session() as session:
+            await session.scalar(text("select 1"))
+            assert (await loop.run_in_executor(None, get_pool_stats))["async"].checked_out == 1
+
+        stats = await loop.run_in_executor(None, get_pool_stats)
+        assert stats["async"].checked_in == 1
+        assert stats["async"].checked_out == 0
@@ -0,0 +1,91 @@
+"""Test for the history maintenance module."""
+from datetime import date, datetime, timezone
+from typing import AsyncContextManager, Callable, ContextManager, List
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from archigetter.archisender import get_play_count
+from archigetter.database.maintenance import compact_history, ensure_history_partitions
+from archigetter.database.models.trashtv import (
+    TrashTvArchillectData,
+    TrashTvArchillectHistory,
+    TrashTvArchillectPlayCount,
+)
+
+
+def _count_rows(session: Session, table: str) -> int:
+    return int(session.execute(text(f'SELECT count(*) FROM "{table}"')).scalar())
+
+
+def test_ensure_history_partitions(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that monthly partitions are created once and take over rows from the default partition."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session)
+        session.add(TrashTvArchillectHistory(gif_id="1", timestamp=datetime(2026, 11, 5, tzinfo=timezone.utc)))
+        session.commit()
+
+        created_partitions = ensure_history_partitions(session, months_ahead=2, today=date(2026, 10, 18))
+
+        assert created_partitions == [
+            "TRASH_TV_ARCHILLECT_HISTORY_y2026m10",
+            "TRASH_TV_ARCHILLECT_HISTORY_y2026m11",
+            "TRASH_TV_ARCHILLECT_HISTORY_y2026m12",
+        ]
+        assert _count_rows(session, "TRASH_TV_ARCHILLECT_HISTORY_default") == 0
+        assert _count_rows(session, "TRASH_TV_ARCHILLECT_HISTORY_y2026m11") == 1
+        assert _count_rows(session, "TRASH_TV_ARCHILLECT_HISTORY") == 1
+
+        assert ensure_history_partitions(session, months_ahead=2, today=date(2026, 10, 18)) == []
+
+
+@pytest.mark.asyncio
+async def test_compact_history(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that old on screen plays are rolled up into daily counts and emptied partitions are dropped."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session)
+        ensure_history_partitions(session, months_ahead=1, today=date(2026, 8, 1))
+        session.add_all(
+            [
+                TrashTvArchillectHistory(
+                    gif_id="1", css_id="screenbg", timestamp=datetime(2026, 8, 3, 10, tzinfo=timezone.utc)
+                ),
+                TrashTvArchillectHistory(
+                    gif_id="1", css_id="screenbg", timestamp=datetime(2026, 8, 3, 11, tzinfo=timezone.utc)
+                ),
+                TrashTvArchillectHistory(
+                    gif_id="1", css_id="buffer", timestamp=datetime(2026, 8, 3, 12, tzinfo=timezone.utc)
+                ),
+                TrashTvArchillectHistory(
+                    gif_id="1", css_id="screenbg", timestamp=datetime(2026, 10, 1, tzinfo=timezone.utc)
+                ),
+            ]
+        )
+        session.commit()
+
+        compacted_rows, dropped_partitions = compact_history(
+            session, retention_days=30, now=datetime(2026, 10, 18, tzinfo=timezone.utc)
+        )
+
+        assert compacted_rows == 3
+        assert dropped_partitions == ["TRASH_TV_ARCHILLECT_HISTORY_y2026m08"]
+        assert _count_rows(session, "TRASH_TV_ARCHILLECT_HISTORY") == 1
+
+        play_count = session.query(TrashTvArchillectPlayCount).one()
+        assert play_count.gif_id == "1"
+        assert play_count.day == date(2026, 8, 3)
+        assert play_count.play_count == 2
+
+        async with get_test_async_session_trashtv() as async_session:
+            assert await get_play_count(async_session, "1") == 3
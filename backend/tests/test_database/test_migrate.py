@@ -0,0 +1,73 @@
+"""Test bringing the history of databases created before it was partitioned up to date."""
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from archigetter.database.maintenance import _partition_name
+from archigetter.database.migrate import migrate
+from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory
+
+_TABLE = TrashTvArchillectHistory.__tablename__
+
+
+def test_migrate(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that the plays of a plain history table end up in the partitioned one."""
+    now = datetime.now(timezone.utc)
+    legacy_plays = [datetime(2020, 1, 5, tzinfo=timezone.utc), datetime(2020, 2, 5, tzinfo=timezone.utc), now]
+
+    with clean_db_trashtv():
+        with get_test_session_trashtv() as session:
+            insert_row_TrashTvArchillectData(session)
+            session.execute(text(f'DROP TABLE "{_TABLE}"'))
+            session.execute(
+                text(
+                    f'CREATE TABLE "{_TABLE}" (id UUID PRIMARY KEY, '
+                    f'gif_id VARCHAR REFERENCES "{TrashTvArchillectData.__tablename__}" (archillect_id), '
+                    "timestamp TIMESTAMP WITH TIME ZONE DEFAULT now())"
+                )
+            )
+            for timestamp in legacy_plays:
+                session.execute(
+                    text(f"INSERT INTO \"{_TABLE}\" (id, gif_id, timestamp) VALUES (gen_random_uuid(), '1', :t)"),
+                    {"t": timestamp},
+                )
+            session.commit()
+
+        assert migrate() == len(legacy_plays)
+
+        with get_test_session_trashtv() as session:
+            relkind = session.execute(text("SELECT relkind FROM pg_class WHERE relname = :t"), {"t": _TABLE}).scalar()
+            assert relkind == "p"
+            assert not inspect(session.connection()).has_table(f"{_TABLE}_legacy")
+
+            plays = session.query(TrashTvArchillectHistory).order_by(TrashTvArchillectHistory.timestamp).all()
+            assert [play.timestamp for play in plays] == legacy_plays
+            assert all(play.gif_id == "1" for play in plays)
+
+            this_month = session.execute(text(f'SELECT count(*) FROM "{_partition_name(now.date())}"')).scalar()
+            assert this_month == 1
+
+        assert migrate() == 0
+
+
+def test_migrate_adds_css_id(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+) -> None:
+    """Test that a partitioned history from before the css id was recorded gets the column."""
+    with clean_db_trashtv():
+        with get_test_session_trashtv() as session:
+            session.execute(text(f'ALTER TABLE "{_TABLE}" DROP COLUMN css_id'))
+            session.commit()
+
+        assert migrate() == 0
+
+        with get_test_session_trashtv() as session:
+            columns = [column["name"] for column in inspect(session.connection()).get_columns(_TABLE)]
+            assert "css_id" in columns
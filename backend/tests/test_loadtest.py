@@ -0,0 +1,75 @@
+"""Test the load test of the `/trash` websocket."""
+import asyncio
+import json
+import socket
+
+import pytest
+import uvicorn
+
+from archigetter import archisender
+from archigetter.api import app
+from archigetter.loadtest import Viewer, build_report, percentile, run_load_test
+
+
+def _viewer(*arrivals: float) -> Viewer:
+    viewer = Viewer()
+    viewer.connect_latency = 0.01
+    viewer.arrivals = [("snapshot", 0.0)] + [(f"gif {index}", arrival) for index, arrival in enumerate(arrivals)]
+    return viewer
+
+
+def test_percentile() -> None:
+    """Test nearest-rank percentiles."""
+    assert percentile([], 0.5) is None
+    assert percentile([3.0, 1.0, 2.0], 0.5) == 2.0
+    assert percentile([float(value) for value in range(1, 101)], 0.99) == 99.0
+
+
+def test_build_report() -> None:
+    """Test that delays are measured against the first viewer to get a message, without the connect snapshot."""
+    dropped = Viewer()
+    dropped.dropped = True
+    report = build_report([_viewer(1.0, 2.0), _viewer(1.5, 2.0), dropped], memory_growth_in_bytes=2000.0)
+
+    assert report.viewers == 3
+    assert report.connected_viewers == 2
+    assert report.dropped_viewers == 1
+    assert report.messages == 2
+    assert report.delivery_delay_p99_in_seconds == 0.5
+    assert report.jitter_p50_in_seconds == 0.0
+    assert report.jitter_p99_in_seconds == 0.5
+    assert report.memory_per_connection_in_bytes == 1000.0
+
+
+@pytest.mark.asyncio
+async def test_run_load_test(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a load test against a local instance, whose viewers are sent gifs while they watch."""
+    hub = archisender.TrashHub(queue_size=4, max_skipped_messages=4)
+    hub.publish(json.dumps({"data": None}))
+    monkeypatch.setattr(archisender, "trash_hub", hub)
+
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_config=None))
+    monkeypatch.setattr(server, "install_signal_handlers", lambda: None)
+    serving = asyncio.ensure_future(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.01)
+
+        load_test = asyncio.ensure_future(run_load_test(f"http://127.0.0.1:{port}", viewers=5, duration_in_seconds=1))
+        await asyncio.sleep(0.3)
+        for gif_id in range(3):
+            hub.publish(json.dumps({"data": {"archillect_id": str(gif_id), "gif_url": None}}))
+            await asyncio.sleep(0.1)
+        report = await load_test
+    finally:
+        server.should_exit = True
+        await serving
+
+    assert report.connected_viewers == 5
+    assert report.dropped_viewers == 0
+    assert report.messages == 3
+    assert report.delivery_delay_p99_in_seconds is not None
+    assert report.memory_per_connection_in_bytes is not None
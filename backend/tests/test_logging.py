@@ -0,0 +1,76 @@
+"""Test the logger setup."""
+import json
+import logging
+from io import StringIO
+
+from archigetter import settings
+from archigetter._logging import SamplingFilter, configure_logging, stop_logging
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, message, ("arg",), None)
+
+
+def test_sampling_filter() -> None:
+    """Test that repetitive messages are dropped within a period and counted on the next record let through."""
+    clock = FakeClock()
+    sampling_filter = SamplingFilter(burst=2, period_in_seconds=10, clock=clock)
+
+    assert [sampling_filter.filter(_record("repeated %s")) for _ in range(5)] == [True, True, False, False, False]
+    assert sampling_filter.filter(_record("other %s"))
+    assert sampling_filter.filter(_record("repeated %s", logging.ERROR))
+
+    clock.now = 10
+    record = _record("repeated %s")
+    assert sampling_filter.filter(record)
+    assert record.__dict__["sampled_out"] == 3
+    assert sampling_filter.filter(_record("repeated %s"))
+    assert not sampling_filter.filter(_record("repeated %s"))
+
+
+def test_configure_logging() -> None:
+    """Test that records are written as JSON by the background thread, once drained."""
+    stream = StringIO()
+    configure_logging("INFO", sample_burst=1, sample_period_in_seconds=60, stream=stream)
+    try:
+        logger = logging.getLogger("archigetter.test")
+        logger.info("Queued %s.", "record", extra={"gif_id": "1"})
+        logger.info("Queued %s.", "again")
+        stop_logging()
+
+        lines = [line for line in stream.getvalue().splitlines() if "archigetter.test" in line]
+        assert len(lines) == 1
+        assert json.loads(lines[0])["message"] == "Queued record."
+        assert json.loads(lines[0])["gif_id"] == "1"
+    finally:
+        configure_logging(settings.log_level, settings.log_sample_burst, settings.log_sample_period_in_seconds)
+
+
+def test_configure_logging_exception() -> None:
+    """Test that records are queued unformatted, so their traceback is formatted into its own field."""
+    stream = StringIO()
+    configure_logging("INFO", stream=stream)
+    try:
+        logger = logging.getLogger("archigetter.test")
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger.exception("Failed %s.", "record")
+        stop_logging()
+
+        lines = [line for line in stream.getvalue().splitlines() if "archigetter.test" in line]
+        assert len(lines) == 1
+        assert json.loads(lines[0])["message"] == "Failed record."
+        assert "ValueError: broken" in json.loads(lines[0])["exc_info"]
+    finally:
+        configure_logging(settings.log_level, settings.log_sample_burst, settings.log_sample_period_in_seconds)
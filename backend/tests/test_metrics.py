@@ -0,0 +1,78 @@
+"""Test the Prometheus metrics."""
+import asyncio
+
+import pytest
+from prometheus_client import CollectorRegistry, Histogram
+
+from archigetter.database import close_db_trashtv_async_engine
+from archigetter.metrics import render_metrics, timed
+
+
+def _histogram() -> Histogram:
+    return Histogram("test_duration_seconds", "Test durations.", registry=CollectorRegistry())
+
+
+def _count(histogram: Histogram) -> float:
+    return float(
+        next(
+            sample.value
+            for metric in histogram.collect()
+            for sample in metric.samples
+            if sample.name.endswith("_count")
+        )
+    )
+
+
+def test_timed_block() -> None:
+    """Test that blocks are timed, failed ones included."""
+    histogram = _histogram()
+
+    with timed(histogram):
+        pass
+    with pytest.raises(ValueError):
+        with timed(histogram):
+            raise ValueError()
+
+    assert _count(histogram) == 2
+
+
+@pytest.mark.asyncio
+async def test_timed_function() -> None:
+    """Test that every call of plain and coroutine functions is timed."""
+    histogram = _histogram()
+
+    @timed(histogram)
+    def add(first: int, second: int) -> int:
+        return first + second
+
+    @timed(histogram)
+    async def add_later(first: int, second: int) -> int:
+        await asyncio.sleep(0)
+        return first + second
+
+    assert add(1, 2) == 3
+    assert await add_later(1, 2) == 3
+    assert list(await asyncio.gather(add_later(1, 1), add_later(2, 2))) == [2, 4]
+    assert add.__name__ == "add"
+    assert _count(histogram) == 4
+
+
+def test_render_metrics() -> None:
+    """Test that the hot path metrics and the pool and cache snapshots are rendered."""
+    rendered = render_metrics().decode()
+
+    assert "trashtv_archillect_scrape_duration_seconds_bucket" in rendered
+    assert "trashtv_gifs_ingested_total" in rendered
+    assert 'trashtv_db_pool_checked_out{engine="sync"}' in rendered
+    assert 'trashtv_db_pool_checked_out{engine="async"}' in rendered
+    assert 'trashtv_cache_hits_total{cache="gif_bytes"}' in rendered
+
+
+@pytest.mark.asyncio
+async def test_render_metrics_from_thread() -> None:
+    """Test that metrics render off the event loop, like the metrics server of the worker scrapes them."""
+    await close_db_trashtv_async_engine()
+
+    rendered = (await asyncio.get_running_loop().run_in_executor(None, render_metrics)).decode()
+
+    assert 'trashtv_db_pool_checked_out{engine="async"} 0.0' in rendered
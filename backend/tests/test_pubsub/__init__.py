@@ -0,0 +1 @@
+"""Package to test the pubsub package."""
@@ -0,0 +1,33 @@
+"""Test the in-process pub/sub."""
+import pytest
+
+from archigetter.pubsub import InMemoryPubSub
+
+
+@pytest.mark.asyncio
+async def test_publish_to_subscribers() -> None:
+    """Test that every subscriber of a channel gets its messages, and only while subscribed."""
+    pubsub = InMemoryPubSub(queue_size=4)
+
+    async with pubsub.subscribe("a") as first, pubsub.subscribe("a") as second, pubsub.subscribe("b") as other:
+        await pubsub.publish("a", "1")
+
+        assert await first.get() == "1"
+        assert await second.get() == "1"
+        assert other.queue.empty()
+
+    await pubsub.publish("a", "2")
+    assert first.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest() -> None:
+    """Test that a subscriber falling behind keeps the newest messages."""
+    pubsub = InMemoryPubSub(queue_size=2)
+
+    async with pubsub.subscribe("a") as subscription:
+        for message in ["1", "2", "3"]:
+            await pubsub.publish("a", message)
+
+        assert [await subscription.get(), await subscription.get()] == ["2", "3"]
+        assert subscription.dropped_messages == 1
@@ -0,0 +1,50 @@
+"""Test the pub/sub via Postgres."""
+import asyncio
+
+import pytest
+from sqlalchemy.engine.url import make_url
+
+from archigetter import settings
+from archigetter.pubsub import PostgresPubSub
+
+DSN = str(make_url(settings.db_dsn_trashtv).set(drivername="postgresql"))  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio
+async def test_publish_across_connections() -> None:
+    """Test that messages reach the subscribers listening on another connection."""
+    publisher = PostgresPubSub(DSN, queue_size=4, reconnect_interval=0.01)
+    subscriber = PostgresPubSub(DSN, queue_size=4, reconnect_interval=0.01)
+    try:
+        async with subscriber.subscribe("trashtv_test") as subscription:
+            await publisher.publish("trashtv_test", "hello")
+            assert await asyncio.wait_for(subscription.get(), timeout=5) == "hello"
+    finally:
+        await publisher.close()
+        await subscriber.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnect() -> None:
+    """Test that subscribers keep receiving once a lost connection is reconnected."""
+    publisher = PostgresPubSub(DSN, queue_size=4, reconnect_interval=0.01)
+    subscriber = PostgresPubSub(DSN, queue_size=4, reconnect_interval=0.01)
+    try:
+        async with subscriber.subscribe("trashtv_test") as subscription:
+            await publisher.publish("trashtv_test", "before")
+            assert await asyncio.wait_for(subscription.get(), timeout=5) == "before"
+
+            assert subscriber._connection is not None and publisher._connection is not None
+            listener_pid = subscriber._connection.get_server_pid()
+            await publisher._connection.execute("SELECT pg_terminate_backend($1)", listener_pid)
+
+            for _ in range(100):
+                if subscriber._connection is not None and subscriber._connection.get_server_pid() != listener_pid:
+                    break
+                await asyncio.sleep(0.05)
+
+            await publisher.publish("trashtv_test", "after")
+            assert await asyncio.wait_for(subscription.get(), timeout=5) == "after"
+    finally:
+        await publisher.close()
+        await subscriber.close()
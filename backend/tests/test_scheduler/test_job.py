@@ -0,0 +1,114 @@
+"""Test background jobs."""
+import asyncio
+import threading
+from typing import Optional
+
+import pytest
+
+from archigetter.scheduler import AdaptiveInterval, Job
+
+
+def test_adaptive_interval() -> None:
+    """Test that the interval learns the period of changes and polls quickly once a change is due."""
+    adaptive_interval = AdaptiveInterval(min_interval=1, max_interval=60)
+
+    assert adaptive_interval.next_interval(changed=True, now=0) == 1
+    assert adaptive_interval.next_interval(changed=False, now=1) == 1
+    assert adaptive_interval.next_interval(changed=True, now=10) == 10
+    assert adaptive_interval.period == 10
+
+    assert adaptive_interval.next_interval(changed=False, now=20) == 1
+    assert adaptive_interval.next_interval(changed=True, now=21) == pytest.approx(10.3)
+    assert adaptive_interval.next_interval(changed=False, now=21) == pytest.approx(10.3)
+
+
+def test_adaptive_interval_backs_off() -> None:
+    """Test that the interval grows up to the maximum while polls keep seeing nothing new."""
+    adaptive_interval = AdaptiveInterval(min_interval=1, max_interval=8, period=6)
+
+    assert adaptive_interval.next_interval(changed=True, now=0) == 6
+    intervals = [adaptive_interval.next_interval(changed=False, now=now) for now in (6, 7, 9, 13, 21, 29)]
+    assert intervals == [1, 2, 4, 8, 8, 8]
+
+    assert adaptive_interval.next_interval(changed=True, now=40) == pytest.approx(8)
+    assert adaptive_interval.next_interval(changed=False, now=59) == 1
+
+
+def test_adaptive_interval_bounds() -> None:
+    """Test that the interval stays within its bounds."""
+    adaptive_interval = AdaptiveInterval(min_interval=1, max_interval=60, period=600)
+
+    assert adaptive_interval.next_interval(changed=True, now=0) == 60
+
+
+@pytest.mark.asyncio
+async def test_job_backoff() -> None:
+    """Test that failing runs back off exponentially up to the maximum and recover on success."""
+    fail = True
+
+    async def _flaky() -> None:
+        if fail:
+            raise RuntimeError("upstream is down")
+
+    job = Job("flaky", _flaky, interval=2, jitter=0, max_backoff=10)
+
+    delays = []
+    for _ in range(4):
+        assert await job.run_once() is None
+        delays.append(job.next_delay(None, 0))
+    assert delays == [4, 8, 10, 10]
+
+    fail = False
+    await job.run_once()
+    assert job.next_delay(None, 0) == 2
+
+    stats = job.stats()
+    assert stats.runs == 5
+    assert stats.failures == 4
+    assert stats.consecutive_failures == 0
+
+
+def test_job_jitter() -> None:
+    """Test that delays are spread around the interval."""
+    job = Job("jittery", lambda: None, interval=10, jitter=0.5)
+
+    delays = {job.next_delay(None, 0) for _ in range(20)}
+
+    assert len(delays) > 1
+    assert all(5 <= delay <= 15 for delay in delays)
+
+
+@pytest.mark.asyncio
+async def test_job_single_flight() -> None:
+    """Test that a job does not run again while it is still running."""
+    release = asyncio.Event()
+
+    async def _slow() -> bool:
+        await release.wait()
+        return True
+
+    job = Job("slow", _slow, interval=1)
+    running = asyncio.ensure_future(job.run_once())
+    await asyncio.sleep(0)
+
+    assert await job.run_once() is None
+    release.set()
+    assert await running is True
+
+    stats = job.stats()
+    assert stats.runs == 1
+    assert stats.skipped_runs == 1
+
+
+@pytest.mark.asyncio
+async def test_job_sync_function() -> None:
+    """Test that plain functions run in the threadpool."""
+    threads = []
+
+    def _blocking() -> Optional[bool]:
+        threads.append(threading.current_thread())
+        return None
+
+    await Job("blocking", _blocking, interval=1).run_once()
+
+    assert threads and threads[0] is not threading.current_thread()
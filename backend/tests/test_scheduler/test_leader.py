@@ -0,0 +1,90 @@
+"""Test leader election."""
+import asyncio
+from typing import Any, Callable, ContextManager
+
+import pytest
+from sqlalchemy import text
+
+from archigetter.database import connect_db_trashtv_async, get_db_trashtv_session
+from archigetter.scheduler import Job, LeaderElection, Scheduler
+
+LOCK_KEY = 4242
+
+
+@pytest.mark.asyncio
+async def test_leader_election(clean_db_trashtv: Callable[..., ContextManager[None]]) -> None:
+    """Test that only one process leads and another one takes over once the leader resigns."""
+    with clean_db_trashtv():
+        first = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY)
+        second = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY)
+
+        assert await first.try_lead()
+        assert not await second.try_lead()
+        assert await first.try_lead()
+
+        await first.resign()
+
+        assert await second.try_lead()
+        assert not await first.try_lead()
+
+        await second.resign()
+        await first.resign()
+
+
+@pytest.mark.asyncio
+async def test_leader_election_failed_unlock(
+    clean_db_trashtv: Callable[..., ContextManager[None]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a connection still holding the lock is not pooled again, so the lock is released anyway."""
+    with clean_db_trashtv():
+        first = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY)
+        second = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY)
+        assert await first.try_lead()
+
+        async def _fail(*_: Any) -> None:
+            raise ConnectionError("unlock failed")
+
+        monkeypatch.setattr(first._connection, "scalar", _fail)
+        await first.resign()
+
+        with get_db_trashtv_session() as session:
+            held_locks = session.execute(
+                text("select count(*) from pg_locks where locktype = 'advisory' and objid = :lock_key"),
+                {"lock_key": LOCK_KEY},
+            ).scalar()
+        assert held_locks == 0
+        assert await second.try_lead()
+        await second.resign()
+
+
+@pytest.mark.asyncio
+async def test_leader_election_runs_scheduler(clean_db_trashtv: Callable[..., ContextManager[None]]) -> None:
+    """Test that the scheduler only runs on the leader and stops once the election is cancelled."""
+    runs = []
+
+    async def _job() -> None:
+        runs.append(1)
+
+    with clean_db_trashtv():
+        follower = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY, interval=0.02)
+        scheduler = Scheduler()
+        scheduler.add(Job("job", _job, interval=10))
+
+        leader = LeaderElection(connect_db_trashtv_async, lock_key=LOCK_KEY)
+        assert await leader.try_lead()
+
+        follower_task = asyncio.ensure_future(follower.run(scheduler))
+        await asyncio.sleep(0.1)
+        assert not follower.is_leader
+        assert not scheduler.is_running
+
+        await leader.resign()
+        await asyncio.sleep(0.2)
+        assert follower.is_leader
+        assert scheduler.is_running
+        assert runs == [1]
+
+        follower_task.cancel()
+        await asyncio.gather(follower_task, return_exceptions=True)
+        assert not scheduler.is_running
+        assert not follower.is_leader
@@ -0,0 +1,43 @@
+"""Test the scheduler."""
+import asyncio
+
+import pytest
+
+from archigetter.scheduler import Job, Scheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler() -> None:
+    """Test that all jobs run periodically until the scheduler stops."""
+    runs = {"fast": 0, "waiting": 0}
+
+    async def _fast() -> None:
+        runs["fast"] += 1
+
+    async def _waiting() -> None:
+        runs["waiting"] += 1
+
+    scheduler = Scheduler()
+    scheduler.add(Job("fast", _fast, interval=0.01, jitter=0))
+    scheduler.add(Job("waiting", _waiting, interval=10, wait_first=True))
+
+    scheduler.start()
+    await asyncio.sleep(0.1)
+    await scheduler.stop()
+    fast_runs = runs["fast"]
+    await asyncio.sleep(0.05)
+
+    assert not scheduler.is_running
+    assert fast_runs > 2
+    assert runs == {"fast": fast_runs, "waiting": 0}
+    assert [stats.name for stats in scheduler.stats()] == ["fast", "waiting"]
+    assert scheduler.stats()[0].runs == fast_runs
+
+
+def test_scheduler_unique_job_names() -> None:
+    """Test that job names are unique."""
+    scheduler = Scheduler()
+    scheduler.add(Job("job", lambda: None, interval=1))
+
+    with pytest.raises(ValueError):
+        scheduler.add(Job("job", lambda: None, interval=1))
@@ -19,3 +19,8 @@ def test_settings_cors_allow_star() -> None:
 
 def test_settings_correctly() -> None:
     Settings(cors_allowed_origins=["http://example.org"])
+
+
+def test_settings_gif_download_budget() -> None:
+    with pytest.raises(ValueError, match="Must allow at least"):
+        Settings(gif_max_size_in_bytes=10, gif_download_max_bytes_in_flight=5)
@@ -0,0 +1,119 @@
+"""Test crud functionality of the transcoder."""
+import sys
+from pathlib import Path
+from typing import AsyncContextManager, AsyncGenerator, Callable, ContextManager, List
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from archigetter import settings
+from archigetter.archisender import get_gif, get_now_playing
+from archigetter.blobstore import Blob, LocalBlobStore
+from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvArchillectHistory, TrashTvGifRendition
+from archigetter.transcoder import close_transcode_executor, transcode_gifs
+
+# writes a rendition with the right magic number, fails to encode mp4
+FAKE_FFMPEG = f"""#!{sys.executable}
+import sys
+
+target = sys.argv[-1]
+if target.endswith(".mp4"):
+    sys.exit("Unknown encoder 'libx264'")
+
+heads = {{".webm": b"\\x1a\\x45\\xdf\\xa3", ".png": b"\\x89PNG\\r\\n\\x1a\\n"}}
+with open(target, "wb") as rendition:
+    rendition.write(heads[target[target.rindex("."):]] + b"rendition")
+"""
+
+
+@pytest.fixture()
+async def fake_ffmpeg(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> AsyncGenerator[Path, None]:
+    """Provide an ffmpeg stand-in to transcode with, in a single transcode process."""
+    ffmpeg_path = tmp_path / "ffmpeg"
+    ffmpeg_path.write_text(FAKE_FFMPEG)
+    ffmpeg_path.chmod(0o755)
+    monkeypatch.setattr(settings, "gif_transcode_ffmpeg_path", str(ffmpeg_path))
+    monkeypatch.setattr(settings, "gif_transcode_processes", 1)
+
+    yield ffmpeg_path
+
+    await close_transcode_executor()
+
+
+async def _put_sample_gif(blob_store: LocalBlobStore, project_root_tests_path: Path) -> Blob:
+    writer = blob_store.open_writer()
+    writer.write((project_root_tests_path / "data" / "sample.gif").read_bytes())
+    return await blob_store.put(writer)
+
+
+@pytest.mark.asyncio
+async def test_transcode_gifs(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+    local_blob_store: LocalBlobStore,
+    fake_ffmpeg: Path,
+    project_root_tests_path: Path,
+) -> None:
+    """Test that downloaded gifs are transcoded once and their renditions are served."""
+    blob = await _put_sample_gif(local_blob_store, project_root_tests_path)
+
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(
+            session,
+            [
+                TrashTvArchillectData(
+                    archillect_id="1",
+                    gif_sha256=blob.sha256,
+                    gif_size_in_bytes=blob.size,
+                    gif_mime_type=blob.mime_type,
+                ),
+                TrashTvArchillectData(archillect_id="2"),
+            ],
+        )
+        session.add(TrashTvArchillectHistory(gif_id="1", css_id="screenbg"))
+        session.commit()
+
+        async with get_test_async_session_trashtv() as async_session:
+            # cached before the gif is transcoded
+            assert (await get_now_playing(async_session) or {})["poster_url"] is None
+            assert await transcode_gifs(async_session) == 1
+            assert await transcode_gifs(async_session) == 0
+
+            renditions = {rendition.format: rendition for rendition in session.query(TrashTvGifRendition).all()}
+            assert renditions.keys() == {"webm", "mp4", "poster"}
+            assert renditions["webm"].mime_type == "video/webm"
+            assert renditions["poster"].mime_type == "image/png"
+            assert renditions["mp4"].sha256 is None
+            webm_path = local_blob_store.local_path(str(renditions["webm"].sha256))
+            assert webm_path is not None and webm_path.exists()
+
+            webm = await get_gif(async_session, "1", "webm")
+            assert webm == {
+                "sha256": renditions["webm"].sha256,
+                "size": len(b"rendition") + 4,
+                "mime_type": "video/webm",
+            }
+            assert await get_gif(async_session, "1", "mp4") is None
+            assert await get_gif(async_session, "2", "webm") is None
+
+            now_playing = await get_now_playing(async_session)
+            assert now_playing
+            assert now_playing["poster_url"] == "/gif/1/poster"
+            assert [gif_format["url"] for gif_format in now_playing["formats"]] == ["/gif/1/webm", "/gif/1"]
+
+
+@pytest.mark.asyncio
+async def test_transcode_gifs_without_ffmpeg(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_async_session_trashtv: Callable[..., AsyncContextManager[AsyncSession]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that nothing is transcoded, nor marked as failed, if ffmpeg is missing."""
+    monkeypatch.setattr(settings, "gif_transcode_ffmpeg_path", "no-such-ffmpeg")
+
+    with clean_db_trashtv():
+        async with get_test_async_session_trashtv() as async_session:
+            assert await transcode_gifs(async_session) == 0
@@ -0,0 +1,55 @@
+"""Test the standalone worker."""
+import asyncio
+from typing import Callable, ContextManager, List
+
+import pytest
+from sqlalchemy.orm import Session
+
+from archigetter import settings, worker
+from archigetter.database.maintenance import ensure_history_partitions
+from archigetter.database.models.trashtv import TrashTvArchillectData, TrashTvGifDownloadJob
+from archigetter.scheduler import Job, Scheduler
+
+
+@pytest.mark.asyncio
+async def test_run(clean_db_trashtv: Callable[..., ContextManager[None]], monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the worker runs the background jobs as leader until it is stopped."""
+    runs = []
+
+    async def _job() -> None:
+        runs.append(1)
+
+    scheduler = Scheduler()
+    scheduler.add(Job("job", _job, interval=10))
+    monkeypatch.setattr(worker.jobs, "scheduler", scheduler)
+    monkeypatch.setattr(settings, "leader_election_interval_in_seconds", 0.01)
+
+    with clean_db_trashtv():
+        stop = asyncio.Event()
+        running = asyncio.ensure_future(worker.run(stop))
+        await asyncio.sleep(0.5)
+
+        assert scheduler.is_running
+        assert runs == [1]
+
+        stop.set()
+        await running
+
+        assert not scheduler.is_running
+
+
+def test_maintain_db(
+    clean_db_trashtv: Callable[..., ContextManager[None]],
+    get_test_session_trashtv: Callable[..., ContextManager[Session]],
+    insert_row_TrashTvArchillectData: Callable[..., List[TrashTvArchillectData]],
+) -> None:
+    """Test that history partitions and missing downloads are left to the maintenance job of the leader."""
+    with clean_db_trashtv(), get_test_session_trashtv() as session:
+        insert_row_TrashTvArchillectData(session)
+
+        worker.create_application_tables()
+        assert session.query(TrashTvGifDownloadJob).count() == 0
+
+        worker.jobs.maintain_db()
+        assert session.query(TrashTvGifDownloadJob).count() == 1
+        assert ensure_history_partitions(session, settings.history_partitions_months_ahead) == []